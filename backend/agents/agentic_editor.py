@@ -1,8 +1,11 @@
-from google import genai
 import json
 import re
 from typing import Dict, List, Any, Tuple, Optional
 from enum import Enum
+from services.log import get_logger
+from .genai_client import get_client, generate_content
+
+log = get_logger('agentic_editor')
 
 class EditIntent(Enum):
     """Types of edit intents"""
@@ -21,9 +24,14 @@ class AgenticLessonEditor:
     """
     
     def __init__(self, api_key: str):
-        self.client = genai.Client(api_key=api_key)
+        self.api_key = api_key
         self.model_name = 'gemini-2.5-flash-lite'
         
+    @property
+    def client(self):
+        """Shared genai client, created on first use"""
+        return get_client(self.api_key)
+    
     def process_edit_request(self, lesson_data: Dict[str, Any], user_request: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
         """
         Main entry point for processing edit requests.
@@ -34,23 +42,18 @@ class AgenticLessonEditor:
         4. Validate results
         """
         
-        print(f"\n{'='*60}")
-        print(f"🤖 AGENTIC EDITOR: Processing request")
-        print(f"Request: {user_request}")
-        print(f"{'='*60}\n")
+        log.debug("Agentic edit request: %s", user_request)
         
         # Step 1: Classify the intent
         intent = self._classify_intent(user_request)
-        print(f"📋 Intent classified as: {intent.value}")
         
         # Step 2: Create execution plan
         plan = self._create_execution_plan(lesson_data, user_request, intent)
-        print(f"📝 Execution plan created with {len(plan['steps'])} steps")
         
         # Step 3: Execute the plan
         updated_lesson, image_changes = self._execute_plan(lesson_data, user_request, plan)
-        print(f"✅ Plan executed successfully")
-        print(f"🖼️  Images to regenerate: {len(image_changes)}")
+        log.info("Agentic edit applied", extra={'intent': intent.value, 'plan_steps': len(plan['steps']),
+                                                'images': len(image_changes)})
         
         # Step 4: Increment version
         updated_lesson['version'] = lesson_data.get('version', 1) + 1
@@ -76,9 +79,11 @@ Classify into ONE of these categories:
 Return ONLY the category name, nothing else."""
 
         try:
-            response = self.client.models.generate_content(
+            response = generate_content(
+                self.client, 'agentic_editor', 'lesson',
                 model=self.model_name,
-                contents=[prompt]
+                contents=[prompt],
+                step='classify_intent'
             )
             
             intent_str = self._extract_text(response).strip().lower()
@@ -91,7 +96,7 @@ Return ONLY the category name, nothing else."""
             return EditIntent.MIXED
             
         except Exception as e:
-            print(f"Error classifying intent: {e}")
+            log.warning("Could not classify edit intent: %s", e)
             return EditIntent.MIXED
     
     def _create_execution_plan(self, lesson_data: Dict[str, Any], user_request: str, intent: EditIntent) -> Dict[str, Any]:
@@ -128,9 +133,11 @@ Create a JSON execution plan with these fields:
 Return ONLY valid JSON, no markdown or extra text."""
 
         try:
-            response = self.client.models.generate_content(
+            response = generate_content(
+                self.client, 'agentic_editor', 'lesson',
                 model=self.model_name,
-                contents=[prompt]
+                contents=[prompt],
+                step='plan'
             )
             
             plan_text = self._extract_text(response).strip()
@@ -141,7 +148,7 @@ Return ONLY valid JSON, no markdown or extra text."""
             return plan
             
         except Exception as e:
-            print(f"Error creating execution plan: {e}")
+            log.warning("Could not create execution plan: %s", e)
             # Return a basic plan
             return {
                 "steps": [{"action": "modify_text", "target": "all", "details": user_request}],
@@ -208,9 +215,11 @@ DISPLAY ORDER OF IMAGES (for reference when user says "second image", "third ima
 Return ONLY the complete updated lesson as valid JSON, no markdown or extra text."""
 
         try:
-            response = self.client.models.generate_content(
+            response = generate_content(
+                self.client, 'agentic_editor', 'lesson',
                 model=self.model_name,
-                contents=[prompt]
+                contents=[prompt],
+                step='apply'
             )
             
             lesson_text = self._extract_text(response).strip()
@@ -221,9 +230,7 @@ Return ONLY the complete updated lesson as valid JSON, no markdown or extra text
             return updated_lesson
             
         except Exception as e:
-            print(f"Error generating updated content: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Could not generate updated content")
             return lesson_data
     
     def _generate_image_changes(self, updated_lesson: Dict[str, Any], plan: Dict[str, Any]) -> List[Dict[str, Any]]:
@@ -233,7 +240,7 @@ Return ONLY the complete updated lesson as valid JSON, no markdown or extra text
         image_style = plan.get('new_image_style', 'educational')
         image_targets = plan.get('image_targets', [])
         
-        print(f"🖼️  Generating image changes. Targets: {image_targets}, Style: {image_style}")
+        log.debug("Image changes - targets: %s, style: %s", image_targets, image_style)
         
         # If no specific targets, check all sections that have image prompts
         if not image_targets or 'all' in str(image_targets).lower():
@@ -337,7 +344,7 @@ Return ONLY the complete updated lesson as valid JSON, no markdown or extra text
                                         'style': image_style
                                     })
                         except ValueError:
-                            print(f"⚠️  Warning: Could not parse index from target: {target}")
+                            log.warning("Could not parse index from image target: %s", target)
                 
                 elif target.startswith('detailed_content') or target == 'detailed_content':
                     # If target is just 'detailed_content', add images to ALL detailed content sections
@@ -366,7 +373,7 @@ Return ONLY the complete updated lesson as valid JSON, no markdown or extra text
                                     })
                         except ValueError:
                             # If parsing fails, skip this target
-                            print(f"⚠️  Warning: Could not parse index from target: {target}")
+                            log.warning("Could not parse index from image target: %s", target)
                 
                 elif target == 'activities':
                     if 'activities' in updated_lesson and 'image_prompt' in updated_lesson['activities']:
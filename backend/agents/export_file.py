@@ -0,0 +1,38 @@
+"""
+Export Output Files
+Exporters render into a spooled temporary file: small files stay in memory,
+larger ones spill to disk, so a download never holds the whole file twice
+"""
+
+import os
+import tempfile
+from typing import BinaryIO, Iterator
+
+# Exports above this size spill from memory to a temp file on disk
+EXPORT_SPOOL_MAX_BYTES = int(os.getenv('EXPORT_SPOOL_MAX_BYTES', str(4 * 1024 * 1024)))
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', str(64 * 1024)))
+
+
+def new_export_file() -> BinaryIO:
+    """Empty binary file for an exporter to write into"""
+    return tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES, mode='w+b')
+
+
+def file_size(stream: BinaryIO) -> int:
+    """Size of a rendered export, leaving the position at the start"""
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def iter_file(stream: BinaryIO, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[bytes]:
+    """Yield the file in chunks and close it when done (or when the client goes away)"""
+    try:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        stream.close()
@@ -0,0 +1,66 @@
+"""
+Shared Gemini Client
+One genai.Client per API key for the whole process, created on first use,
+and the instrumented generate_content every agent calls through - calls take a
+slot from the per-model concurrency governor (services/governor.py) first, and
+transient failures are retried (services/resilience.py) before an agent sees them
+"""
+
+import threading
+from typing import Dict
+from services import metrics, tracing
+from services.governor import governor
+from services.resilience import resilient
+from services.log import get_logger
+from services.usage_service import usage_service
+
+log = get_logger('genai')
+
+_clients: Dict[str, object] = {}
+_lock = threading.Lock()
+
+
+def get_client(api_key: str):
+    """Return the process-wide genai client for `api_key`, creating it on first call"""
+    client = _clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(api_key)
+            if client is None:
+                # Imported here - google.genai is slow to import and not every process needs it
+                from google import genai
+                client = genai.Client(api_key=api_key)
+                _clients[api_key] = client
+    return client
+
+
+def generate_content(client, agent: str, content_type: str, model: str, contents,
+                     step: str = 'generate', **kwargs):
+    """
+    client.models.generate_content, timed per agent/model into the LLM latency
+    histogram (excluding time queued for a slot), with the response's token usage
+    recorded against the caller. Raises the last error once retries are exhausted.
+    """
+    endpoint = metrics.current_endpoint()
+    with tracing.span(f'llm.{agent}', model=model, step=step, content_type=content_type) as span:
+        attempts = []
+
+        key = (agent, model, step)
+
+        def attempt():
+            attempts.append(None)
+            span.set(attempts=len(attempts))
+            with governor.slot(model) as queued:
+                span.set(queue_seconds=round(queued, 6))
+                with resilient.timed(key), metrics.LLM_SECONDS.time(agent=agent, model=model,
+                                                                    content_type=content_type, endpoint=endpoint):
+                    return client.models.generate_content(model=model, contents=contents, **kwargs)
+
+        response = resilient.call(attempt, key=key, can_hedge=lambda: not governor.under_pressure(model))
+        try:
+            usage = usage_service.record(response, agent=agent, model=model, content_type=content_type,
+                                         step=step, endpoint=endpoint)
+            span.set(prompt_tokens=usage['prompt_tokens'], output_tokens=usage['output_tokens'])
+        except Exception as e:
+            log.warning("Could not record token usage: %s", e)
+    return response
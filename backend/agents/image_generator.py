@@ -1,50 +1,67 @@
-from google import genai
 import base64
-import io
-from PIL import Image
+import time
 from typing import Optional
+from .genai_client import get_client, generate_content
+from services import metrics, tracing
+from services.log import get_logger
+
+log = get_logger('image_generator')
 
 class ImageGeneratorAgent:
     """Agent responsible for generating images using Imagen (Nano Banana)"""
     
     def __init__(self, api_key: str):
-        self.client = genai.Client(api_key=api_key)
+        self.api_key = api_key
         self.model_name = 'gemini-2.5-flash-image'
         
+    @property
+    def client(self):
+        """Shared genai client, created on first use"""
+        return get_client(self.api_key)
+    
     def generate_image(self, prompt: str, style: str = "educational") -> Optional[str]:
         """
         Generate an image based on the prompt
         Returns base64 encoded image string
         """
-        try:
-            # Enhance prompt based on style
-            enhanced_prompt = self._enhance_prompt(prompt, style)
-            
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=[enhanced_prompt]
-            )
-            
-            # Extract image from response
-            if hasattr(response, 'candidates') and response.candidates:
-                for candidate in response.candidates:
-                    if hasattr(candidate, 'content') and candidate.content:
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'inline_data') and part.inline_data:
-                                # Get the raw image data
-                                image_bytes = part.inline_data.data
+        started = time.perf_counter()
+        status = 'empty'
+        with tracing.span('image', style=style, prompt=prompt[:80]) as image_span:
+            try:
+                # Enhance prompt based on style
+                enhanced_prompt = self._enhance_prompt(prompt, style)
+                
+                response = generate_content(
+                    self.client, 'image_generator', 'image',
+                    model=self.model_name,
+                    contents=[enhanced_prompt],
+                    step='image'
+                )
+                
+                # Extract image from response
+                if hasattr(response, 'candidates') and response.candidates:
+                    for candidate in response.candidates:
+                        if hasattr(candidate, 'content') and candidate.content:
+                            for part in candidate.content.parts:
+                                if hasattr(part, 'inline_data') and part.inline_data:
+                                    # Get the raw image data
+                                    image_bytes = part.inline_data.data
                                 
-                                # Convert to base64
-                                base64_image = base64.b64encode(image_bytes).decode('utf-8')
-                                return f"data:image/png;base64,{base64_image}"
-            
-            return None
-            
-        except Exception as e:
-            print(f"Error generating image: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+                                    # Convert to base64
+                                    base64_image = base64.b64encode(image_bytes).decode('utf-8')
+                                    status = 'ok'
+                                    return f"data:image/png;base64,{base64_image}"
+                
+                return None
+                
+            except Exception as e:
+                status = 'error'
+                log.error("Image generation failed: %s", e, exc_info=not getattr(e, 'code', None))
+                return None
+            finally:
+                metrics.IMAGE_SECONDS.observe(time.perf_counter() - started, style=style,
+                                              endpoint=metrics.current_endpoint(), status=status)
+                image_span.set(status=status)
     
     def _enhance_prompt(self, prompt: str, style: str) -> str:
         """Enhance the prompt based on the desired style"""
@@ -1,15 +1,23 @@
-from google import genai
 import json
 import re
 from typing import Dict, List, Any, Tuple
+from services.log import get_logger
+from .genai_client import get_client, generate_content
+
+log = get_logger('lesson_editor')
 
 class LessonEditorAgent:
     """Agent responsible for editing lessons based on natural language instructions"""
     
     def __init__(self, api_key: str):
-        self.client = genai.Client(api_key=api_key)
+        self.api_key = api_key
         self.model_name = 'gemini-2.5-flash-lite'
         
+    @property
+    def client(self):
+        """Shared genai client, created on first use"""
+        return get_client(self.api_key)
+    
     def process_edit_request(self, lesson_data: Dict[str, Any], user_request: str) -> Tuple[Dict[str, Any], List[str]]:
         """
         Process a natural language edit request and return updated lesson data
@@ -30,9 +38,11 @@ If the user wants to change an image style (e.g., "make introduction image carto
 Return ONLY the complete updated lesson JSON, no markdown or extra text."""
 
         try:
-            response = self.client.models.generate_content(
+            response = generate_content(
+                self.client, 'lesson_editor', 'lesson',
                 model=self.model_name,
-                contents=[prompt]
+                contents=[prompt],
+                step='edit'
             )
             
             # Extract text from response
@@ -63,9 +73,7 @@ Return ONLY the complete updated lesson JSON, no markdown or extra text."""
             return updated_lesson, image_sections
             
         except Exception as e:
-            print(f"Error processing edit request: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Lesson edit failed")
             return lesson_data, []
     
     def _detect_image_changes(self, old_lesson: Dict[str, Any], new_lesson: Dict[str, Any], user_request: str) -> List[Dict[str, Any]]:
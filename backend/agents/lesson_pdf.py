@@ -0,0 +1,131 @@
+"""
+Lesson PDF Export
+Renders a generated lesson to PDF - imported on first export so reportlab
+isn't loaded by processes that never render
+"""
+
+from reportlab.lib.units import inch
+from reportlab.platypus import Spacer
+from typing import BinaryIO, Dict, Any
+from . import pdf_engine as pdf
+from .export_file import new_export_file
+
+
+def render_lesson_pdf(lesson_data: Dict[str, Any], images: Dict[str, str]) -> BinaryIO:
+    """Create a high-quality PDF from lesson data and images"""
+    
+    pdf_buffer = new_export_file()
+    doc = pdf.new_document(pdf_buffer)
+    
+    # Container for PDF elements
+    story = []
+    
+    # Header
+    story.append(pdf.paragraph(lesson_data.get('title', 'Lesson'), 'title'))
+    
+    if lesson_data.get('subtitle'):
+        story.append(pdf.paragraph(lesson_data['subtitle'], 'subtitle'))
+    
+    story.append(Spacer(1, 0.2*inch))
+    
+    # Introduction
+    introduction = lesson_data.get('introduction', {})
+    if introduction:
+        story.append(pdf.heading('Introduction'))
+        
+        # Add introduction image if available
+        story.extend(pdf.image(images.get('introduction'), width=5*inch, height=3*inch))
+        
+        intro_text = introduction.get('text', '')
+        if intro_text:
+            story.append(pdf.paragraph(intro_text))
+        
+        story.append(Spacer(1, 0.2*inch))
+    
+    # Key Concepts
+    key_concepts = lesson_data.get('key_concepts', [])
+    if key_concepts:
+        story.append(pdf.heading('Key Concepts'))
+        
+        for idx, concept in enumerate(key_concepts):
+            concept_title = concept.get('title', '')
+            concept_desc = concept.get('description', '')
+            
+            if concept_title:
+                story.append(pdf.heading(concept_title, 'subheading'))
+            
+            # Add image for first key concept if available
+            if idx == 0:
+                story.extend(pdf.image(images.get('key_concept_0'), width=4*inch, height=2.5*inch,
+                                       space_after=0.1*inch))
+            
+            if concept_desc:
+                story.append(pdf.paragraph(concept_desc))
+            
+            story.append(Spacer(1, 0.15*inch))
+    
+    # Detailed Content
+    detailed_content = lesson_data.get('detailed_content', [])
+    if detailed_content:
+        for section in detailed_content:
+            heading = section.get('heading', '')
+            paragraphs = section.get('paragraphs', [])
+            
+            if heading:
+                story.append(pdf.heading(heading))
+            
+            for para in paragraphs:
+                if para:
+                    story.append(pdf.paragraph(para))
+            
+            story.append(Spacer(1, 0.15*inch))
+    
+    # Activities
+    activities = lesson_data.get('activities', {})
+    if activities and activities.get('items'):
+        story.append(pdf.heading('Practice Activities'))
+        
+        for activity in activities['items']:
+            activity_title = activity.get('title', '')
+            activity_desc = activity.get('description', '')
+            activity_type = activity.get('type', '')
+            
+            if activity_title:
+                type_label = f" ({activity_type})" if activity_type else ""
+                story.append(pdf.heading(f'• {activity_title}{type_label}', 'subheading'))
+            
+            if activity_desc:
+                story.append(pdf.paragraph(activity_desc))
+            
+            story.append(Spacer(1, 0.1*inch))
+    
+    # Summary
+    summary = lesson_data.get('summary', {})
+    if summary:
+        story.append(Spacer(1, 0.2*inch))
+        story.append(pdf.heading('Summary'))
+        
+        summary_text = summary.get('text', '')
+        if summary_text:
+            story.append(pdf.paragraph(summary_text))
+        
+        key_points = summary.get('key_points', [])
+        if key_points:
+            story.append(Spacer(1, 0.1*inch))
+            story.append(pdf.heading('Key Takeaways:', 'subheading'))
+            for point in key_points:
+                story.append(pdf.bullet(point))
+    
+    # Additional Resources
+    additional_resources = lesson_data.get('additional_resources', [])
+    if additional_resources:
+        story.append(Spacer(1, 0.2*inch))
+        story.append(pdf.heading('Additional Resources'))
+        for resource in additional_resources:
+            story.append(pdf.bullet(resource))
+    
+    # Build PDF
+    doc.build(story)
+    pdf_buffer.seek(0)
+    
+    return pdf_buffer
@@ -0,0 +1,264 @@
+"""
+PDF Rendering Engine
+Shared stylesheet, theme and flowable builders for the lesson and worksheet exporters
+
+Styles, table styles and font metrics are built once per process (per theme) and
+reused by every render - ParagraphStyle/TableStyle objects are read-only during
+doc.build(), so sharing them between concurrent renders is safe.
+"""
+
+from functools import lru_cache
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER, TA_JUSTIFY
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image as RLImage
+from reportlab.lib.colors import HexColor
+from reportlab.pdfbase import pdfmetrics
+import io
+import base64
+from typing import Dict, List, Optional
+from services.log import get_logger
+
+log = get_logger('pdf')
+
+PAGE_SIZE = letter
+PAGE_MARGIN = 0.75*inch
+# Width available to flowables between the margins
+FRAME_WIDTH = PAGE_SIZE[0] - 2*PAGE_MARGIN
+
+THEMES = {
+    'emerald': {
+        'title': '#10b981',       # emerald-500
+        'muted': '#6b7280',       # gray-500
+        'heading': '#059669',     # emerald-600
+        'subheading': '#047857',  # emerald-700
+        'text': '#1f2937',        # gray-800
+        'question': '#374151',    # gray-700
+        'grid': '#d1d5db',        # gray-300
+        'header_fill': '#f3f4f6', # gray-100
+        'font': 'Helvetica',
+        'font_bold': 'Helvetica-Bold',
+        'font_italic': 'Helvetica-Oblique',
+    }
+}
+DEFAULT_THEME = 'emerald'
+
+
+def new_document(buffer) -> SimpleDocTemplate:
+    """Letter page with the standard margins"""
+    return SimpleDocTemplate(
+        buffer,
+        pagesize=PAGE_SIZE,
+        rightMargin=PAGE_MARGIN,
+        leftMargin=PAGE_MARGIN,
+        topMargin=PAGE_MARGIN,
+        bottomMargin=PAGE_MARGIN
+    )
+
+
+@lru_cache(maxsize=None)
+def get_styles(theme: str = DEFAULT_THEME) -> Dict[str, ParagraphStyle]:
+    """All paragraph styles used by the exporters, built once per theme"""
+    palette = THEMES[theme]
+    base = getSampleStyleSheet()
+
+    return {
+        'title': ParagraphStyle(
+            'CustomTitle',
+            parent=base['Heading1'],
+            fontSize=24,
+            textColor=HexColor(palette['title']),
+            spaceAfter=6,
+            alignment=TA_CENTER,
+            fontName=palette['font_bold']
+        ),
+        'subtitle': ParagraphStyle(
+            'CustomSubtitle',
+            parent=base['Normal'],
+            fontSize=14,
+            textColor=HexColor(palette['muted']),
+            spaceAfter=20,
+            alignment=TA_CENTER,
+            fontName=palette['font_italic']
+        ),
+        'subtitle_compact': ParagraphStyle(
+            'CustomSubtitleCompact',
+            parent=base['Normal'],
+            fontSize=14,
+            textColor=HexColor(palette['muted']),
+            spaceAfter=12,
+            alignment=TA_CENTER,
+            fontName=palette['font_italic']
+        ),
+        'heading': ParagraphStyle(
+            'CustomHeading',
+            parent=base['Heading2'],
+            fontSize=16,
+            textColor=HexColor(palette['heading']),
+            spaceAfter=10,
+            spaceBefore=16,
+            fontName=palette['font_bold']
+        ),
+        'section_title': ParagraphStyle(
+            'SectionTitle',
+            parent=base['Heading2'],
+            fontSize=16,
+            textColor=HexColor(palette['heading']),
+            spaceAfter=8,
+            spaceBefore=16,
+            fontName=palette['font_bold']
+        ),
+        'subheading': ParagraphStyle(
+            'CustomSubheading',
+            parent=base['Heading3'],
+            fontSize=14,
+            textColor=HexColor(palette['subheading']),
+            spaceAfter=8,
+            spaceBefore=12,
+            fontName=palette['font_bold']
+        ),
+        'body': ParagraphStyle(
+            'CustomBody',
+            parent=base['Normal'],
+            fontSize=11,
+            textColor=HexColor(palette['text']),
+            spaceAfter=10,
+            alignment=TA_JUSTIFY,
+            leading=14,
+            fontName=palette['font']
+        ),
+        'instructions': ParagraphStyle(
+            'Instructions',
+            parent=base['Normal'],
+            fontSize=11,
+            textColor=HexColor(palette['text']),
+            spaceAfter=12,
+            leftIndent=20,
+            rightIndent=20,
+            alignment=TA_JUSTIFY,
+            fontName=palette['font']
+        ),
+        'question': ParagraphStyle(
+            'Question',
+            parent=base['Normal'],
+            fontSize=11,
+            textColor=HexColor(palette['question']),
+            spaceAfter=4,
+            leftIndent=10,
+            fontName=palette['font']
+        ),
+        'passage': ParagraphStyle(
+            'Passage',
+            parent=base['Normal'],
+            fontSize=11,
+            textColor=HexColor(palette['text']),
+            spaceAfter=8,
+            alignment=TA_JUSTIFY,
+            leading=14,
+            fontName=palette['font']
+        ),
+    }
+
+
+@lru_cache(maxsize=None)
+def get_table_style(name: str, theme: str = DEFAULT_THEME) -> TableStyle:
+    """Named table styles, built once per theme"""
+    palette = THEMES[theme]
+
+    if name == 'labels':
+        return TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), palette['font']),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('TEXTCOLOR', (0, 0), (-1, -1), HexColor(palette['question'])),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('TOPPADDING', (0, 0), (-1, -1), 6),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+        ])
+    if name == 'grid':
+        # Bold, shaded header row with a light grid
+        return TableStyle([
+            ('FONTNAME', (0, 0), (-1, 0), palette['font_bold']),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('FONTNAME', (0, 1), (-1, -1), palette['font']),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('TEXTCOLOR', (0, 0), (-1, -1), HexColor(palette['question'])),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('GRID', (0, 0), (-1, -1), 0.5, HexColor(palette['grid'])),
+            ('BACKGROUND', (0, 0), (-1, 0), HexColor(palette['header_fill'])),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ])
+    raise ValueError(f"Unknown table style: {name}")
+
+
+# ---------- Font metrics ----------
+
+@lru_cache(maxsize=4096)
+def string_width(text: str, font_name: str, font_size: float) -> float:
+    """Cached pdfmetrics.stringWidth - exporters measure the same strings on every render"""
+    return pdfmetrics.stringWidth(text, font_name, font_size)
+
+
+@lru_cache(maxsize=None)
+def rule_text(style_name: str, width: float = FRAME_WIDTH, theme: str = DEFAULT_THEME) -> str:
+    """Underscore rule that fills `width` (minus the style's indents) on a single line"""
+    style = get_styles(theme)[style_name]
+    available = width - style.leftIndent - style.rightIndent
+    count = int(available // string_width('_', style.fontName, style.fontSize))
+    return '_' * max(count, 1)
+
+
+# ---------- Flowable builders ----------
+
+def heading(text: str, level: str = 'heading', theme: str = DEFAULT_THEME) -> Paragraph:
+    """Bold heading paragraph ('heading', 'subheading' or 'section_title')"""
+    return Paragraph(f'<b>{text}</b>', get_styles(theme)[level])
+
+
+def paragraph(text: str, style: str = 'body', theme: str = DEFAULT_THEME) -> Paragraph:
+    return Paragraph(text, get_styles(theme)[style])
+
+
+def bullet(text: str, style: str = 'body', theme: str = DEFAULT_THEME) -> Paragraph:
+    return Paragraph(f'• {text}', get_styles(theme)[style])
+
+
+def image(image_data: Optional[str], width: float, height: float, space_after: float = 0.15*inch) -> List:
+    """
+    Image flowable (plus trailing space) from base64 image data
+    Returns [] when there's no image or it can't be decoded, so callers can always extend()
+    """
+    if not image_data:
+        return []
+    img_stream = base64_to_stream(image_data)
+    if not img_stream:
+        return []
+    try:
+        return [RLImage(img_stream, width=width, height=height), Spacer(1, space_after)]
+    except Exception as e:
+        log.warning("Could not add image: %s", e)
+        return []
+
+
+def table(data: List[List[str]], col_widths: List[float], style: str = 'grid',
+          extra_style: Optional[List] = None, theme: str = DEFAULT_THEME) -> Table:
+    """Table with a named cached style, plus optional per-table style commands"""
+    result = Table(data, colWidths=col_widths)
+    result.setStyle(get_table_style(style, theme))
+    if extra_style:
+        result.setStyle(TableStyle(extra_style))
+    return result
+
+
+def base64_to_stream(base64_data: str) -> Optional[io.BytesIO]:
+    """Convert base64 image data to BytesIO stream"""
+    try:
+        if ',' in base64_data:
+            base64_data = base64_data.split(',')[1]
+        image_bytes = base64.b64decode(base64_data)
+        return io.BytesIO(image_bytes)
+    except Exception as e:
+        log.warning("Could not decode image: %s", e)
+        return None
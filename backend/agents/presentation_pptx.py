@@ -0,0 +1,412 @@
+"""
+Presentation PPTX Export
+Renders a generated presentation to PPTX - imported on first export so
+python-pptx isn't loaded by processes that never render
+
+Built slides are cached per process, keyed by a hash of the slide's content and
+its image. Re-exporting after an edit copies the cached slide XML and re-links
+its picture instead of rebuilding the slide, so only changed slides are built.
+Chart slides are always rebuilt - their chart XML and embedded workbook live in
+separate parts.
+"""
+
+import pptx
+from pptx import Presentation
+from pptx.util import Inches, Pt
+from pptx.enum.text import PP_ALIGN
+from pptx.chart.data import CategoryChartData
+from pptx.enum.chart import XL_CHART_TYPE
+from pptx.dml.color import RGBColor
+from pptx.oxml.ns import qn
+from collections import OrderedDict
+from copy import deepcopy
+from functools import lru_cache
+import hashlib
+import io
+import json
+import os
+import threading
+from typing import BinaryIO, Dict, Any, Optional
+from services.log import get_logger, sampled
+from .export_file import new_export_file
+
+log = get_logger('pptx')
+
+SLIDE_CACHE_SIZE = int(os.getenv('PPTX_SLIDE_CACHE_SIZE', '256'))
+# Bump when a slide builder changes so stale cached slides aren't reused
+SLIDE_CACHE_VERSION = '1'
+UNCACHED_SLIDE_TYPES = ('chart',)
+
+# slide key -> {'cSld': slide XML element, 'image': image bytes or None}
+_slide_cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+_slide_cache_lock = threading.Lock()
+_slide_cache_stats = {'hits': 0, 'misses': 0}
+
+
+def render_presentation_pptx(presentation_data: Dict[str, Any], images: Dict[str, str]) -> BinaryIO:
+    """Create a PPTX file from presentation data and images - matching HTML exactly"""
+    
+    # Create a blank presentation (no template) - the base package is read from disk once
+    prs = Presentation(io.BytesIO(_template_bytes()))
+    prs.slide_width = Inches(10)  # 16:9 aspect ratio
+    prs.slide_height = Inches(5.625)
+    # Define colors to match HTML
+    primary_color = RGBColor(16, 185, 129)  # emerald-500
+    accent_color = RGBColor(20, 184, 166)   # teal-500
+    text_color = RGBColor(17, 24, 39)       # gray-900
+    
+    # Create slides
+    slides_data = presentation_data.get('slides', [])
+    for i, slide_info in enumerate(slides_data):
+        slide_type = slide_info.get('type', 'content')
+        image_key = f"slide_{i}"
+        image_data = images.get(image_key)
+        
+        key = None
+        if slide_type not in UNCACHED_SLIDE_TYPES:
+            key = _slide_key(slide_type, slide_info, image_data)
+            cached = _get_cached_slide(key)
+            if cached:
+                log.debug("Reusing slide %d/%d: %s", i + 1, len(slides_data), slide_type,
+                          extra=sampled('pptx.slide', 0.1))
+                _add_cached_slide(prs, cached)
+                continue
+        
+        log.debug("Creating slide %d/%d: %s", i + 1, len(slides_data), slide_type,
+                  extra=sampled('pptx.slide', 0.1))
+        
+        if slide_type == 'title':
+            _create_title_slide_with_image(prs, slide_info, image_data, primary_color, accent_color)
+        elif slide_type == 'section':
+            _create_section_slide_with_image(prs, slide_info, image_data, primary_color, accent_color)
+        elif slide_type == 'content':
+            _create_content_slide_with_image(prs, slide_info, image_data, primary_color, text_color, accent_color)
+        elif slide_type == 'chart':
+            _create_chart_slide_with_image(prs, slide_info, image_data, primary_color, accent_color)
+        elif slide_type == 'closing':
+            _create_closing_slide_with_image(prs, slide_info, image_data, primary_color, accent_color)
+        else:
+            # Default to content slide
+            _create_content_slide_with_image(prs, slide_info, image_data, primary_color, text_color, accent_color)
+        
+        if key:
+            _cache_slide(key, prs.slides[-1])
+    
+    # Save to a spooled temp file
+    pptx_stream = new_export_file()
+    prs.save(pptx_stream)
+    pptx_stream.seek(0)
+    
+    return pptx_stream
+
+
+# ---------- Slide Cache ----------
+
+@lru_cache(maxsize=None)
+def _template_bytes() -> bytes:
+    """python-pptx's default (blank) package, read once per process"""
+    path = os.path.join(os.path.dirname(pptx.__file__), 'templates', 'default.pptx')
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _slide_key(slide_type: str, slide_info: Dict[str, Any], image_data: Optional[str]) -> str:
+    """Hash of everything a slide is built from: version, type, content and image"""
+    image_hash = hashlib.sha1(image_data.encode('utf-8')).hexdigest() if image_data else ''
+    content = json.dumps(slide_info, sort_keys=True, default=str)
+    return hashlib.sha1(f"{SLIDE_CACHE_VERSION}|{slide_type}|{content}|{image_hash}".encode('utf-8')).hexdigest()
+
+
+def _get_cached_slide(key: str) -> Optional[Dict[str, Any]]:
+    with _slide_cache_lock:
+        entry = _slide_cache.get(key)
+        if entry is None:
+            _slide_cache_stats['misses'] += 1
+            return None
+        _slide_cache.move_to_end(key)
+        _slide_cache_stats['hits'] += 1
+        return entry
+
+
+def _cache_slide(key: str, slide) -> None:
+    """Keep a copy of a freshly built slide's XML and picture bytes"""
+    if SLIDE_CACHE_SIZE <= 0:
+        return
+    image = None
+    blip = slide._element.cSld.find('.//' + qn('a:blip'))
+    if blip is not None:
+        image = slide.part.related_part(blip.get(qn('r:embed'))).blob
+    entry = {'cSld': deepcopy(slide._element.cSld), 'image': image}
+    with _slide_cache_lock:
+        _slide_cache[key] = entry
+        _slide_cache.move_to_end(key)
+        while len(_slide_cache) > SLIDE_CACHE_SIZE:
+            _slide_cache.popitem(last=False)
+
+
+def _add_cached_slide(prs, entry: Dict[str, Any]) -> None:
+    """Append a slide built from a cached entry, re-linking its picture in this package"""
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    cSld = deepcopy(entry['cSld'])
+    slide._element.replace(slide._element.cSld, cSld)
+    if entry['image'] is not None:
+        _image_part, rId = slide.part.get_or_add_image_part(io.BytesIO(entry['image']))
+        for blip in cSld.iter(qn('a:blip')):
+            blip.set(qn('r:embed'), rId)
+
+
+def get_slide_cache_stats() -> Dict[str, int]:
+    with _slide_cache_lock:
+        return {'size': len(_slide_cache), 'max_size': SLIDE_CACHE_SIZE, **_slide_cache_stats}
+
+
+def slide_cache_items():
+    """Snapshot of the cached (key, entry) pairs, for memory reports"""
+    with _slide_cache_lock:
+        return list(_slide_cache.items())
+
+
+def clear_slide_cache() -> None:
+    with _slide_cache_lock:
+        _slide_cache.clear()
+
+
+# ---------- Slide Builders with Images ----------
+
+def _create_title_slide_with_image(prs, slide_info, image_data, primary_color, accent_color):
+    """Create title slide matching HTML - emerald to teal gradient"""
+    # Create blank slide
+    blank_layout = prs.slide_layouts[6]  # Blank layout
+    slide = prs.slides.add_slide(blank_layout)
+    
+    # Add gradient background (emerald to teal)
+    background = slide.background
+    fill = background.fill
+    fill.gradient()
+    fill.gradient_angle = 45
+    fill.gradient_stops[0].color.rgb = RGBColor(16, 185, 129)  # emerald-500
+    fill.gradient_stops[1].color.rgb = RGBColor(20, 184, 166)  # teal-500
+
+    title_text = slide_info.get("title", "Title")
+    content = slide_info.get("content", "")
+    if isinstance(content, list):
+        content = " | ".join(str(x) for x in content)
+
+    # Add title - centered at top
+    title_box = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(1))
+    title_frame = title_box.text_frame
+    title_frame.text = title_text
+    title_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
+    title_frame.paragraphs[0].font.size = Pt(48)
+    title_frame.paragraphs[0].font.bold = True
+    title_frame.paragraphs[0].font.color.rgb = RGBColor(255, 255, 255)
+
+    # Add subtitle if exists
+    if content:
+        subtitle_box = slide.shapes.add_textbox(Inches(0.5), Inches(2.7), Inches(9), Inches(0.6))
+        subtitle_frame = subtitle_box.text_frame
+        subtitle_frame.text = str(content)
+        subtitle_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
+        subtitle_frame.paragraphs[0].font.size = Pt(24)
+        subtitle_frame.paragraphs[0].font.color.rgb = RGBColor(255, 255, 255)
+
+    # Add image at bottom if available
+    if image_data:
+        image_stream = _base64_to_stream(image_data)
+        if image_stream:
+            left, top, width = Inches(2.5), Inches(3.5), Inches(5)
+            slide.shapes.add_picture(image_stream, left, top, width=width)
+
+
+def _create_section_slide_with_image(prs, slide_info, image_data, primary_color, accent_color):
+    """Create section slide matching HTML - blue to indigo gradient"""
+    blank_layout = prs.slide_layouts[6]
+    slide = prs.slides.add_slide(blank_layout)
+    
+    # Add gradient background (blue to indigo)
+    background = slide.background
+    fill = background.fill
+    fill.gradient()
+    fill.gradient_angle = 45
+    fill.gradient_stops[0].color.rgb = RGBColor(59, 130, 246)  # blue-500
+    fill.gradient_stops[1].color.rgb = RGBColor(99, 102, 241)  # indigo-500
+
+    title_text = slide_info.get("title", "Section")
+
+    # Add title - centered
+    title_box = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(1))
+    title_frame = title_box.text_frame
+    title_frame.text = title_text
+    title_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
+    title_frame.paragraphs[0].font.size = Pt(48)
+    title_frame.paragraphs[0].font.bold = True
+    title_frame.paragraphs[0].font.color.rgb = RGBColor(255, 255, 255)
+
+    # Add image if available
+    if image_data:
+        image_stream = _base64_to_stream(image_data)
+        if image_stream:
+            left, top, width = Inches(2.5), Inches(3), Inches(5)
+            slide.shapes.add_picture(image_stream, left, top, width=width)
+
+
+def _create_content_slide_with_image(prs, slide_info, image_data, primary_color, text_color, accent_color):
+    """Create content slide matching HTML - white background with border"""
+    blank_layout = prs.slide_layouts[6]
+    slide = prs.slides.add_slide(blank_layout)
+    
+    # White background
+    background = slide.background
+    fill = background.fill
+    fill.solid()
+    fill.fore_color.rgb = RGBColor(255, 255, 255)
+
+    title_text = slide_info.get("title", "Slide")
+    content_items = slide_info.get("content", [])
+    if not isinstance(content_items, list):
+        content_items = [str(content_items)]
+
+    # Add title
+    title_box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(0.8))
+    title_frame = title_box.text_frame
+    title_frame.text = title_text
+    title_frame.paragraphs[0].font.size = Pt(32)
+    title_frame.paragraphs[0].font.bold = True
+    title_frame.paragraphs[0].font.color.rgb = RGBColor(17, 24, 39)  # gray-900
+
+    # Add bullet points on left
+    content_box = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(4.5), Inches(4))
+    content_frame = content_box.text_frame
+    content_frame.word_wrap = True
+    
+    for i, item in enumerate(content_items):
+        if i == 0:
+            p = content_frame.paragraphs[0]
+        else:
+            p = content_frame.add_paragraph()
+        p.text = f"• {str(item)}"
+        p.font.size = Pt(18)
+        p.font.color.rgb = RGBColor(55, 65, 81)  # gray-700
+        p.space_before = Pt(12)
+
+    # Add image on right if available
+    if image_data:
+        image_stream = _base64_to_stream(image_data)
+        if image_stream:
+            left, top, width = Inches(5.5), Inches(1.5), Inches(4)
+            slide.shapes.add_picture(image_stream, left, top, width=width)
+
+
+def _create_chart_slide_with_image(prs, slide_info, image_data, primary_color, accent_color):
+    """Create chart slide matching HTML - white background"""
+    blank_layout = prs.slide_layouts[6]
+    slide = prs.slides.add_slide(blank_layout)
+    
+    # White background
+    background = slide.background
+    fill = background.fill
+    fill.solid()
+    fill.fore_color.rgb = RGBColor(255, 255, 255)
+
+    title_text = slide_info.get("title", "Chart")
+
+    # Add title
+    title_box = slide.shapes.add_textbox(Inches(0.5), Inches(0.5), Inches(9), Inches(0.8))
+    title_frame = title_box.text_frame
+    title_frame.text = title_text
+    title_frame.paragraphs[0].font.size = Pt(32)
+    title_frame.paragraphs[0].font.bold = True
+    title_frame.paragraphs[0].font.color.rgb = RGBColor(17, 24, 39)
+
+    # Add chart on left side
+    chart_data_info = slide_info.get("chart_data", {}) or {}
+    chart_type_str = (chart_data_info.get("type") or "bar").lower()
+    chart_type_map = {
+        "bar": XL_CHART_TYPE.COLUMN_CLUSTERED,
+        "line": XL_CHART_TYPE.LINE,
+        "pie": XL_CHART_TYPE.PIE,
+    }
+    chart_type = chart_type_map.get(chart_type_str, XL_CHART_TYPE.COLUMN_CLUSTERED)
+
+    chart_data = CategoryChartData()
+    cats = chart_data_info.get("categories") or ["A", "B", "C"]
+    vals = chart_data_info.get("values") or [10, 20, 30]
+    chart_data.categories = cats
+    chart_data.add_series("Data", vals)
+
+    # Chart positioned on left side
+    x, y, cx, cy = Inches(0.5), Inches(1.5), Inches(4.5), Inches(4)
+    chart_shape = slide.shapes.add_chart(chart_type, x, y, cx, cy, chart_data)
+    chart = chart_shape.chart
+
+    title_txt = chart_data_info.get("title")
+    chart.has_title = bool(title_txt)
+    if title_txt:
+        chart.chart_title.text_frame.text = str(title_txt)
+        chart.chart_title.text_frame.paragraphs[0].font.size = Pt(18)
+
+    chart.has_legend = True
+
+    # Add image on right if available
+    if image_data:
+        image_stream = _base64_to_stream(image_data)
+        if image_stream:
+            left, top, width = Inches(5.5), Inches(1.5), Inches(4)
+            slide.shapes.add_picture(image_stream, left, top, width=width)
+
+
+def _create_closing_slide_with_image(prs, slide_info, image_data, primary_color, accent_color):
+    """Create closing slide matching HTML - purple to pink gradient"""
+    blank_layout = prs.slide_layouts[6]
+    slide = prs.slides.add_slide(blank_layout)
+    
+    # Add gradient background (purple to pink)
+    background = slide.background
+    fill = background.fill
+    fill.gradient()
+    fill.gradient_angle = 45
+    fill.gradient_stops[0].color.rgb = RGBColor(168, 85, 247)  # purple-500
+    fill.gradient_stops[1].color.rgb = RGBColor(236, 72, 153)  # pink-500
+
+    title_text = slide_info.get("title", "Thank You!")
+    content = slide_info.get("content")
+    if isinstance(content, list):
+        content = "\n".join(str(x) for x in content)
+
+    # Add title - centered
+    title_box = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(1))
+    title_frame = title_box.text_frame
+    title_frame.text = title_text
+    title_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
+    title_frame.paragraphs[0].font.size = Pt(54)
+    title_frame.paragraphs[0].font.bold = True
+    title_frame.paragraphs[0].font.color.rgb = RGBColor(255, 255, 255)
+
+    # Add content if exists
+    if content:
+        content_box = slide.shapes.add_textbox(Inches(0.5), Inches(2.7), Inches(9), Inches(0.6))
+        content_frame = content_box.text_frame
+        content_frame.text = str(content)
+        content_frame.paragraphs[0].alignment = PP_ALIGN.CENTER
+        content_frame.paragraphs[0].font.size = Pt(24)
+        content_frame.paragraphs[0].font.color.rgb = RGBColor(255, 255, 255)
+
+    # Add image if available
+    if image_data:
+        image_stream = _base64_to_stream(image_data)
+        if image_stream:
+            left, top, width = Inches(2.5), Inches(3.5), Inches(5)
+            slide.shapes.add_picture(image_stream, left, top, width=width)
+
+
+def _base64_to_stream(base64_data: str) -> Optional[io.BytesIO]:
+    """Convert base64 image data to BytesIO stream"""
+    try:
+        import base64
+        if ',' in base64_data:
+            base64_data = base64_data.split(',')[1]
+        image_bytes = base64.b64decode(base64_data)
+        return io.BytesIO(image_bytes)
+    except Exception as e:
+        log.warning("Could not decode slide image: %s", e)
+        return None
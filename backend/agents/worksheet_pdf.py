@@ -0,0 +1,291 @@
+"""
+Worksheet PDF Export
+Renders a generated worksheet to PDF - imported on first export so reportlab
+isn't loaded by processes that never render
+"""
+
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, Spacer, KeepTogether
+from typing import BinaryIO, Dict, List, Any
+from . import pdf_engine as pdf
+from services.log import get_logger, sampled
+from .export_file import new_export_file
+
+log = get_logger('worksheet_pdf')
+
+
+def render_worksheet_pdf(worksheet_data: Dict[str, Any], images: Dict[str, str]) -> BinaryIO:
+    """Create a high-quality PDF from worksheet data and images"""
+    
+    pdf_buffer = new_export_file()
+    doc = pdf.new_document(pdf_buffer)
+    
+    # Container for PDF elements
+    story = []
+    
+    # Shared, per-process styles
+    styles = pdf.get_styles()
+    
+    # Header
+    story.append(Paragraph(worksheet_data.get('title', 'Worksheet'), styles['title']))
+    
+    subtitle_parts = []
+    if worksheet_data.get('subtitle'):
+        subtitle_parts.append(worksheet_data['subtitle'])
+    if worksheet_data.get('grade_level'):
+        subtitle_parts.append(worksheet_data['grade_level'])
+    if worksheet_data.get('subject'):
+        subtitle_parts.append(worksheet_data['subject'])
+    
+    if subtitle_parts:
+        story.append(Paragraph(' • '.join(subtitle_parts), styles['subtitle_compact']))
+    
+    # Instructions box
+    if worksheet_data.get('instructions'):
+        instructions_text = f"<b>Instructions:</b> {worksheet_data['instructions']}"
+        if worksheet_data.get('estimated_time'):
+            instructions_text += f" <i>(Estimated time: {worksheet_data['estimated_time']})</i>"
+        story.append(Paragraph(instructions_text, styles['instructions']))
+    
+    story.append(Spacer(1, 0.2*inch))
+    
+    # Process sections
+    sections = worksheet_data.get('sections', [])
+    for section_idx, section in enumerate(sections):
+        section_type = section.get('type', 'short_answer')
+        image_key = f'section_{section_idx}'
+        image_data = images.get(image_key)
+        
+        log.debug("Creating section %d/%d: %s", section_idx + 1, len(sections), section_type,
+                  extra=sampled('pdf.section', 0.1))
+        
+        # Section elements (to keep together when possible)
+        section_elements = []
+        
+        # Section title
+        section_elements.append(Paragraph(section.get('title', f'Section {section_idx+1}'), styles['section_title']))
+        
+        # Section-specific instructions
+        if section.get('instructions'):
+            section_elements.append(Paragraph(f"<i>{section['instructions']}</i>", styles['instructions']))
+            section_elements.append(Spacer(1, 0.1*inch))
+        
+        # Render based on type (unknown types render as short answer)
+        renderer = SECTION_RENDERERS.get(section_type, _render_short_answer)
+        section_elements.extend(renderer(section, styles, image_data))
+        
+        # Add image if available and not already added
+        if image_data and section_type not in SECTIONS_WITH_IMAGES:
+            image_elements = pdf.image(image_data, width=4*inch, height=3*inch, space_after=0)
+            if image_elements:
+                section_elements.append(Spacer(1, 0.1*inch))
+                section_elements.extend(image_elements[:1])
+        
+        # Try to keep section together, but allow page break if needed
+        try:
+            story.append(KeepTogether(section_elements))
+        except:
+            story.extend(section_elements)
+        
+        # Add space between sections
+        if section_idx < len(sections) - 1:
+            story.append(Spacer(1, 0.3*inch))
+    
+    # Build PDF
+    doc.build(story)
+    pdf_buffer.seek(0)
+    
+    return pdf_buffer
+
+
+# Section renderers - each returns the section's flowables
+
+def _render_practice_mastery(section: Dict, styles: Dict, image_data) -> List:
+    """Render practice/mastery worksheet items"""
+    elements = []
+    items = section.get('items', [])
+    
+    for idx, item in enumerate(items):
+        question_text = f"{idx + 1}. {item.get('question', '')}"
+        elements.append(Paragraph(question_text, styles['question']))
+        
+        # Add answer space based on size
+        answer_space = item.get('answer_space', 'small')
+        space_map = {'small': 0.3, 'medium': 0.5, 'large': 0.8}
+        elements.append(Spacer(1, space_map.get(answer_space, 0.3)*inch))
+    
+    return elements
+
+
+def _render_instructional_reading(section: Dict, styles: Dict, image_data) -> List:
+    """Render reading comprehension section"""
+    elements = []
+    
+    # Add image first if available
+    elements.extend(pdf.image(image_data, width=5*inch, height=3*inch))
+    
+    # Add passage
+    passage = section.get('passage', '')
+    if passage:
+        # Split into paragraphs
+        paragraphs = passage.split('\n\n') if '\n\n' in passage else [passage]
+        for para in paragraphs:
+            if para.strip():
+                elements.append(Paragraph(para.strip(), styles['passage']))
+                elements.append(Spacer(1, 0.1*inch))
+    
+    elements.append(Spacer(1, 0.2*inch))
+    
+    # Add questions
+    questions = section.get('questions', [])
+    for idx, q in enumerate(questions):
+        question_text = f"{idx + 1}. {q.get('question', '')}"
+        if q.get('points'):
+            question_text += f" <i>({q['points']} points)</i>"
+        elements.append(Paragraph(question_text, styles['question']))
+        elements.append(Spacer(1, 0.5*inch))
+    
+    return elements
+
+
+def _render_diagram_labeling(section: Dict, styles: Dict, image_data) -> List:
+    """Render diagram labeling section"""
+    elements = []
+    
+    # Add diagram image
+    elements.extend(pdf.image(image_data, width=5.5*inch, height=4*inch))
+    
+    # Add label blanks
+    labels = section.get('labels', [])
+    if labels:
+        elements.append(Paragraph("<b>Labels to use:</b>", styles['question']))
+        elements.append(Spacer(1, 0.05*inch))
+        
+        # Create table for labels
+        label_data = []
+        row = []
+        for idx, label in enumerate(labels):
+            row.append(f"{idx + 1}. _____________")
+            if len(row) == 3:
+                label_data.append(row)
+                row = []
+        if row:
+            label_data.append(row)
+        
+        if label_data:
+            elements.append(pdf.table(label_data, [2.2*inch]*3, style='labels'))
+    
+    return elements
+
+
+def _render_matching(section: Dict, styles: Dict, image_data) -> List:
+    """Render matching section"""
+    column_a = section.get('column_a', [])
+    column_b = section.get('column_b', [])
+    
+    # Create matching table
+    table_data = [['Column A', '', 'Column B']]
+    
+    max_len = max(len(column_a), len(column_b))
+    for i in range(max_len):
+        item_a = f"{i + 1}. {column_a[i]}" if i < len(column_a) else ""
+        item_b = f"{chr(65 + i)}. {column_b[i]}" if i < len(column_b) else ""
+        table_data.append([item_a, "____", item_b])
+    
+    # Answer blanks are centred in the middle column
+    return [pdf.table(table_data, [2.5*inch, 0.5*inch, 2.5*inch], style='grid',
+                      extra_style=[('ALIGN', (1, 1), (1, -1), 'CENTER')])]
+
+
+def _render_fill_in_blank(section: Dict, styles: Dict, image_data) -> List:
+    """Render fill in the blank section"""
+    elements = []
+    items = section.get('items', [])
+    
+    for idx, item in enumerate(items):
+        question = item.get('question', '')
+        # Replace underscores with longer blanks for better visibility
+        question = question.replace('____', '_' * 20)
+        question = question.replace('___', '_' * 15)
+        question = question.replace('__', '_' * 10)
+        
+        question_text = f"{idx + 1}. {question}"
+        elements.append(Paragraph(question_text, styles['question']))
+        elements.append(Spacer(1, 0.15*inch))
+    
+    return elements
+
+
+def _render_short_answer(section: Dict, styles: Dict, image_data) -> List:
+    """Render short answer section"""
+    elements = []
+    items = section.get('items', [])
+    
+    for idx, item in enumerate(items):
+        question_text = f"{idx + 1}. {item.get('question', '')}"
+        if item.get('points'):
+            question_text += f" <i>({item['points']} points)</i>"
+        
+        elements.append(Paragraph(question_text, styles['question']))
+        
+        # Add answer lines
+        answer_space = item.get('answer_space', 'medium')
+        space_map = {'small': 0.4, 'medium': 0.7, 'large': 1.0}
+        elements.append(Spacer(1, space_map.get(answer_space, 0.7)*inch))
+    
+    return elements
+
+
+def _render_creative_writing(section: Dict, styles: Dict, image_data) -> List:
+    """Render creative writing section"""
+    elements = []
+    
+    # Add inspiring image
+    elements.extend(pdf.image(image_data, width=5*inch, height=3*inch))
+    
+    # Add prompt
+    prompt = section.get('prompt', '')
+    if prompt:
+        elements.append(Paragraph(f"<b>Prompt:</b> {prompt}", styles['passage']))
+        elements.append(Spacer(1, 0.2*inch))
+    
+    # Add writing lines - sized from cached font metrics to fill exactly one line
+    writing_line = pdf.rule_text('passage')
+    num_lines = section.get('lines', 15)
+    for _ in range(num_lines):
+        elements.append(Paragraph(writing_line, styles['passage']))
+        elements.append(Spacer(1, 0.15*inch))
+    
+    return elements
+
+
+def _render_visual_tracing(section: Dict, styles: Dict, image_data) -> List:
+    """Render visual/tracing section for young learners"""
+    elements = []
+    
+    # Add visual elements
+    elements.extend(pdf.image(image_data, width=5.5*inch, height=4*inch))
+    
+    # Add tracing/matching items
+    items = section.get('items', [])
+    for idx, item in enumerate(items):
+        question_text = f"{idx + 1}. {item.get('question', '')}"
+        elements.append(Paragraph(question_text, styles['question']))
+        elements.append(Spacer(1, 0.4*inch))
+    
+    return elements
+
+
+SECTION_RENDERERS = {
+    'practice_mastery': _render_practice_mastery,
+    'instructional_reading': _render_instructional_reading,
+    'diagram_labeling': _render_diagram_labeling,
+    'matching': _render_matching,
+    'fill_in_blank': _render_fill_in_blank,
+    'short_answer': _render_short_answer,
+    'creative_writing': _render_creative_writing,
+    'visual_tracing': _render_visual_tracing,
+}
+
+# Section types whose renderer already places the section image
+SECTIONS_WITH_IMAGES = ('instructional_reading', 'diagram_labeling', 'creative_writing', 'visual_tracing')
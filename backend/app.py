@@ -1,11 +1,16 @@
-from flask import Flask, request, jsonify, Response, stream_with_context
+import time
+
+# Boot timing - reported once the module has finished loading
+BOOT_STARTED = time.perf_counter()
+
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import os
+import sys
 from dotenv import load_dotenv
 import uuid
 from typing import Dict, Any
 import json
-import time
 
 # Load environment variables FIRST before importing anything that uses Firebase
 load_dotenv()
@@ -13,41 +18,174 @@ load_dotenv()
 # Now import routes and agents (after env vars are loaded)
 from agents import LessonGeneratorAgent, ImageGeneratorAgent, LessonEditorAgent, PresentationGeneratorAgent, WorksheetGeneratorAgent
 from agents.agentic_editor import AgenticLessonEditor
+from agents.export_file import file_size, iter_file
 from routes.resources import resources_bp
 from routes.students import students_bp
-from routes.subscription import subscription_bp, check_subscription_access
-from services.firebase_service import FirebaseService
-from services.subscription_service import SubscriptionService
+from routes.export import export_bp
+from routes.admin import admin_bp
+from routes.auth import request_is_admin
+from routes.subscription import subscription_bp, check_subscription_access, subscription_service
+from services.firebase_service import firebase_service
+from services.export_service import export_service
+from services.auth_service import auth_service
+from services import memory, metrics, tracing
+from services.governor import governor
+from services.resilience import resilient
+from services.profiling import profiler, PROFILE_ID_HEADER, requested as profiling_requested
+from services.log import configure_logging, get_logger, new_request_id, REQUEST_ID_HEADER, get_stats as get_log_stats
+
+configure_logging()
+log = get_logger('api')
+
+boot_timings = {'imports': time.perf_counter() - BOOT_STARTED}
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=['X-Trace-Id', REQUEST_ID_HEADER])
 
 # Register blueprints
 app.register_blueprint(resources_bp, url_prefix='/api')
 app.register_blueprint(students_bp, url_prefix='/api')
 app.register_blueprint(subscription_bp, url_prefix='/api')
+app.register_blueprint(export_bp, url_prefix='/api')
+app.register_blueprint(admin_bp, url_prefix='/api')
 
 # Initialize agents
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 if not GEMINI_API_KEY:
     raise ValueError("GEMINI_API_KEY not found in environment variables. Please create a .env file with your API key.")
 
+# Agents share one genai client, created on the first model call
+boot_started = time.perf_counter()
 lesson_generator = LessonGeneratorAgent(GEMINI_API_KEY)
 image_generator = ImageGeneratorAgent(GEMINI_API_KEY)
 lesson_editor = LessonEditorAgent(GEMINI_API_KEY)
 agentic_editor = AgenticLessonEditor(GEMINI_API_KEY)
 presentation_generator = PresentationGeneratorAgent(GEMINI_API_KEY)
 worksheet_generator = WorksheetGeneratorAgent(GEMINI_API_KEY)
+boot_timings['agents'] = time.perf_counter() - boot_started
 
-# Initialize Firebase service
-firebase_service = FirebaseService()
-subscription_service = SubscriptionService(firebase_service)
+# Exporters - downloads go through the export cache, and with EXPORT_PRERENDER=true
+# finished generations/edits are rendered in the background ahead of the download
+PPTX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.presentationml.presentation'
+export_service.register('lesson', lesson_generator.create_pdf, 'pdf', 'application/pdf')
+export_service.register('presentation', presentation_generator.create_pptx, 'pptx', PPTX_MIMETYPE)
+export_service.register('worksheet', worksheet_generator.create_pdf, 'pdf', 'application/pdf')
+
+# Firebase initializes on first use (firebase_service is the process-wide instance;
+# subscription_service is shared with the subscription routes so webhook
+# invalidations reach the entitlement cache used by check_subscription_access).
+# Set FIREBASE_EAGER_INIT=true to connect during boot instead.
+if os.getenv('FIREBASE_EAGER_INIT', 'false').lower() == 'true':
+    boot_started = time.perf_counter()
+    firebase_service.initialize()
+    boot_timings['firebase'] = time.perf_counter() - boot_started
 
 # In-memory storage for lessons, presentations, and worksheets (in production, use a database)
 lessons_store: Dict[str, Dict[str, Any]] = {}
 presentations_store: Dict[str, Dict[str, Any]] = {}
 worksheets_store: Dict[str, Dict[str, Any]] = {}
 
+def export_response(stream, mimetype: str, filename: str) -> Response:
+    """Stream a rendered export file to the client in chunks, closing it afterwards"""
+    response = Response(
+        iter_file(stream),
+        mimetype=mimetype,
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Content-Length': str(file_size(stream))
+        },
+        direct_passthrough=True
+    )
+    response.call_on_close(stream.close)
+    return response
+
+def sse_response(events, content_type: str) -> Response:
+    """
+    Server-sent event response for a generation/edit stream
+    The stream runs in its own trace (id in the X-Trace-Id header and init events)
+    and is timed into the SSE metrics; a profiled request keeps profiling while it streams
+    """
+    if g.get('profile') is not None:
+        events = profiler.profiled_stream(events, g.profile)
+    root = tracing.start_trace(request.endpoint or 'stream', content_type=content_type)
+    events = metrics.timed_stream(tracing.traced_stream(events, root), content_type)
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['X-Trace-Id'] = root.trace_id
+    return response
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.request_id = new_request_id(request.headers.get(REQUEST_ID_HEADER))
+    # Admins can profile a single slow request with X-Profile: 1 or ?profile=1
+    if profiling_requested(request.headers, request.args) and request_is_admin():
+        g.profile = profiler.start(request.endpoint, g.request_id)
+        if g.profile is not None:
+            g.profile.enable()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        metrics.HTTP_SECONDS.observe(
+            time.perf_counter() - started,
+            endpoint=request.endpoint or 'unknown',
+            method=request.method,
+            status=response.status_code
+        )
+    if g.get('request_id'):
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+    if 'profile' in g:
+        if g.profile is not None:
+            g.profile.disable()
+        response.headers[PROFILE_ID_HEADER] = g.profile.profile_id if g.profile is not None else 'busy'
+    return response
+
+@app.teardown_request
+def finish_profile(exc):
+    # Streams are torn down once they finish, so this also covers SSE responses
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profile.finish()
+
+# Cache stats are exposed as gauges next to the latency histograms
+metrics.register_collector('export_cache', export_service.get_stats)
+metrics.register_collector('auth_token_cache', auth_service.get_cache_stats)
+metrics.register_collector('entitlement_cache', subscription_service.get_entitlement_cache_stats)
+metrics.register_collector('log_queue', get_log_stats)
+metrics.register_collector('profiler', profiler.get_stats)
+metrics.register_collector('genai_governor', governor.get_stats)
+metrics.register_collector('genai_retries', resilient.get_stats)
+
+def _slide_cache_stats():
+    # Only once the PPTX exporter has been loaded - don't import python-pptx for a scrape
+    presentation_pptx = sys.modules.get('agents.presentation_pptx')
+    return presentation_pptx.get_slide_cache_stats() if presentation_pptx else {}
+
+metrics.register_collector('pptx_slide_cache', _slide_cache_stats)
+
+# What each in-process store holds - /api/admin/memory
+memory.register_store('lessons_store', lambda: list(lessons_store.items()))
+memory.register_store('presentations_store', lambda: list(presentations_store.items()))
+memory.register_store('worksheets_store', lambda: list(worksheets_store.items()))
+memory.register_store('auth_token_cache', auth_service.token_cache.items)
+memory.register_store('entitlement_cache', subscription_service.entitlement_cache.items)
+
+def _slide_cache_items():
+    presentation_pptx = sys.modules.get('agents.presentation_pptx')
+    return presentation_pptx.slide_cache_items() if presentation_pptx else []
+
+memory.register_store('pptx_slide_cache', _slide_cache_items)
+
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+@app.route('/api/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Per-stage latency histograms and cache stats in the Prometheus text format"""
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return jsonify({"error": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
@@ -64,7 +202,7 @@ def generate_lesson():
             return jsonify({"error": "Topic is required"}), 400
         
         # Generate lesson structure
-        print(f"Generating lesson for topic: {topic}", flush=True)
+        log.info("Generating lesson", extra={'topic': topic})
         lesson_data = lesson_generator.generate_lesson(topic)
         
         # Generate a unique lesson ID
@@ -86,7 +224,7 @@ def generate_lesson():
         })
         
     except Exception as e:
-        print(f"Error in generate_lesson: {e}")
+        log.exception("generate_lesson failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/generate-lesson-stream', methods=['POST'])
@@ -114,10 +252,10 @@ def generate_lesson_stream():
             lesson_id = str(uuid.uuid4())
             
             # Step 1: Send initial structure immediately
-            yield f"data: {json.dumps({'type': 'init', 'lesson_id': lesson_id, 'topic': topic})}\n\n"
+            yield f"data: {json.dumps({'type': 'init', 'lesson_id': lesson_id, 'topic': topic, 'trace_id': tracing.current_trace_id()})}\n\n"
             
             # Step 2: Generate lesson structure
-            print(f"Generating lesson for topic: {topic}", flush=True)
+            log.info("Generating lesson", extra={'topic': topic})
             lesson_data = lesson_generator.generate_lesson(topic)
             lesson_data['id'] = lesson_id
             
@@ -137,11 +275,10 @@ def generate_lesson_stream():
             # Generate introduction image
             if 'introduction' in lesson_data and 'image_prompt' in lesson_data['introduction']:
                 prompt = lesson_data['introduction']['image_prompt']
-                print(f"Generating introduction image: {prompt}", flush=True)
+                log.debug("Generating introduction image: %s", prompt)
                 image_data = image_generator.generate_image(prompt, "educational")
                 if image_data:
                     lesson_store['images']['introduction'] = image_data
-                    print(f"Sending introduction image, length: {len(image_data)}", flush=True)
                     yield f"data: {json.dumps({'type': 'image', 'key': 'introduction', 'image': image_data})}\n\n"
             
             # Generate key concept images
@@ -149,7 +286,7 @@ def generate_lesson_stream():
                 for idx, concept in enumerate(lesson_data['key_concepts']):
                     if 'image_prompt' in concept and concept['image_prompt']:
                         prompt = concept['image_prompt']
-                        print(f"Generating key concept {idx} image: {prompt}", flush=True)
+                        log.debug("Generating key concept %d image: %s", idx, prompt)
                         image_data = image_generator.generate_image(prompt, "educational")
                         if image_data:
                             key = f'key_concept_{idx}'
@@ -161,7 +298,7 @@ def generate_lesson_stream():
                 for idx, section in enumerate(lesson_data['detailed_content']):
                     if 'image_prompt' in section and section['image_prompt']:
                         prompt = section['image_prompt']
-                        print(f"Generating detailed content {idx} image: {prompt}", flush=True)
+                        log.debug("Generating detailed content %d image: %s", idx, prompt)
                         image_data = image_generator.generate_image(prompt, "educational")
                         if image_data:
                             key = f'detailed_content_{idx}'
@@ -171,20 +308,22 @@ def generate_lesson_stream():
             # Generate activities image
             if 'activities' in lesson_data and 'image_prompt' in lesson_data['activities']:
                 prompt = lesson_data['activities']['image_prompt']
-                print(f"Generating activities image: {prompt}", flush=True)
+                log.debug("Generating activities image: %s", prompt)
                 image_data = image_generator.generate_image(prompt, "educational")
                 if image_data:
                     lesson_store['images']['activities'] = image_data
                     yield f"data: {json.dumps({'type': 'image', 'key': 'activities', 'image': image_data})}\n\n"
             
+            export_service.prerender('lesson', lesson_id, lesson_store['data'], lesson_store['images'])
+            
             # Step 5: Send completion
             yield f"data: {json.dumps({'type': 'complete'})}\n\n"
             
         except Exception as e:
-            print(f"Error in generate_lesson_stream: {e}", flush=True)
+            log.exception("generate_lesson_stream failed")
             yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
     
-    return Response(stream_with_context(generate()), mimetype='text/event-stream')
+    return sse_response(generate(), 'lesson')
 
 @app.route('/api/generate-images/<lesson_id>', methods=['POST'])
 def generate_images(lesson_id):
@@ -201,22 +340,20 @@ def generate_images(lesson_id):
         # Generate introduction image
         if 'introduction' in lesson_data and 'image_prompt' in lesson_data['introduction']:
             prompt = lesson_data['introduction']['image_prompt']
-            print(f"Generating introduction image: {prompt}", flush=True)
+            log.debug("Generating introduction image: %s", prompt)
             image_data = image_generator.generate_image(prompt, "educational")
-            print(f"Introduction image generated: {image_data is not None}", flush=True)
             if image_data:
                 lesson_store['images']['introduction'] = image_data
                 images_generated.append('introduction')
-                print(f"Introduction image stored successfully", flush=True)
             else:
-                print("WARNING: Introduction image generation returned None", flush=True)
+                log.warning("Introduction image generation returned nothing")
         
         # Generate key concept images
         if 'key_concepts' in lesson_data:
             for idx, concept in enumerate(lesson_data['key_concepts']):
                 if 'image_prompt' in concept and concept['image_prompt']:
                     prompt = concept['image_prompt']
-                    print(f"Generating key concept {idx} image: {prompt}")
+                    log.debug("Generating key concept %d image: %s", idx, prompt)
                     image_data = image_generator.generate_image(prompt, "educational")
                     if image_data:
                         lesson_store['images'][f'key_concept_{idx}'] = image_data
@@ -227,7 +364,7 @@ def generate_images(lesson_id):
             for idx, section in enumerate(lesson_data['detailed_content']):
                 if 'image_prompt' in section and section['image_prompt']:
                     prompt = section['image_prompt']
-                    print(f"Generating detailed content {idx} image: {prompt}")
+                    log.debug("Generating detailed content %d image: %s", idx, prompt)
                     image_data = image_generator.generate_image(prompt, "educational")
                     if image_data:
                         lesson_store['images'][f'detailed_content_{idx}'] = image_data
@@ -236,7 +373,7 @@ def generate_images(lesson_id):
         # Generate activities image
         if 'activities' in lesson_data and 'image_prompt' in lesson_data['activities']:
             prompt = lesson_data['activities']['image_prompt']
-            print(f"Generating activities image: {prompt}")
+            log.debug("Generating activities image: %s", prompt)
             image_data = image_generator.generate_image(prompt, "educational")
             if image_data:
                 lesson_store['images']['activities'] = image_data
@@ -249,7 +386,7 @@ def generate_images(lesson_id):
         })
         
     except Exception as e:
-        print(f"Error in generate_images: {e}")
+        log.exception("generate_images failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/lesson/<lesson_id>', methods=['GET'])
@@ -283,7 +420,7 @@ def get_lesson(lesson_id):
         return jsonify({"error": "Lesson not found"}), 404
         
     except Exception as e:
-        print(f"Error in get_lesson: {e}")
+        log.exception("get_lesson failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/lesson/<lesson_id>/download', methods=['GET'])
@@ -315,21 +452,15 @@ def download_lesson(lesson_id):
             images = resource.get('images', {})
         
         # Create PDF file
-        print(f"Creating PDF for lesson: {lesson_data.get('title', 'Untitled')}")
-        pdf_stream = lesson_generator.create_pdf(lesson_data, images)
+        log.debug("Creating PDF for lesson: %s", lesson_data.get('title', 'Untitled'))
+        pdf_stream = export_service.render('lesson', lesson_data, images)
         
         # Send file
-        filename = f"{lesson_data.get('title', 'lesson').replace(' ', '_')}.pdf"
-        return Response(
-            pdf_stream.getvalue(),
-            mimetype='application/pdf',
-            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
-        )
+        filename = export_service.filename('lesson', lesson_data)
+        return export_response(pdf_stream, 'application/pdf', filename)
         
     except Exception as e:
-        print(f"Error downloading lesson: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Downloading lesson failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/edit-lesson/<lesson_id>', methods=['POST'])
@@ -368,7 +499,7 @@ def edit_lesson(lesson_id):
             yield f"data: {json.dumps({'type': 'status', 'message': '🤖 Analyzing your request...'})}\n\n"
             
             # Process the edit request using the agentic editor
-            print(f"Processing edit request with agentic editor: {edit_request}")
+            log.debug("Processing edit request: %s", edit_request)
             updated_lesson, image_sections = agentic_editor.process_edit_request(
                 current_lesson, 
                 edit_request
@@ -380,8 +511,7 @@ def edit_lesson(lesson_id):
             if 'id' not in updated_lesson:
                 updated_lesson['id'] = lesson_id
             
-            print(f"Edit processed. Image sections to regenerate: {len(image_sections)}")
-            print(f"Image sections: {image_sections}")
+            log.debug("Edit processed, %d image(s) to regenerate", len(image_sections))
             
             # Step 3: Apply changes
             yield f"data: {json.dumps({'type': 'status', 'message': '✏️ Applying changes to lesson...'})}\n\n"
@@ -403,7 +533,8 @@ def edit_lesson(lesson_id):
                     
                     yield f"data: {json.dumps({'type': 'status', 'message': f'🖼️ Generating image {i+1}/{len(image_sections)}...'})}\n\n"
                     
-                    print(f"Regenerating image for {section} (index: {index}, sub_index: {sub_index}, style: {style}): {prompt}", flush=True)
+                    log.debug("Regenerating image for %s (index: %s, sub_index: %s, style: %s)",
+                              section, index, sub_index, style)
                     image_data = image_generator.generate_image(prompt, style)
                     
                     if image_data:
@@ -419,41 +550,39 @@ def edit_lesson(lesson_id):
                         
                         lesson_store['images'][key] = image_data
                         new_images[key] = image_data
-                        print(f"Image regenerated successfully for key: {key}", flush=True)
                         
                         # Stream the new image
                         yield f"data: {json.dumps({'type': 'image', 'key': key, 'image': image_data})}\n\n"
                     else:
-                        print(f"WARNING: Image regeneration failed for {section}", flush=True)
+                        log.warning("Image regeneration failed for %s", section)
             
             # Step 5: Save to Firebase
             yield f"data: {json.dumps({'type': 'status', 'message': '💾 Saving changes...'})}\n\n"
             
             try:
-                firebase_service.update_resource(lesson_id, {
+                # Only changed sections and regenerated images are written
+                image_urls = firebase_service.update_resource(lesson_id, {
                     'content': updated_lesson,
-                    'images': lesson_store['images']
-                })
-                print(f"Lesson {lesson_id} saved to Firebase successfully")
-                
-                # Sync in-memory store with Firebase to get the uploaded URLs
-                # This ensures subsequent fetches get the correct image URLs
-                updated_resource = firebase_service.get_resource(lesson_id)
-                if updated_resource:
-                    lesson_store['images'] = updated_resource.get('images', {})
-                    print(f"In-memory store synced with Firebase URLs")
+                    'images': new_images
+                }, merge_images=True)
+                if image_urls is not None:
+                    # Swap the base64 images for their uploaded URLs so subsequent
+                    # fetches get the correct image URLs
+                    lesson_store['images'].update(image_urls)
             except Exception as e:
-                print(f"Warning: Failed to save lesson to Firebase: {e}")
+                log.warning("Could not save lesson %s: %s", lesson_id, e)
+            
+            export_service.prerender('lesson', lesson_id, lesson_store['data'], lesson_store['images'])
             
             # Step 6: Complete
             yield f"data: {json.dumps({'type': 'lesson', 'lesson': updated_lesson})}\n\n"
             yield f"data: {json.dumps({'type': 'complete', 'message': '✅ Lesson updated successfully!'})}\n\n"
             
         except Exception as e:
-            print(f"Error in edit_lesson: {e}")
+            log.exception("edit_lesson failed")
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
     
-    return Response(generate(), mimetype='text/event-stream')
+    return sse_response(generate(), 'lesson')
 
 @app.route('/api/lessons', methods=['GET'])
 def list_lessons():
@@ -475,7 +604,7 @@ def list_lessons():
         })
         
     except Exception as e:
-        print(f"Error in list_lessons: {e}")
+        log.exception("list_lessons failed")
         return jsonify({"error": str(e)}), 500
 
 # ==================== Presentation Endpoints ====================
@@ -504,10 +633,10 @@ def generate_presentation_stream():
             presentation_id = str(uuid.uuid4())
             
             # Step 1: Send initial structure immediately
-            yield f"data: {json.dumps({'type': 'init', 'presentation_id': presentation_id, 'topic': topic})}\n\n"
+            yield f"data: {json.dumps({'type': 'init', 'presentation_id': presentation_id, 'topic': topic, 'trace_id': tracing.current_trace_id()})}\n\n"
             
             # Step 2: Generate presentation structure
-            print(f"Generating presentation for topic: {topic}", flush=True)
+            log.info("Generating presentation", extra={'topic': topic})
             presentation_data = presentation_generator.generate_presentation(topic)
             presentation_data['id'] = presentation_id
             
@@ -528,23 +657,23 @@ def generate_presentation_stream():
             for idx, slide in enumerate(slides):
                 if 'image_prompt' in slide and slide['image_prompt']:
                     prompt = slide['image_prompt']
-                    print(f"Generating image for slide {idx+1}/{len(slides)}: {prompt[:50]}...", flush=True)
+                    log.debug("Generating image for slide %d/%d: %s", idx + 1, len(slides), prompt[:50])
                     image_data = image_generator.generate_image(prompt, "realistic")
                     if image_data:
                         key = f'slide_{idx}'
                         presentation_store['images'][key] = image_data
                         yield f"data: {json.dumps({'type': 'image', 'key': key, 'image': image_data})}\n\n"
             
+            export_service.prerender('presentation', presentation_id, presentation_store['data'], presentation_store['images'])
+            
             # Step 5: Complete
             yield f"data: {json.dumps({'type': 'complete'})}\n\n"
             
         except Exception as e:
-            print(f"Error in generate_presentation_stream: {e}", flush=True)
-            import traceback
-            traceback.print_exc()
+            log.exception("generate_presentation_stream failed")
             yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
     
-    return Response(generate(), mimetype='text/event-stream')
+    return sse_response(generate(), 'presentation')
 
 @app.route('/api/presentation/<presentation_id>', methods=['GET'])
 def get_presentation(presentation_id):
@@ -577,7 +706,7 @@ def get_presentation(presentation_id):
         return jsonify({"error": "Presentation not found"}), 404
         
     except Exception as e:
-        print(f"Error in get_presentation: {e}")
+        log.exception("get_presentation failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/presentation/<presentation_id>/download', methods=['GET'])
@@ -609,21 +738,15 @@ def download_presentation(presentation_id):
             images = resource.get('images', {})
         
         # Create PPTX file
-        print(f"Creating PPTX for presentation: {presentation_data.get('title', 'Untitled')}")
-        pptx_stream = presentation_generator.create_pptx(presentation_data, images)
+        log.debug("Creating PPTX for presentation: %s", presentation_data.get('title', 'Untitled'))
+        pptx_stream = export_service.render('presentation', presentation_data, images)
         
         # Send file
-        filename = f"{presentation_data.get('title', 'presentation').replace(' ', '_')}.pptx"
-        return Response(
-            pptx_stream.getvalue(),
-            mimetype='application/vnd.openxmlformats-officedocument.presentationml.presentation',
-            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
-        )
+        filename = export_service.filename('presentation', presentation_data)
+        return export_response(pptx_stream, PPTX_MIMETYPE, filename)
         
     except Exception as e:
-        print(f"Error downloading presentation: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Downloading presentation failed")
         return jsonify({"error": str(e)}), 500
 
 # ==================== Worksheet Endpoints ====================
@@ -652,10 +775,10 @@ def generate_worksheet_stream():
             worksheet_id = str(uuid.uuid4())
             
             # Step 1: Send initial structure immediately
-            yield f"data: {json.dumps({'type': 'init', 'worksheet_id': worksheet_id, 'topic': topic})}\n\n"
+            yield f"data: {json.dumps({'type': 'init', 'worksheet_id': worksheet_id, 'topic': topic, 'trace_id': tracing.current_trace_id()})}\n\n"
             
             # Step 2: Generate worksheet structure
-            print(f"Generating worksheet for topic: {topic}", flush=True)
+            log.info("Generating worksheet", extra={'topic': topic})
             worksheet_data = worksheet_generator.generate_worksheet(topic)
             worksheet_data['id'] = worksheet_id
             
@@ -676,23 +799,23 @@ def generate_worksheet_stream():
             for idx, section in enumerate(sections):
                 if 'image_prompt' in section and section['image_prompt']:
                     prompt = section['image_prompt']
-                    print(f"Generating image for section {idx+1}/{len(sections)}: {prompt[:50]}...", flush=True)
+                    log.debug("Generating image for section %d/%d: %s", idx + 1, len(sections), prompt[:50])
                     image_data = image_generator.generate_image(prompt, "educational")
                     if image_data:
                         key = f'section_{idx}'
                         worksheet_store['images'][key] = image_data
                         yield f"data: {json.dumps({'type': 'image', 'key': key, 'image': image_data})}\n\n"
             
+            export_service.prerender('worksheet', worksheet_id, worksheet_store['data'], worksheet_store['images'])
+            
             # Step 5: Complete
             yield f"data: {json.dumps({'type': 'complete'})}\n\n"
             
         except Exception as e:
-            print(f"Error in generate_worksheet_stream: {e}", flush=True)
-            import traceback
-            traceback.print_exc()
+            log.exception("generate_worksheet_stream failed")
             yield f"data: {json.dumps({'type': 'error', 'error': str(e)})}\n\n"
     
-    return Response(generate(), mimetype='text/event-stream')
+    return sse_response(generate(), 'worksheet')
 
 @app.route('/api/worksheet/<worksheet_id>', methods=['GET'])
 def get_worksheet(worksheet_id):
@@ -725,7 +848,7 @@ def get_worksheet(worksheet_id):
         return jsonify({"error": "Worksheet not found"}), 404
         
     except Exception as e:
-        print(f"Error in get_worksheet: {e}")
+        log.exception("get_worksheet failed")
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/worksheet/<worksheet_id>/download', methods=['GET'])
@@ -757,21 +880,15 @@ def download_worksheet(worksheet_id):
             images = resource.get('images', {})
         
         # Create PDF file
-        print(f"Creating PDF for worksheet: {worksheet_data.get('title', 'Untitled')}")
-        pdf_stream = worksheet_generator.create_pdf(worksheet_data, images)
+        log.debug("Creating PDF for worksheet: %s", worksheet_data.get('title', 'Untitled'))
+        pdf_stream = export_service.render('worksheet', worksheet_data, images)
         
         # Send file
-        filename = f"{worksheet_data.get('title', 'worksheet').replace(' ', '_')}.pdf"
-        return Response(
-            pdf_stream.getvalue(),
-            mimetype='application/pdf',
-            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
-        )
+        filename = export_service.filename('worksheet', worksheet_data)
+        return export_response(pdf_stream, 'application/pdf', filename)
         
     except Exception as e:
-        print(f"Error downloading worksheet: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Downloading worksheet failed")
         return jsonify({"error": str(e)}), 500
 
 # ==================== Edit Endpoints for Presentations and Worksheets ====================
@@ -849,25 +966,25 @@ def edit_presentation(presentation_id):
             yield f"data: {json.dumps({'type': 'status', 'message': '💾 Saving changes...'})}\n\n"
             
             try:
-                firebase_service.update_resource(presentation_id, {
+                # Only changed sections and regenerated images are written
+                image_urls = firebase_service.update_resource(presentation_id, {
                     'content': updated_presentation,
-                    'images': presentation_store['images']
-                })
-                
-                updated_resource = firebase_service.get_resource(presentation_id)
-                if updated_resource:
-                    presentation_store['images'] = updated_resource.get('images', {})
+                    'images': new_images
+                }, merge_images=True)
+                if image_urls is not None:
+                    presentation_store['images'].update(image_urls)
             except Exception as e:
-                print(f"Warning: Failed to save presentation to Firebase: {e}")
+                log.warning("Could not save presentation %s: %s", presentation_id, e)
             
+            export_service.prerender('presentation', presentation_id, presentation_store['data'], presentation_store['images'])
             yield f"data: {json.dumps({'type': 'presentation', 'presentation': updated_presentation})}\n\n"
             yield f"data: {json.dumps({'type': 'complete', 'message': '✅ Presentation updated successfully!'})}\n\n"
             
         except Exception as e:
-            print(f"Error in edit_presentation: {e}")
+            log.exception("edit_presentation failed")
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
     
-    return Response(generate(), mimetype='text/event-stream')
+    return sse_response(generate(), 'presentation')
 
 @app.route('/api/edit-worksheet/<worksheet_id>', methods=['POST'])
 def edit_worksheet(worksheet_id):
@@ -942,29 +1059,35 @@ def edit_worksheet(worksheet_id):
             yield f"data: {json.dumps({'type': 'status', 'message': '💾 Saving changes...'})}\n\n"
             
             try:
-                firebase_service.update_resource(worksheet_id, {
+                # Only changed sections and regenerated images are written
+                image_urls = firebase_service.update_resource(worksheet_id, {
                     'content': updated_worksheet,
-                    'images': worksheet_store['images']
-                })
-                
-                updated_resource = firebase_service.get_resource(worksheet_id)
-                if updated_resource:
-                    worksheet_store['images'] = updated_resource.get('images', {})
+                    'images': new_images
+                }, merge_images=True)
+                if image_urls is not None:
+                    worksheet_store['images'].update(image_urls)
             except Exception as e:
-                print(f"Warning: Failed to save worksheet to Firebase: {e}")
+                log.warning("Could not save worksheet %s: %s", worksheet_id, e)
             
+            export_service.prerender('worksheet', worksheet_id, worksheet_store['data'], worksheet_store['images'])
             yield f"data: {json.dumps({'type': 'worksheet', 'worksheet': updated_worksheet})}\n\n"
             yield f"data: {json.dumps({'type': 'complete', 'message': '✅ Worksheet updated successfully!'})}\n\n"
             
         except Exception as e:
-            print(f"Error in edit_worksheet: {e}")
+            log.exception("edit_worksheet failed")
             yield f"data: {json.dumps({'type': 'error', 'message': str(e)})}\n\n"
     
-    return Response(generate(), mimetype='text/event-stream')
+    return sse_response(generate(), 'worksheet')
+
+# Boot time report - anything over the budget is worth a look with `python -X importtime app.py`
+BOOT_TIME_BUDGET = float(os.getenv('BOOT_TIME_BUDGET', '1.0'))
+boot_timings['total'] = time.perf_counter() - BOOT_STARTED
+log.info("Boot: %s", ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in boot_timings.items()),
+         extra={'boot_ms': {phase: round(seconds * 1000) for phase, seconds in boot_timings.items()}})
+if boot_timings['total'] > BOOT_TIME_BUDGET:
+    log.warning("Boot took %.2fs (budget %.2fs)", boot_timings['total'], BOOT_TIME_BUDGET)
 
 if __name__ == '__main__':
-    import sys
-    print("Starting Lesson Generator API...", flush=True)
-    print(f"Gemini API Key configured: {'Yes' if GEMINI_API_KEY else 'No'}", flush=True)
-    sys.stdout.flush()
+    log.info("Starting Lesson Generator API...")
+    log.info("Gemini API Key configured: %s", 'Yes' if GEMINI_API_KEY else 'No')
     app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
@@ -0,0 +1,282 @@
+"""
+Export Benchmark
+Times the PDF and PPTX exporters on synthetic documents of increasing size and
+records render time, peak memory and output size per case.
+
+Usage (from backend/):
+    python benchmarks/exports.py [--runs 3] [--filter deck] [--json]
+    python benchmarks/exports.py --save benchmarks/baselines/exports.json
+    python benchmarks/exports.py --compare benchmarks/baselines/exports.json [--threshold 0.25]
+
+Cases cover lessons with more concepts and sections, one worksheet per section
+renderer in agents/worksheet_pdf.SECTION_RENDERERS, and 5-50 slide decks with no,
+some or all slides illustrated at several image sizes. Images are noise PNGs
+(incompressible, so output sizes are an upper bound), cycling through
+DISTINCT_IMAGES per size.
+
+Time is the median of --runs renders; the PPTX slide cache is cleared before each
+one, so every render is cold. Peak memory is measured in a separate traced render
+(tracemalloc - Python allocations only, not Pillow's pixel buffers).
+--compare exits non-zero if a case got slower or its output larger by more than
+--threshold, so it can gate a CI job against a baseline from the same machine.
+"""
+
+import argparse
+import base64
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.fake_genai import synthetic_png  # noqa: E402
+
+PARAGRAPH = ('Photosynthesis converts light energy into chemical energy stored in glucose. '
+             'Chlorophyll in the chloroplasts absorbs red and blue light, and the energy drives '
+             'the reactions that split water and fix carbon dioxide from the air.')
+
+# Distinct images per size - identical images are stored once in a PPTX, so decks
+# cycle through several rather than repeating one
+DISTINCT_IMAGES = 8
+
+SLIDE_TYPES = ('title', 'section', 'content', 'content', 'chart', 'content', 'section', 'content')
+
+
+def image_uri(size: int, seed: int = 0) -> str:
+    return 'data:image/png;base64,' + base64.b64encode(synthetic_png(size, size, seed=seed)).decode('ascii')
+
+
+# ==================== Synthetic documents ====================
+
+def synthetic_lesson(concepts: int, sections: int, paragraphs: int = 2):
+    lesson = {
+        'title': 'Photosynthesis: How Plants Turn Light into Life',
+        'subtitle': 'A synthetic lesson for export benchmarks',
+        'introduction': {'text': '\n\n'.join([PARAGRAPH] * 3), 'image_prompt': 'leaf'},
+        'key_concepts': [{'title': f'Concept {i + 1}', 'description': PARAGRAPH} for i in range(concepts)],
+        'detailed_content': [{'heading': f'Section {i + 1}', 'paragraphs': [PARAGRAPH] * paragraphs}
+                             for i in range(sections)],
+        'activities': {'title': 'Practice Activities', 'items': [
+            {'title': f'Activity {i + 1}', 'description': PARAGRAPH, 'type': 'exercise'} for i in range(3)
+        ]},
+        'summary': {'text': PARAGRAPH, 'key_points': [f'Point {i + 1}' for i in range(4)]},
+        'additional_resources': ['Interactive simulation', 'Reference book']
+    }
+    return lesson
+
+
+def synthetic_section(section_type: str, items: int):
+    """One worksheet section of `section_type` with about `items` questions"""
+    section = {'type': section_type, 'title': section_type.replace('_', ' ').title(),
+               'instructions': 'Answer each question in the space provided.'}
+    questions = [{'question': f'Question {i + 1}: explain the role of __ in photosynthesis.',
+                  'answer_space': ('small', 'medium', 'large')[i % 3], 'points': 2} for i in range(items)]
+    if section_type == 'instructional_reading':
+        section.update(passage='\n\n'.join([PARAGRAPH] * 4), questions=questions)
+    elif section_type == 'diagram_labeling':
+        section.update(diagram_description='A leaf cross-section', labels=[f'Part {i + 1}' for i in range(items)])
+    elif section_type == 'matching':
+        section.update(column_a=[f'Term {i + 1}' for i in range(items)],
+                       column_b=[f'Definition {i + 1}' for i in range(items)])
+    elif section_type == 'creative_writing':
+        section.update(prompt='Describe a day in the life of a chloroplast.', lines=items)
+    else:
+        section['items'] = questions
+    return section
+
+
+def synthetic_worksheet(section_type: str, items: int):
+    return {
+        'title': f'{section_type.replace("_", " ").title()} Worksheet',
+        'subtitle': 'Synthetic worksheet',
+        'grade_level': 'Grade 6',
+        'subject': 'Science',
+        'instructions': 'Read each section carefully and show your work.',
+        'estimated_time': '30 minutes',
+        'sections': [synthetic_section(section_type, items)]
+    }
+
+
+def synthetic_deck(slides: int):
+    deck = []
+    for i in range(slides):
+        slide_type = 'title' if i == 0 else 'closing' if i == slides - 1 else SLIDE_TYPES[i % len(SLIDE_TYPES)]
+        slide = {'type': slide_type, 'title': f'Slide {i + 1}', 'image_prompt': 'illustration'}
+        if slide_type == 'content':
+            slide['content'] = [f'Bullet {b + 1}: {PARAGRAPH[:90]}' for b in range(4)]
+        elif slide_type == 'chart':
+            slide['chart_data'] = {'type': 'bar', 'title': 'Capacity', 'categories': ['A', 'B', 'C', 'D'],
+                                   'values': [10 + i, 20, 30, 40]}
+        else:
+            slide['content'] = 'Synthetic presentation for export benchmarks'
+        deck.append(slide)
+    return {'title': 'Synthetic Deck', 'subtitle': 'Export benchmark', 'slides': deck}
+
+
+# ==================== Cases ====================
+
+def build_cases():
+    """name -> (exporter, document, images), from smallest to largest per family"""
+    from agents.worksheet_pdf import SECTION_RENDERERS
+
+    images = {}
+
+    def image(size, index=0):
+        key = (size, index % DISTINCT_IMAGES)
+        if key not in images:
+            images[key] = image_uri(size, seed=key[1])
+        return images[key]
+
+    cases = {}
+    for concepts, sections, label in ((3, 2, 'small'), (10, 10, 'medium'), (30, 40, 'large')):
+        lesson = synthetic_lesson(concepts, sections)
+        cases[f'lesson/{label}/no-images'] = ('lesson', lesson, {})
+        cases[f'lesson/{label}/2x512'] = ('lesson', lesson, {'introduction': image(512, 0),
+                                                             'key_concept_0': image(512, 1)})
+
+    for section_type in SECTION_RENDERERS:
+        for items in (10, 40):
+            cases[f'worksheet/{section_type}/{items}-items'] = (
+                'worksheet', synthetic_worksheet(section_type, items), {'section_0': image(512)}
+            )
+
+    for slides in (5, 10, 25, 50):
+        deck = synthetic_deck(slides)
+        cases[f'deck/{slides}/no-images'] = ('presentation', deck, {})
+        for size in (256, 512, 1024):
+            cases[f'deck/{slides}/half-{size}'] = (
+                'presentation', deck, {f'slide_{i}': image(size, i) for i in range(0, slides, 2)}
+            )
+        cases[f'deck/{slides}/all-512'] = (
+            'presentation', deck, {f'slide_{i}': image(512, i) for i in range(slides)}
+        )
+    return cases
+
+
+def exporters():
+    from agents.lesson_pdf import render_lesson_pdf
+    from agents.worksheet_pdf import render_worksheet_pdf
+    from agents.presentation_pptx import render_presentation_pptx
+    return {'lesson': render_lesson_pdf, 'worksheet': render_worksheet_pdf,
+            'presentation': render_presentation_pptx}
+
+
+def render_once(render, document, images):
+    """Render cold, returning (seconds, output bytes)"""
+    from agents.presentation_pptx import clear_slide_cache
+    from agents.export_file import file_size
+
+    clear_slide_cache()
+    # Keep any exporter output out of the report, not out of the timing
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        started = time.perf_counter()
+        stream = render(document, images)
+        elapsed = time.perf_counter() - started
+    size = file_size(stream)
+    stream.close()
+    return elapsed, size
+
+
+def peak_memory(render, document, images) -> int:
+    tracemalloc.start()
+    try:
+        render_once(render, document, images)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(render, document, images, runs: int):
+    timings, size = [], 0
+    for _ in range(runs):
+        elapsed, size = render_once(render, document, images)
+        timings.append(elapsed)
+    return {
+        'median_ms': round(statistics.median(timings) * 1000, 2),
+        'min_ms': round(min(timings) * 1000, 2),
+        'peak_mb': round(peak_memory(render, document, images) / (1024 * 1024), 2),
+        'output_kb': round(size / 1024, 1)
+    }
+
+
+# ==================== Baselines ====================
+
+def environment():
+    import PIL
+    import pptx
+    import reportlab
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'reportlab': reportlab.Version,
+        'python-pptx': pptx.__version__,
+        'pillow': PIL.__version__
+    }
+
+
+def compare(results, baseline, threshold: float):
+    """Cases slower or larger than the baseline by more than `threshold`"""
+    regressions = []
+    for name, row in results.items():
+        before = baseline.get('cases', {}).get(name)
+        if not before:
+            continue
+        for field in ('median_ms', 'output_kb'):
+            if before[field] and row[field] > before[field] * (1 + threshold):
+                regressions.append(f"{name}: {field} {before[field]} -> {row[field]} "
+                                   f"(+{(row[field] / before[field] - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=3, help='timed renders per case')
+    parser.add_argument('--filter', default='', help='only cases whose name contains this')
+    parser.add_argument('--save', metavar='PATH', help='write results as a JSON baseline')
+    parser.add_argument('--compare', metavar='PATH', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed regression ratio for --compare')
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args()
+
+    renderers = exporters()
+    cases = {name: case for name, case in build_cases().items() if args.filter in name}
+
+    results = {}
+    for name, (kind, document, images) in cases.items():
+        results[name] = run_case(renderers[kind], document, images, args.runs)
+        if not args.json:
+            row = results[name]
+            print(f"{name:<44} {row['median_ms']:>10.1f} ms {row['peak_mb']:>8.1f} MB {row['output_kb']:>10.1f} KB",
+                  flush=True)
+
+    report = {'environment': environment(), 'runs': args.runs, 'cases': results}
+    if args.json:
+        print(json.dumps(report, indent=2))
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"✓ Baseline written to {args.save}", file=sys.stderr)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('environment', {}).get('machine') != report['environment']['machine']:
+            print("⚠️  Baseline was recorded on a different machine type - timings may not be comparable",
+                  file=sys.stderr)
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"✗ {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"✓ No regressions over {args.threshold:.0%} against {args.compare}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
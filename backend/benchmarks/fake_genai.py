@@ -0,0 +1,268 @@
+"""
+Fake Gemini Backend
+Stand-in for google.genai.Client that replays recorded responses from a cassette
+with configurable latency, error rate and 429 rate - so the API can be
+benchmarked without network access or quota.
+
+Calls are classified by prompt (lesson, presentation, worksheet, edit steps) or
+by model (image). Edit "apply" calls echo the lesson they were given, so an edit
+round-trips real content instead of swapping in an unrelated recorded lesson.
+RecordingClient wraps a real client and writes what it sees to a cassette.
+"""
+
+import base64
+import json
+import math
+import random
+import struct
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+
+# Prompt markers -> call kind, checked in order (prompts are built in agents/)
+PROMPT_KINDS = [
+    ('classify its primary intent', 'classify'),
+    ('You are a lesson editing planner', 'plan'),
+    ('You are an expert lesson editor', 'apply'),
+    ('edits educational lesson content', 'edit'),
+    ('You are an expert presentation designer', 'presentation'),
+    ('You are an expert educational worksheet designer', 'worksheet'),
+    ('Generate a comprehensive, engaging lesson', 'lesson'),
+]
+
+# Where the current document sits in each echoing prompt
+ECHO_MARKERS = {
+    'apply': 'CURRENT LESSON (JSON):',
+    'edit': 'Current lesson (JSON):',
+}
+
+# (median ms, lognormal sigma) per kind - rough shapes of the real latencies
+DEFAULT_LATENCY = {
+    'lesson': (6000, 0.35),
+    'presentation': (9000, 0.35),
+    'worksheet': (8000, 0.35),
+    'classify': (700, 0.3),
+    'plan': (1500, 0.3),
+    'apply': (7000, 0.35),
+    'edit': (7000, 0.35),
+    'image': (5000, 0.4),
+    'other': (1000, 0.3),
+}
+
+
+class FakeAPIError(Exception):
+    """Shaped like google.genai.errors.APIError - code, status and message"""
+
+    def __init__(self, code: int, status: str, message: str):
+        super().__init__(f'{code} {status}. {message}')
+        self.code = code
+        self.status = status
+        self.message = message
+
+
+def classify_call(model: str, contents) -> str:
+    if 'image' in model:
+        return 'image'
+    prompt = _prompt_text(contents)
+    for marker, kind in PROMPT_KINDS:
+        if marker in prompt:
+            return kind
+    return 'other'
+
+
+def _prompt_text(contents) -> str:
+    if isinstance(contents, str):
+        return contents
+    return '\n'.join(item for item in contents or [] if isinstance(item, str))
+
+
+def _echo_document(prompt: str, marker: str) -> Optional[str]:
+    """The JSON document following `marker` in the prompt, re-serialized compactly"""
+    start = prompt.find(marker)
+    if start < 0:
+        return None
+    try:
+        document, _ = json.JSONDecoder().raw_decode(prompt[start + len(marker):].lstrip())
+    except ValueError:
+        return None
+    return json.dumps(document)
+
+
+def synthetic_png(width: int = 512, height: int = 512, seed: int = 0) -> bytes:
+    """A noisy RGB PNG - noise keeps the compressed size near a real illustration's"""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(height):
+        rows.append(b'\x00' + rng.randbytes(width * 3))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff)
+
+    header = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b''.join(rows), 6)) + chunk(b'IEND', b''))
+
+
+def _response(text: Optional[str] = None, image: Optional[bytes] = None, usage: Optional[Dict] = None):
+    """Response object with the attributes the agents and usage accounting read"""
+    if image is not None:
+        part = SimpleNamespace(text=None, inline_data=SimpleNamespace(data=image, mime_type='image/png'))
+    else:
+        part = SimpleNamespace(text=text, inline_data=None)
+    usage = usage or {}
+    details = []
+    if usage.get('image_tokens'):
+        details.append(SimpleNamespace(modality='IMAGE', token_count=usage['image_tokens']))
+    return SimpleNamespace(
+        text=text,
+        candidates=[SimpleNamespace(content=SimpleNamespace(parts=[part]))],
+        usage_metadata=SimpleNamespace(
+            prompt_token_count=usage.get('prompt_tokens', 0),
+            candidates_token_count=usage.get('output_tokens', 0),
+            candidates_tokens_details=details
+        )
+    )
+
+
+class Cassette:
+    """
+    Recorded responses by kind: {"responses": {kind: [{"text"|"image_b64", "usage"}]}}
+    Several recordings of a kind are served round-robin.
+    """
+
+    def __init__(self, responses: Optional[Dict[str, List[Dict]]] = None):
+        self.responses = responses or {}
+        self._next: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f).get('responses', {}))
+
+    def save(self, path: str) -> None:
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'responses': self.responses}, f, indent=2)
+
+    def add(self, kind: str, entry: Dict) -> None:
+        with self._lock:
+            self.responses.setdefault(kind, []).append(entry)
+
+    def next(self, kind: str) -> Optional[Dict]:
+        entries = self.responses.get(kind)
+        if not entries:
+            return None
+        with self._lock:
+            index = self._next.get(kind, 0)
+            self._next[kind] = index + 1
+        return entries[index % len(entries)]
+
+
+class _FakeModels:
+    def __init__(self, client: 'FakeGenaiClient'):
+        self._client = client
+
+    def generate_content(self, model: str, contents, **kwargs):
+        return self._client.respond(model, contents)
+
+
+class FakeGenaiClient:
+    """
+    Drop-in for genai.Client in agents/genai_client._clients
+    latency: kind -> (median ms, sigma); time_scale multiplies every delay (0 = no sleeping).
+    error_rate / rate_limit_rate: probability a call fails with a 500 / 429.
+    """
+
+    def __init__(self, cassette: Cassette, latency: Optional[Dict[str, Tuple[float, float]]] = None,
+                 time_scale: float = 1.0, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 image_size: Tuple[int, int] = (512, 512), seed: Optional[int] = None):
+        self.cassette = cassette
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.time_scale = time_scale
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.image_size = image_size
+        self.models = _FakeModels(self)
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._image: Optional[bytes] = None
+        self.calls: Dict[str, int] = {}
+        self.failures: Dict[str, int] = {}
+
+    def _draw(self, kind: str) -> Tuple[float, float]:
+        median, sigma = self.latency.get(kind, self.latency['other'])
+        with self._lock:
+            self.calls[kind] = self.calls.get(kind, 0) + 1
+            return (median / 1000 * math.exp(self._random.gauss(0, sigma)) * self.time_scale,
+                    self._random.random())
+
+    def _fail(self, kind: str, code: int, status: str, message: str):
+        with self._lock:
+            self.failures[f'{kind}:{code}'] = self.failures.get(f'{kind}:{code}', 0) + 1
+        raise FakeAPIError(code, status, message)
+
+    def respond(self, model: str, contents):
+        kind = classify_call(model, contents)
+        delay, roll = self._draw(kind)
+
+        if roll < self.rate_limit_rate:
+            # Rejected calls come back fast, like a real quota check
+            time.sleep(min(delay, 0.05 * self.time_scale))
+            self._fail(kind, 429, 'RESOURCE_EXHAUSTED', 'Resource has been exhausted (e.g. check quota).')
+        time.sleep(delay)
+        if roll < self.rate_limit_rate + self.error_rate:
+            self._fail(kind, 500, 'INTERNAL', 'An internal error has occurred.')
+
+        entry = self.cassette.next(kind) or {}
+        usage = entry.get('usage')
+        if kind == 'image':
+            if entry.get('image_b64'):
+                image = base64.b64decode(entry['image_b64'])
+            else:
+                if self._image is None:
+                    self._image = synthetic_png(*self.image_size)
+                image = self._image
+            return _response(image=image, usage=usage or {'prompt_tokens': 40, 'output_tokens': 1290,
+                                                          'image_tokens': 1290})
+
+        text = _echo_document(_prompt_text(contents), ECHO_MARKERS[kind]) if kind in ECHO_MARKERS else None
+        if text is None:
+            text = entry.get('text', '')
+        return _response(text=text, usage=usage or {'prompt_tokens': len(_prompt_text(contents)) // 4,
+                                                    'output_tokens': len(text) // 4})
+
+
+class _RecordingModels:
+    def __init__(self, recorder: 'RecordingClient'):
+        self._recorder = recorder
+
+    def generate_content(self, model: str, contents, **kwargs):
+        return self._recorder.record(model, contents, **kwargs)
+
+
+class RecordingClient:
+    """Wraps a real genai.Client, adding every response it returns to a cassette"""
+
+    def __init__(self, client, cassette: Cassette):
+        self.client = client
+        self.cassette = cassette
+        self.models = _RecordingModels(self)
+
+    def record(self, model: str, contents, **kwargs):
+        response = self.client.models.generate_content(model=model, contents=contents, **kwargs)
+        kind = classify_call(model, contents)
+        usage = getattr(response, 'usage_metadata', None)
+        entry = {'usage': {
+            'prompt_tokens': getattr(usage, 'prompt_token_count', 0) or 0,
+            'output_tokens': getattr(usage, 'candidates_token_count', 0) or 0,
+        }}
+        for candidate in getattr(response, 'candidates', None) or []:
+            for part in getattr(getattr(candidate, 'content', None), 'parts', None) or []:
+                if getattr(part, 'inline_data', None):
+                    entry['image_b64'] = base64.b64encode(part.inline_data.data).decode('ascii')
+                elif getattr(part, 'text', None):
+                    entry['text'] = entry.get('text', '') + part.text
+        self.cassette.add(kind, entry)
+        return response
@@ -0,0 +1,129 @@
+"""
+In-Memory Resource Store
+Stands in for the Firestore/Storage methods of FirebaseService that the
+benchmarked endpoints call, with a fixed per-operation latency.
+
+For numbers that include the real Firestore code path (content encoding,
+summary projections, batched writes), point the harness at the Firestore
+emulator instead: set FIRESTORE_EMULATOR_HOST and run with --store firebase.
+"""
+
+import copy
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from services.firebase_service import SUMMARY_FIELDS, decode_cursor, encode_cursor
+
+# Methods of FirebaseService replaced on the singleton by install()
+PATCHED_METHODS = ('save_resource', 'get_resource', 'get_resources', 'update_resource',
+                   'delete_resource', 'get_user_resources', 'upload_images')
+
+
+class MemoryResourceStore:
+    def __init__(self, read_latency: float = 0.02, write_latency: float = 0.05):
+        self.read_latency = read_latency
+        self.write_latency = write_latency
+        self.resources: Dict[str, Dict] = {}
+        self.service = None
+        self._lock = threading.Lock()
+
+    def install(self, service) -> None:
+        """Shadow the FirebaseService methods on the singleton instance"""
+        self.service = service
+        for name in PATCHED_METHODS:
+            setattr(service, name, getattr(self, name))
+
+    def upload_images(self, images: Dict, resource_id: str) -> Dict:
+        time.sleep(self.write_latency * len(images))
+        stamp = int(time.time() * 1000)
+        return {key: f'https://storage.invalid/resources/{resource_id}/{key}.png?t={stamp}'
+                for key, value in images.items() if value}
+
+    def save_resource(self, user_id: str, resource_data: Dict, created_at: Optional[datetime] = None) -> str:
+        resource_id = uuid.uuid4().hex
+        resource = copy.deepcopy(resource_data)
+        if resource.get('images'):
+            resource['images'] = self.upload_images(resource['images'], resource_id)
+        else:
+            time.sleep(self.write_latency)
+        if self.service is not None:
+            resource.update(self.service._summary_fields(resource))
+        now = created_at or datetime.now(timezone.utc)
+        resource.update({'id': resource_id, 'user_id': user_id, 'created_at': now,
+                         'updated_at': now, 'assigned_students': []})
+        resource.setdefault('resource_type', 'lesson')
+        with self._lock:
+            self.resources[resource_id] = resource
+        return resource_id
+
+    def get_resource(self, resource_id: str, sections: Optional[List[str]] = None) -> Optional[Dict]:
+        time.sleep(self.read_latency)
+        with self._lock:
+            resource = self.resources.get(resource_id)
+            return copy.deepcopy(resource) if resource is not None else None
+
+    def get_resources(self, resource_ids: List[str]) -> Dict[str, Dict]:
+        time.sleep(self.read_latency)
+        with self._lock:
+            return {rid: copy.deepcopy(self.resources[rid]) for rid in resource_ids if rid in self.resources}
+
+    def update_resource(self, resource_id: str, updates: Dict, merge_images: bool = False) -> Optional[Dict]:
+        updates = copy.deepcopy(updates)
+        image_urls = {}
+        if updates.get('images'):
+            uploads = {key: value for key, value in updates['images'].items()
+                       if isinstance(value, str) and value.startswith('data:image')}
+            image_urls = {key: value for key, value in updates['images'].items() if key not in uploads}
+            image_urls.update(self.upload_images(uploads, resource_id))
+            updates['images'] = image_urls
+        time.sleep(self.write_latency)
+        with self._lock:
+            resource = self.resources.get(resource_id)
+            if resource is None:
+                return None
+            if merge_images and 'images' in updates:
+                resource.setdefault('images', {}).update(updates.pop('images'))
+            resource.update(updates)
+            resource['updated_at'] = datetime.now(timezone.utc)
+        return image_urls
+
+    def delete_resource(self, resource_id: str) -> bool:
+        time.sleep(self.write_latency)
+        with self._lock:
+            return self.resources.pop(resource_id, None) is not None
+
+    def get_user_resources(self, user_id: str, resource_type: Optional[str] = None,
+                           limit: int = 50, offset: int = 0, start_after: Optional[str] = None,
+                           fields: Optional[str] = None) -> Dict:
+        time.sleep(self.read_latency)
+        cursor = decode_cursor(start_after) if start_after else None
+        # Same order as Firestore: (created_at, id), newest first
+        with self._lock:
+            matches = [r for r in self.resources.values() if r['user_id'] == user_id
+                       and (not resource_type or r.get('resource_type') == resource_type)
+                       and (cursor is None or (r['created_at'], r['id']) < (cursor[0], cursor[1] or ''))]
+        matches.sort(key=lambda r: (r['created_at'], r['id']), reverse=True)
+        page = matches[offset if cursor is None else 0:][:limit]
+        if fields == 'summary':
+            page = [{field: r[field] for field in SUMMARY_FIELDS if field in r} for r in page]
+        else:
+            page = copy.deepcopy(page)
+        next_cursor = encode_cursor(page[-1]['created_at'], page[-1]['id']) if len(page) == limit and page else None
+        return {'resources': page, 'next_cursor': next_cursor}
+
+    def seed(self, user_id: str, resource_type: str, content: Dict, images: Dict, count: int) -> List[str]:
+        """Add `count` copies of a resource, one minute apart, without sleeping"""
+        latency, self.write_latency = self.write_latency, 0
+        try:
+            started = datetime.now(timezone.utc) - timedelta(minutes=count)
+            return [self.save_resource(user_id, {
+                'resource_type': resource_type,
+                'title': content.get('title', 'Untitled'),
+                'content': content,
+                'images': images
+            }, created_at=started + timedelta(minutes=i)) for i in range(count)]
+        finally:
+            self.write_latency = latency
@@ -0,0 +1,328 @@
+"""
+API Benchmark
+Runs the Flask app in-process against a fake Gemini backend and reports
+p50/p95/p99 latency and throughput for generation, edit, save, library
+listing and download.
+
+Usage (from backend/):
+    python benchmarks/harness.py [--scenarios generate-lesson,list] [--requests 20]
+        [--concurrency 4] [--time-scale 0.1] [--error-rate 0.02] [--rate-limit-rate 0.05]
+    python benchmarks/harness.py --record benchmarks/cassettes/mine.json --scenarios generate-lesson
+
+Gemini responses are replayed from a cassette (benchmarks/cassettes/default.json is
+a hand-written fixture; --record captures real responses into a new one) with
+lognormal latency per call kind, scaled by --time-scale. Auth and subscription
+checks accept bench tokens, and resources live in memory unless --store firebase
+is given (use it with FIRESTORE_EMULATOR_HOST). Nothing leaves the machine unless
+recording.
+"""
+
+import argparse
+import base64
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CASSETTE = os.path.join(BACKEND_DIR, 'benchmarks', 'cassettes', 'default.json')
+
+TOKEN_PREFIX = 'bench-token:'
+TOPICS = ['Photosynthesis', 'The water cycle', 'Fractions', 'Ancient Rome', 'Volcanoes', 'Renewable energy']
+EDIT_REQUESTS = ['Make the introduction shorter', 'Rewrite the summary for younger students',
+                 'Add an example to the first key concept']
+
+
+def percentile(samples, q: float) -> float:
+    """Linear-interpolated percentile of sorted samples"""
+    if not samples:
+        return 0.0
+    position = (len(samples) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(samples) - 1)
+    return samples[lower] + (samples[upper] - samples[lower]) * (position - lower)
+
+
+def read_events(response):
+    """Consume an SSE response, returning the parsed events"""
+    events = []
+    for line in b''.join(response.response).decode('utf-8').split('\n'):
+        if line.startswith('data: '):
+            events.append(json.loads(line[len('data: '):]))
+    response.close()
+    return events
+
+
+def stream_ok(events) -> bool:
+    return bool(events) and events[-1].get('type') == 'complete'
+
+
+# ==================== Scenarios ====================
+# Each takes (client, context, iteration) and returns whether the request succeeded
+
+def _generate(path):
+    def scenario(client, ctx, i):
+        user = ctx['users'][i % len(ctx['users'])]
+        response = client.post(path, json={'topic': TOPICS[i % len(TOPICS)], 'user_id': user})
+        return stream_ok(read_events(response))
+    return scenario
+
+
+def _edit(client, ctx, i):
+    lesson_id = ctx['edit_ids'][i % len(ctx['edit_ids'])]
+    response = client.post(f'/api/edit-lesson/{lesson_id}', json={'request': EDIT_REQUESTS[i % len(EDIT_REQUESTS)]})
+    return stream_ok(read_events(response))
+
+
+def _save(client, ctx, i):
+    user = ctx['users'][i % len(ctx['users'])]
+    response = client.post('/api/resources', headers=ctx['headers'][user], json={
+        'resource_type': 'lesson',
+        'title': ctx['fixtures']['lesson']['title'],
+        'content': ctx['fixtures']['lesson'],
+        'images': ctx['fixtures']['lesson_images']
+    })
+    return response.status_code == 200
+
+
+def _list(client, ctx, i):
+    user = ctx['users'][i % len(ctx['users'])]
+    response = client.get('/api/resources?fields=summary&limit=20', headers=ctx['headers'][user])
+    return response.status_code == 200 and bool(response.get_json()['resources'])
+
+
+def _download(kind):
+    def scenario(client, ctx, i):
+        resource_id = ctx['download_ids'][kind]
+        response = client.get(f'/api/{kind}/{resource_id}/download?user_id={ctx["users"][0]}')
+        size = len(b''.join(response.response))
+        response.close()
+        return response.status_code == 200 and size > 0
+    return scenario
+
+
+SCENARIOS = {
+    'generate-lesson': _generate('/api/generate-lesson-stream'),
+    'generate-presentation': _generate('/api/generate-presentation-stream'),
+    'generate-worksheet': _generate('/api/generate-worksheet-stream'),
+    'edit-lesson': _edit,
+    'save': _save,
+    'list': _list,
+    'download-lesson': _download('lesson'),
+    'download-presentation': _download('presentation'),
+    'download-worksheet': _download('worksheet'),
+}
+
+
+# ==================== Setup ====================
+
+def configure_environment(args):
+    """Environment for the app import - must run before `import app`"""
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark-placeholder')
+    os.environ['USAGE_SINK'] = 'none'
+    os.environ['EXPORT_PRERENDER'] = 'false'
+    if not args.export_cache:
+        os.environ['EXPORT_CACHE_MAX_BYTES'] = '0'
+    os.environ.setdefault('EXPORT_CACHE_DIR', tempfile.mkdtemp(prefix='agenticdp-bench-'))
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def parse_latency(values):
+    """kind=median_ms[:sigma] overrides"""
+    latency = {}
+    for value in values or []:
+        kind, _, spec = value.partition('=')
+        median, _, sigma = spec.partition(':')
+        latency[kind] = (float(median), float(sigma) if sigma else 0.3)
+    return latency
+
+
+def install_fakes(args, app_module):
+    from agents import genai_client
+    from services.firebase_service import firebase_service
+    from services.auth_service import auth_service
+    from routes.subscription import subscription_service
+    from benchmarks.fake_genai import Cassette, FakeGenaiClient, RecordingClient
+    from benchmarks.fake_store import MemoryResourceStore
+
+    if args.record:
+        cassette = Cassette()
+        client = RecordingClient(genai_client.get_client(app_module.GEMINI_API_KEY), cassette)
+    else:
+        cassette = Cassette.load(args.cassette)
+        client = FakeGenaiClient(
+            cassette, latency=parse_latency(args.latency), time_scale=args.time_scale,
+            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+            image_size=(args.image_size, args.image_size), seed=args.seed
+        )
+    genai_client._clients[app_module.GEMINI_API_KEY] = client
+
+    def verify_token(token):
+        if not token or not token.startswith(TOKEN_PREFIX):
+            return None
+        uid = token[len(TOKEN_PREFIX):]
+        return {'uid': uid, 'email': f'{uid}@bench.invalid', 'email_verified': True}
+
+    auth_service.verify_token = verify_token
+    subscription_service.get_user_subscription_status = lambda user_id: {
+        'can_create_content': True, 'status': 'active'
+    }
+
+    if args.store == 'memory':
+        MemoryResourceStore(read_latency=args.store_read_ms / 1000,
+                            write_latency=args.store_write_ms / 1000).install(firebase_service)
+    return client, cassette
+
+
+def build_context(args, app_module):
+    """Users, fixture documents and the resources the edit/list/download scenarios read"""
+    from services.firebase_service import firebase_service
+    from benchmarks.fake_genai import Cassette, synthetic_png
+
+    fixtures_cassette = Cassette.load(args.cassette if not args.record else DEFAULT_CASSETTE)
+    fixtures = {kind: json.loads(fixtures_cassette.next(kind)['text'])
+                for kind in ('lesson', 'presentation', 'worksheet')}
+    image = 'data:image/png;base64,' + base64.b64encode(
+        synthetic_png(args.image_size, args.image_size, seed=args.seed or 0)).decode('ascii')
+    fixtures['lesson_images'] = {'introduction': image, 'key_concept_0': image}
+    images = {
+        'lesson': fixtures['lesson_images'],
+        'presentation': {f'slide_{i}': image for i in range(len(fixtures['presentation']['slides']))},
+        'worksheet': {f'section_{i}': image for i in range(len(fixtures['worksheet']['sections']))},
+    }
+
+    users = [f'bench-user-{i}' for i in range(args.users)]
+    ctx = {
+        'users': users,
+        'headers': {user: {'Authorization': f'Bearer {TOKEN_PREFIX}{user}'} for user in users},
+        'fixtures': fixtures,
+        'edit_ids': [],
+        'download_ids': {},
+    }
+
+    for user in users:
+        for n in range(args.library_size):
+            kind = ('lesson', 'presentation', 'worksheet')[n % 3]
+            firebase_service.save_resource(user, {
+                'resource_type': kind,
+                'title': fixtures[kind]['title'],
+                'content': fixtures[kind],
+                'images': images[kind]
+            })
+    for _ in range(max(args.concurrency, 1)):
+        ctx['edit_ids'].append(firebase_service.save_resource(users[0], {
+            'resource_type': 'lesson',
+            'title': fixtures['lesson']['title'],
+            'content': dict(fixtures['lesson'], contentType='lesson'),
+            'images': {}
+        }))
+
+    # Downloads right after generation are served from the in-memory stores with base64 images
+    stores = {'lesson': app_module.lessons_store, 'presentation': app_module.presentations_store,
+              'worksheet': app_module.worksheets_store}
+    for kind, store in stores.items():
+        resource_id = f'bench-{kind}'
+        store[resource_id] = {'data': dict(fixtures[kind], id=resource_id), 'images': images[kind],
+                              'image_generation_status': {}}
+        ctx['download_ids'][kind] = resource_id
+    return ctx
+
+
+# ==================== Running ====================
+
+def run_scenario(app_module, name, ctx, requests, concurrency):
+    scenario = SCENARIOS[name]
+
+    def one(i):
+        client = app_module.app.test_client()
+        started = time.perf_counter()
+        try:
+            ok = scenario(client, ctx, i)
+        except Exception as e:
+            print(f"⚠️  {name} request {i} raised: {e}", file=sys.stderr)
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    return {
+        'requests': requests,
+        'failed': sum(1 for _, ok in results if not ok),
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'mean_ms': statistics.fmean(latencies),
+        'throughput_rps': requests / wall if wall else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS),
+                        help=f'comma-separated, from: {", ".join(SCENARIOS)}')
+    parser.add_argument('--requests', type=int, default=20, help='requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=4, help='requests in flight per scenario')
+    parser.add_argument('--users', type=int, default=4, help='distinct signed-in users')
+    parser.add_argument('--library-size', type=int, default=30, help='resources seeded per user')
+    parser.add_argument('--cassette', default=DEFAULT_CASSETTE, help='recorded responses to replay')
+    parser.add_argument('--record', metavar='PATH', help='call the real Gemini API and save a cassette here')
+    parser.add_argument('--time-scale', type=float, default=1.0,
+                        help='multiply every fake Gemini delay (0 disables sleeping)')
+    parser.add_argument('--latency', action='append', metavar='KIND=MEDIAN_MS[:SIGMA]',
+                        help='override the latency distribution of a call kind (repeatable)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of Gemini calls failing with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of Gemini calls failing with 429')
+    parser.add_argument('--image-size', type=int, default=512, help='edge in pixels of fake generated images')
+    parser.add_argument('--store', choices=('memory', 'firebase'), default='memory',
+                        help='in-memory resources, or the configured Firebase project/emulator')
+    parser.add_argument('--store-read-ms', type=float, default=20, help='in-memory store latency per read')
+    parser.add_argument('--store-write-ms', type=float, default=50, help='in-memory store latency per write')
+    parser.add_argument('--export-cache', action='store_true', help='leave the export cache on (off by default)')
+    parser.add_argument('--seed', type=int, help='random seed for latency and failure draws')
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    configure_environment(args)
+    import app as app_module
+
+    client, cassette = install_fakes(args, app_module)
+    ctx = build_context(args, app_module)
+
+    results = {name: run_scenario(app_module, name, ctx, args.requests, args.concurrency) for name in names}
+
+    if args.record:
+        cassette.save(args.record)
+        print(f"✓ Recorded {sum(len(v) for v in cassette.responses.values())} responses to {args.record}")
+    else:
+        results['_genai'] = {'calls': client.calls, 'injected_failures': client.failures}
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"\n{'scenario':<24} {'reqs':>5} {'fail':>5} {'p50 (ms)':>10} {'p95 (ms)':>10} "
+          f"{'p99 (ms)':>10} {'req/s':>8}")
+    for name in names:
+        row = results[name]
+        print(f"{name:<24} {row['requests']:>5} {row['failed']:>5} {row['p50_ms']:>10.0f} "
+              f"{row['p95_ms']:>10.0f} {row['p99_ms']:>10.0f} {row['throughput_rps']:>8.2f}")
+    if '_genai' in results:
+        print(f"\nGemini calls: {results['_genai']['calls']}")
+        if results['_genai']['injected_failures']:
+            print(f"Injected failures: {results['_genai']['injected_failures']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Startup Benchmark
+Measures import time and peak RSS of the API in fresh interpreters, and which
+rendering libraries each stage pulls in.
+
+Usage (from backend/):
+    python benchmarks/startup.py [--runs 5]
+
+Each measurement runs in its own subprocess so module caches don't carry over.
+A dummy GEMINI_API_KEY is set if none is configured; Firebase stays lazy, so no
+network calls are made.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY_MODULES = ['reportlab', 'pptx', 'PIL', 'google.genai', 'firebase_admin']
+
+# Code run inside the child interpreter - prints one JSON line
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+{setup}
+elapsed = time.perf_counter() - started
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+if sys.platform == 'darwin':
+    rss_kb //= 1024
+print(json.dumps({{
+    'seconds': elapsed,
+    'rss_mb': rss_kb / 1024,
+    'loaded': [name for name in {heavy!r} if name in sys.modules]
+}}))
+"""
+
+STAGES = {
+    'python': 'pass',
+    'services': 'import services',
+    'agents': 'import agents',
+    'app': 'import app',
+    'app + lesson pdf': 'import app\nfrom agents.lesson_pdf import render_lesson_pdf',
+    'app + worksheet pdf': 'import app\nfrom agents.worksheet_pdf import render_worksheet_pdf',
+    'app + presentation pptx': 'import app\nfrom agents.presentation_pptx import render_presentation_pptx',
+}
+
+
+def run_stage(setup: str) -> dict:
+    env = dict(os.environ)
+    env.setdefault('GEMINI_API_KEY', 'benchmark-placeholder')
+    code = PROBE.format(setup=setup, heavy=HEAVY_MODULES)
+    result = subprocess.run(
+        [sys.executable, '-c', code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else 'failed')
+    # App boot prints its own messages - the probe's JSON is the last line
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='subprocess runs per stage')
+    parser.add_argument('--json', action='store_true', help='print raw results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for name, setup in STAGES.items():
+        try:
+            samples = [run_stage(setup) for _ in range(args.runs)]
+        except RuntimeError as e:
+            results[name] = {'error': str(e)}
+            continue
+        results[name] = {
+            'median_ms': statistics.median(s['seconds'] for s in samples) * 1000,
+            'max_rss_mb': max(s['rss_mb'] for s in samples),
+            'loaded': samples[0]['loaded']
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'stage':<26} {'import (ms)':>12} {'peak RSS (MB)':>14}  heavy modules loaded")
+    for name, row in results.items():
+        if 'error' in row:
+            print(f"{name:<26} {'error':>12} {'':>14}  {row['error']}")
+            continue
+        print(f"{name:<26} {row['median_ms']:>12.0f} {row['max_rss_mb']:>14.1f}  {', '.join(row['loaded']) or '-'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""
+Admin Routes
+Operator-only reporting endpoints (see ADMIN_UIDS / ADMIN_EMAILS)
+"""
+
+from flask import Blueprint, request, jsonify, Response, send_file
+from services.usage_service import usage_service
+from services.profiling import profiler
+from services import memory
+from routes.auth import require_admin
+
+admin_bp = Blueprint('admin', __name__)
+
+
+@admin_bp.route('/admin/usage', methods=['GET'])
+@require_admin
+def get_usage_report():
+    """
+    Token and cost totals per endpoint, user, content type, agent, model or step
+    Query params: days (default 7), group_by (default endpoint)
+    """
+    try:
+        days = int(request.args.get('days', 7))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+
+    try:
+        report = usage_service.get_report(days=days, group_by=request.args.get('group_by', 'endpoint'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'success': True,
+        'report': report
+    })
+
+
+@admin_bp.route('/admin/profiles', methods=['GET'])
+@require_admin
+def list_profiles():
+    """Stored request profiles on this worker, newest first (see services/profiling.py)"""
+    return jsonify({
+        'success': True,
+        'profiles': profiler.list_profiles()
+    })
+
+
+@admin_bp.route('/admin/profiles/<profile_id>', methods=['GET'])
+@require_admin
+def get_profile(profile_id):
+    """
+    Download a request profile (.prof, pstats format)
+    Query params: format=text for a pstats report instead, sort (default cumulative), limit (default 50)
+    """
+    path = profiler.path(profile_id)
+    if path is None:
+        return jsonify({'error': 'Profile not found'}), 404
+
+    if request.args.get('format') != 'text':
+        return send_file(path, mimetype='application/octet-stream', as_attachment=True,
+                         download_name=f'{profile_id}.prof')
+
+    try:
+        limit = int(request.args.get('limit', 50))
+        report = profiler.summary(profile_id, sort=request.args.get('sort', 'cumulative'), limit=limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if report is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return Response(report, mimetype='text/plain')
+
+
+@admin_bp.route('/admin/memory', methods=['GET'])
+@require_admin
+def get_memory_report():
+    """
+    Entry counts, approximate sizes and largest entries of this worker's in-process stores
+    Query params: largest (default 5)
+    """
+    try:
+        largest = int(request.args.get('largest', 5))
+    except ValueError:
+        return jsonify({'error': 'largest must be an integer'}), 400
+
+    return jsonify({
+        'success': True,
+        'memory': memory.report(largest=largest)
+    })
+
+
+@admin_bp.route('/admin/memory/tracing', methods=['POST'])
+@require_admin
+def set_memory_tracing():
+    """
+    Start or stop tracemalloc on this worker
+    Body: {"enabled": true|false, "frames": 1} - frames is the traceback depth kept per allocation
+    """
+    data = request.get_json(silent=True) or {}
+    if data.get('enabled', True):
+        try:
+            frames = int(data.get('frames', 1))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'frames must be an integer'}), 400
+        memory.start_tracing(max(1, min(frames, 25)))
+    else:
+        memory.stop_tracing()
+
+    return jsonify({
+        'success': True,
+        'tracing': memory.is_tracing()
+    })
+
+
+@admin_bp.route('/admin/memory/allocations', methods=['GET'])
+@require_admin
+def get_memory_allocations():
+    """
+    Top tracemalloc allocation sites; each call's snapshot is the baseline for the next
+    Query params: limit (default 25), group_by (lineno, filename or traceback), diff (true to rank by growth)
+    """
+    try:
+        limit = int(request.args.get('limit', 25))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+
+    try:
+        allocations = memory.top_allocations(
+            limit=limit,
+            group_by=request.args.get('group_by', 'lineno'),
+            diff=request.args.get('diff', 'false').lower() == 'true'
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'success': True,
+        'allocations': allocations
+    })
@@ -0,0 +1,96 @@
+"""
+Shared Authentication Decorators
+Used by every blueprint that needs a signed-in user
+"""
+
+import os
+from flask import request, jsonify
+from services.auth_service import auth_service
+from functools import wraps
+
+
+def get_bearer_token():
+    """Extract the bearer token from the Authorization header, or None"""
+    auth_header = request.headers.get('Authorization')
+    if not auth_header or not auth_header.startswith('Bearer '):
+        return None
+    return auth_header.split('Bearer ')[1]
+
+
+def require_auth(f):
+    """Decorator to require authentication - exposes the user as request.user"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = get_bearer_token()
+        if not token:
+            return jsonify({'error': 'No authorization token provided'}), 401
+
+        user_info = auth_service.verify_token(token)
+
+        if not user_info:
+            return jsonify({'error': 'Invalid or expired token'}), 401
+
+        # Add user info to request context
+        request.user = user_info
+        return f(*args, **kwargs)
+
+    return decorated_function
+
+
+def require_auth_user(f):
+    """Decorator to require authentication - passes the user info as the first argument"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = get_bearer_token()
+        if not token:
+            return jsonify({'error': 'Authentication required'}), 401
+
+        user_info = auth_service.verify_token(token)
+        if not user_info:
+            return jsonify({'error': 'Invalid token'}), 401
+
+        request.user = user_info
+        return f(user_info, *args, **kwargs)
+
+    return decorated_function
+
+
+# Operators allowed on /api/admin/* - comma-separated Firebase UIDs and/or emails
+ADMIN_UIDS = {uid.strip() for uid in os.getenv('ADMIN_UIDS', '').split(',') if uid.strip()}
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()}
+
+
+def is_admin(user_info) -> bool:
+    if not user_info:
+        return False
+    if user_info.get('uid') in ADMIN_UIDS:
+        return True
+    email = (user_info.get('email') or '').lower()
+    return bool(email) and email in ADMIN_EMAILS and user_info.get('email_verified', False)
+
+
+def request_is_admin() -> bool:
+    """Whether the request carries an operator's token - for opt-in features, doesn't reject"""
+    token = get_bearer_token()
+    return bool(token) and is_admin(auth_service.verify_token(token))
+
+
+def require_admin(f):
+    """Decorator to require an authenticated operator listed in ADMIN_UIDS/ADMIN_EMAILS"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        token = get_bearer_token()
+        if not token:
+            return jsonify({'error': 'No authorization token provided'}), 401
+
+        user_info = auth_service.verify_token(token)
+        if not user_info:
+            return jsonify({'error': 'Invalid or expired token'}), 401
+
+        if not is_admin(user_info):
+            return jsonify({'error': 'Admin access required'}), 403
+
+        request.user = user_info
+        return f(*args, **kwargs)
+
+    return decorated_function
@@ -0,0 +1,173 @@
+"""
+Export Routes
+Bundles several saved resources into one ZIP download
+"""
+
+import zipfile
+from concurrent.futures import as_completed
+from datetime import datetime
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from services.firebase_service import firebase_service
+from services.export_service import export_service
+from routes.auth import require_auth
+from routes.subscription import check_subscription_access
+from services.log import get_logger
+
+export_bp = Blueprint('export', __name__)
+log = get_logger('export')
+
+# Upper bound on resources per bundle
+MAX_BUNDLE_RESOURCES = 50
+# Read size when copying a rendered file into the archive
+BUNDLE_CHUNK_SIZE = 64 * 1024
+
+
+class _ZipStream:
+    """
+    Write-only, unseekable sink for ZipFile - collects written bytes until drained
+    ZipFile falls back to data descriptors when it can't seek, so the archive is
+    produced front to back and never held in memory as a whole.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _unique_name(filename: str, used: set) -> str:
+    """Suffix duplicate filenames: Fractions.pdf, Fractions (2).pdf, ..."""
+    name, dot, extension = filename.rpartition('.')
+    candidate, count = filename, 1
+    while candidate in used:
+        count += 1
+        candidate = f"{name} ({count}).{extension}" if dot else f"{filename} ({count})"
+    used.add(candidate)
+    return candidate
+
+
+def _close_result(future):
+    if not future.exception():
+        future.result().close()
+
+
+@export_bp.route('/export/bundle', methods=['POST'])
+@require_auth
+def export_bundle():
+    """
+    Download several resources as one ZIP
+    Body: {"resource_ids": [...]}. Files are rendered concurrently on the export
+    executor (cached exports are reused) and added to the archive as they finish.
+    """
+    user_id = request.user['uid']
+    data = request.get_json(silent=True)
+    resource_ids = data.get('resource_ids') if isinstance(data, dict) else None
+
+    if not isinstance(resource_ids, list) or not resource_ids:
+        return jsonify({'error': 'resource_ids must be a non-empty list'}), 400
+    # Firestore document IDs are non-empty and can't contain a path separator
+    if not all(isinstance(resource_id, str) and resource_id and '/' not in resource_id
+               for resource_id in resource_ids):
+        return jsonify({'error': 'resource_ids must contain resource ID strings'}), 400
+
+    # Preserve order, drop repeats
+    resource_ids = list(dict.fromkeys(resource_ids))
+    if len(resource_ids) > MAX_BUNDLE_RESOURCES:
+        return jsonify({'error': f'At most {MAX_BUNDLE_RESOURCES} resources per bundle'}), 400
+
+    has_access, status_info = check_subscription_access(user_id)
+    if not has_access:
+        return jsonify({
+            'error': 'subscription_required',
+            'message': 'Your trial has ended. Please subscribe to download content.',
+            'status': status_info
+        }), 403
+
+    resources = firebase_service.get_resources(resource_ids)
+
+    missing = [resource_id for resource_id in resource_ids if resource_id not in resources]
+    if missing:
+        return jsonify({'error': 'Resource not found', 'resource_ids': missing}), 404
+
+    if any(resource.get('user_id') != user_id for resource in resources.values()):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    unsupported = [resource_id for resource_id in resource_ids
+                   if resources[resource_id].get('resource_type') not in export_service.renderers]
+    if unsupported:
+        return jsonify({'error': 'Resource type cannot be exported', 'resource_ids': unsupported}), 400
+
+    # Queue every render up front so they run while earlier files are streamed
+    futures = {}
+    for resource_id in resource_ids:
+        resource = resources[resource_id]
+        future = export_service.render_async(
+            resource['resource_type'], resource.get('content', {}), resource.get('images', {})
+        )
+        futures[future] = resource_id
+
+    log.info("Bundling %d resources", len(resource_ids), extra={'user_id': user_id})
+
+    def generate():
+        sink = _ZipStream()
+        used_names = set()
+        failed = []
+        try:
+            # PDFs and PPTX files are already compressed, so the fastest deflate level is enough
+            with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED, compresslevel=1) as archive:
+                # Files are added in completion order
+                for future in as_completed(futures):
+                    resource = resources[futures[future]]
+                    try:
+                        stream = future.result()
+                    except Exception as e:
+                        log.warning("Bundle render failed for %s: %s", futures[future], e)
+                        failed.append(resource.get('title') or futures[future])
+                        continue
+
+                    filename = _unique_name(
+                        export_service.filename(resource['resource_type'], resource.get('content', {})),
+                        used_names
+                    )
+                    try:
+                        with archive.open(filename, mode='w') as entry:
+                            while True:
+                                chunk = stream.read(BUNDLE_CHUNK_SIZE)
+                                if not chunk:
+                                    break
+                                entry.write(chunk)
+                                yield sink.drain()
+                    finally:
+                        stream.close()
+                    yield sink.drain()
+
+                if failed:
+                    archive.writestr(
+                        'errors.txt',
+                        'These resources could not be exported:\n' + '\n'.join(failed) + '\n'
+                    )
+            # Central directory
+            yield sink.drain()
+        finally:
+            # Client may have gone away - drop queued renders, close the rest when they finish
+            for future in futures:
+                if not future.cancel():
+                    future.add_done_callback(_close_result)
+
+    filename = f"class_pack_{datetime.now().strftime('%Y%m%d')}.zip"
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
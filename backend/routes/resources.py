@@ -4,31 +4,14 @@ Handles CRUD operations for lessons, worksheets, and other educational resources
 """
 
 from flask import Blueprint, request, jsonify
-from services.firebase_service import firebase_service
-from functools import wraps
+from services.firebase_service import firebase_service, MAX_BULK_STUDENTS
+from services.auth_service import auth_service
+from services.content_store import SectionTooLarge
+from services.log import get_logger
+from routes.auth import require_auth, get_bearer_token
 
 resources_bp = Blueprint('resources', __name__)
-
-def require_auth(f):
-    """Decorator to require authentication"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'No authorization token provided'}), 401
-        
-        token = auth_header.split('Bearer ')[1]
-        user_info = firebase_service.verify_token(token)
-        
-        if not user_info:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        
-        # Add user info to request context
-        request.user = user_info
-        return f(*args, **kwargs)
-    
-    return decorated_function
-
+log = get_logger('resources')
 
 @resources_bp.route('/auth/verify', methods=['POST'])
 def verify_auth():
@@ -39,7 +22,7 @@ def verify_auth():
     if not token:
         return jsonify({'error': 'Token required'}), 400
     
-    user_info = firebase_service.verify_token(token)
+    user_info = auth_service.verify_token(token)
     if not user_info:
         return jsonify({'error': 'Invalid token'}), 401
     
@@ -52,6 +35,29 @@ def verify_auth():
     })
 
 
+@resources_bp.route('/auth/logout', methods=['POST'])
+def logout():
+    """
+    Sign out the presented token; with {"everywhere": true}, also revoke the
+    user's Firebase refresh tokens so every session on every device ends
+    """
+    token = get_bearer_token()
+    if not token:
+        return jsonify({'error': 'No authorization token provided'}), 401
+
+    data = request.get_json(silent=True) or {}
+    if data.get('everywhere') is True:
+        user_info = auth_service.verify_token(token)
+        if user_info:
+            auth_service.revoke_user(user_info['uid'], revoke_refresh_tokens=True)
+    auth_service.revoke_token(token)
+
+    return jsonify({
+        'success': True,
+        'message': 'Signed out'
+    })
+
+
 @resources_bp.route('/resources', methods=['POST'])
 @require_auth
 def save_resource():
@@ -75,10 +81,10 @@ def save_resource():
             'resource_id': resource_id,
             'message': 'Resource saved successfully'
         })
+    except SectionTooLarge as e:
+        return jsonify({'error': str(e)}), 413
     except Exception as e:
-        print(f"Error saving resource: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Could not save resource")
         return jsonify({'error': str(e)}), 500
 
 
@@ -107,8 +113,8 @@ def update_resource(resource_id):
     """Update a resource"""
     data = request.json
     
-    # Get resource to check ownership
-    resource = firebase_service.get_resource(resource_id)
+    # Get resource to check ownership (content isn't needed, so don't decode it)
+    resource = firebase_service.get_resource(resource_id, sections=[])
     if not resource:
         return jsonify({'error': 'Resource not found'}), 404
     
@@ -120,12 +126,16 @@ def update_resource(resource_id):
     data.pop('user_id', None)
     data.pop('created_at', None)
     
-    success = firebase_service.update_resource(resource_id, data)
+    try:
+        image_urls = firebase_service.update_resource(resource_id, data)
+    except SectionTooLarge as e:
+        return jsonify({'error': str(e)}), 413
     
-    if success:
+    if image_urls is not None:
         return jsonify({
             'success': True,
-            'message': 'Resource updated successfully'
+            'message': 'Resource updated successfully',
+            'images': image_urls
         })
     else:
         return jsonify({'error': 'Failed to update resource'}), 500
@@ -135,8 +145,8 @@ def update_resource(resource_id):
 @require_auth
 def delete_resource(resource_id):
     """Delete a resource"""
-    # Get resource to check ownership
-    resource = firebase_service.get_resource(resource_id)
+    # Get resource to check ownership (content isn't needed, so don't decode it)
+    resource = firebase_service.get_resource(resource_id, sections=[])
     if not resource:
         return jsonify({'error': 'Resource not found'}), 404
     
@@ -161,18 +171,29 @@ def get_user_resources():
     resource_type = request.args.get('type')
     limit = int(request.args.get('limit', 50))
     offset = int(request.args.get('offset', 0))
+    start_after = request.args.get('start_after')
+    fields = request.args.get('fields')
     
-    resources = firebase_service.get_user_resources(
-        request.user['uid'],
-        resource_type=resource_type,
-        limit=limit,
-        offset=offset
-    )
+    if fields not in (None, 'full', 'summary'):
+        return jsonify({'error': 'fields must be "full" or "summary"'}), 400
+    
+    try:
+        page = firebase_service.get_user_resources(
+            request.user['uid'],
+            resource_type=resource_type,
+            limit=limit,
+            offset=offset,
+            start_after=start_after,
+            fields=fields
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     return jsonify({
         'success': True,
-        'resources': resources,
-        'count': len(resources)
+        'resources': page['resources'],
+        'count': len(page['resources']),
+        'next_cursor': page['next_cursor']
     })
 
 
@@ -187,7 +208,7 @@ def assign_resource(resource_id):
         return jsonify({'error': 'Student ID required'}), 400
     
     # Check resource ownership
-    resource = firebase_service.get_resource(resource_id)
+    resource = firebase_service.get_resource(resource_id, sections=[])
     if not resource:
         return jsonify({'error': 'Resource not found'}), 404
     
@@ -221,7 +242,7 @@ def unassign_resource(resource_id):
         return jsonify({'error': 'Student ID required'}), 400
     
     # Check resource ownership
-    resource = firebase_service.get_resource(resource_id)
+    resource = firebase_service.get_resource(resource_id, sections=[])
     if not resource:
         return jsonify({'error': 'Resource not found'}), 404
     
@@ -237,3 +258,81 @@ def unassign_resource(resource_id):
         })
     else:
         return jsonify({'error': 'Failed to unassign resource'}), 500
+
+
+def _parse_student_ids(data):
+    """Validate the student_ids list of a bulk request, returns (ids, error_response)"""
+    student_ids = (data or {}).get('student_ids')
+    if not isinstance(student_ids, list) or not student_ids:
+        return None, (jsonify({'error': 'student_ids must be a non-empty list'}), 400)
+    if not all(isinstance(student_id, str) and student_id for student_id in student_ids):
+        return None, (jsonify({'error': 'student_ids must contain student ID strings'}), 400)
+    
+    # De-duplicate, keeping request order
+    student_ids = list(dict.fromkeys(student_ids))
+    if len(student_ids) > MAX_BULK_STUDENTS:
+        return None, (jsonify({'error': f'At most {MAX_BULK_STUDENTS} students per request'}), 400)
+    return student_ids, None
+
+
+@resources_bp.route('/resources/<resource_id>/assign-bulk', methods=['POST'])
+@require_auth
+def assign_resource_bulk(resource_id):
+    """Assign a resource to many students (e.g. a whole class) in one request"""
+    student_ids, error = _parse_student_ids(request.json)
+    if error:
+        return error
+    
+    # Check resource ownership
+    resource = firebase_service.get_resource(resource_id, sections=[])
+    if not resource:
+        return jsonify({'error': 'Resource not found'}), 404
+    
+    if resource['user_id'] != request.user['uid']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    # Check ownership of every student with one batched read
+    students = firebase_service.get_students(student_ids)
+    invalid_ids = [student_id for student_id in student_ids
+                   if student_id not in students or students[student_id].get('user_id') != request.user['uid']]
+    if invalid_ids:
+        return jsonify({'error': 'Student not found', 'student_ids': invalid_ids}), 404
+    
+    success = firebase_service.assign_resource_to_students(resource_id, student_ids)
+    
+    if success:
+        return jsonify({
+            'success': True,
+            'message': f'Resource assigned to {len(student_ids)} students',
+            'count': len(student_ids)
+        })
+    else:
+        return jsonify({'error': 'Failed to assign resource'}), 500
+
+
+@resources_bp.route('/resources/<resource_id>/unassign-bulk', methods=['POST'])
+@require_auth
+def unassign_resource_bulk(resource_id):
+    """Remove a resource assignment from many students in one request"""
+    student_ids, error = _parse_student_ids(request.json)
+    if error:
+        return error
+    
+    # Check resource ownership
+    resource = firebase_service.get_resource(resource_id, sections=[])
+    if not resource:
+        return jsonify({'error': 'Resource not found'}), 404
+    
+    if resource['user_id'] != request.user['uid']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    success = firebase_service.unassign_resource_from_students(resource_id, student_ids)
+    
+    if success:
+        return jsonify({
+            'success': True,
+            'message': f'Resource unassigned from {len(student_ids)} students',
+            'count': len(student_ids)
+        })
+    else:
+        return jsonify({'error': 'Failed to unassign resource'}), 500
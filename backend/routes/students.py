@@ -3,31 +3,28 @@ Student Management Routes
 Handles CRUD operations for students
 """
 
-from flask import Blueprint, request, jsonify
-from services.firebase_service import firebase_service
-from functools import wraps
+import csv
+import io
+import json
+import re
+import time
+from flask import Blueprint, request, jsonify, Response, stream_with_context
+from services.firebase_service import firebase_service, STUDENT_BATCH_SIZE
+from services import metrics
+from services.log import get_logger
+from routes.auth import require_auth
 
 students_bp = Blueprint('students', __name__)
+log = get_logger('students')
 
-def require_auth(f):
-    """Decorator to require authentication"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get('Authorization')
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return jsonify({'error': 'No authorization token provided'}), 401
-        
-        token = auth_header.split('Bearer ')[1]
-        user_info = firebase_service.verify_token(token)
-        
-        if not user_info:
-            return jsonify({'error': 'Invalid or expired token'}), 401
-        
-        request.user = user_info
-        return f(*args, **kwargs)
-    
-    return decorated_function
-
+# Fields an import row may set - anything else (including id, user_id and the
+# timestamps, which the server owns) is dropped
+IMPORT_STUDENT_FIELDS = ('name', 'email', 'grade', 'age', 'notes')
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+# JSON imports are parsed one student at a time, reading the body in chunks
+IMPORT_READ_CHUNK = 64 * 1024
+# Largest single JSON student object accepted
+MAX_IMPORT_ROW_BYTES = 64 * 1024
 
 @students_bp.route('/students', methods=['POST'])
 @require_auth
@@ -143,10 +140,238 @@ def get_student_resources(student_id):
     if not student or student['user_id'] != request.user['uid']:
         return jsonify({'error': 'Student not found'}), 404
     
-    resources = firebase_service.get_student_resources(student_id)
+    resources = firebase_service.get_student_resources(student_id, student)
     
     return jsonify({
         'success': True,
         'resources': resources,
         'count': len(resources)
     })
+
+
+# ==================== Bulk Import ====================
+
+def _iter_import_rows():
+    """
+    Yield (row_number, row) from the request body without loading CSV/NDJSON into memory
+    Accepts text/csv, a multipart `file` upload, application/x-ndjson or a JSON array
+    """
+    content_type = (request.mimetype or '').lower()
+    
+    if 'file' in request.files:
+        upload = request.files['file']
+        filename = (upload.filename or '').lower()
+        if filename.endswith(('.ndjson', '.jsonl')):
+            content_type = 'application/x-ndjson'
+        elif filename.endswith('.json'):
+            content_type = 'application/json'
+        else:
+            content_type = 'text/csv'
+        stream = upload.stream
+    else:
+        stream = request.stream
+    
+    if content_type in ('text/csv', 'application/csv'):
+        reader = csv.DictReader(io.TextIOWrapper(stream, encoding='utf-8-sig', newline=''))
+        # Row 1 is the header
+        for row_number, row in enumerate(reader, start=2):
+            yield row_number, row
+    elif content_type in ('application/x-ndjson', 'application/jsonl'):
+        for row_number, line in enumerate(io.TextIOWrapper(stream, encoding='utf-8-sig'), start=1):
+            if not line.strip():
+                continue
+            try:
+                yield row_number, json.loads(line)
+            except ValueError:
+                yield row_number, None
+    else:
+        reader = _JsonArrayReader(io.TextIOWrapper(stream, encoding='utf-8-sig'))
+        for row_number, row in enumerate(reader.items(), start=1):
+            yield row_number, row
+
+
+class _JsonArrayReader:
+    """
+    Incremental parser for a JSON array of students (or {"students": [...]}) -
+    holds one student at a time instead of the whole document
+    """
+    
+    def __init__(self, text):
+        self.text = text
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+    
+    def _read(self):
+        """Append the next chunk, dropping what's been parsed - False at end of input"""
+        chunk = self.text.read(IMPORT_READ_CHUNK)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def _peek(self):
+        """Next non-whitespace character, '' at end of input"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer) or not self._read():
+                return self.buffer[self.pos:self.pos + 1]
+    
+    def _expect(self, chars):
+        char = self._peek()
+        if not char or char not in chars:
+            raise ValueError('Expected a JSON array of students')
+        self.pos += 1
+        return char
+    
+    def _value(self):
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except ValueError:
+                # Incomplete - read on, unless the value is already over the limit
+                if len(self.buffer) - self.pos > MAX_IMPORT_ROW_BYTES:
+                    raise ValueError(f'JSON student over {MAX_IMPORT_ROW_BYTES} bytes')
+                if not self._read():
+                    raise
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end < len(self.buffer) or not self._read():
+                self.pos = end
+                return value
+    
+    def _seek_students(self):
+        """Skip an object's other keys up to the opening '[' of its students array"""
+        if self._peek() == '}':
+            raise ValueError('Expected a JSON array of students')
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == 'students':
+                self._expect('[')
+                return
+            self._value()
+            self._expect(',')
+    
+    def items(self):
+        if self._expect('[{') == '{':
+            self._seek_students()
+        if self._peek() == ']':
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
+
+
+def _student_key(name, email):
+    """Duplicate key - email when present, otherwise the case-insensitive name"""
+    if email:
+        return ('email', email.lower())
+    return ('name', ' '.join(name.lower().split()))
+
+
+def _clean_import_row(row):
+    """Normalize one import row, returns (student, error)"""
+    if not isinstance(row, dict):
+        return None, 'Row must be an object'
+    
+    student = {}
+    for field, value in row.items():
+        if field is None:
+            # Extra CSV cells without a header
+            continue
+        field = field.strip().lower()
+        if field not in IMPORT_STUDENT_FIELDS:
+            continue
+        if isinstance(value, str):
+            value = value.strip()
+        if value in ('', None):
+            continue
+        if not isinstance(value, (str, int, float)):
+            return None, f'Invalid {field}: must be text or a number'
+        student[field] = value
+    
+    name = student.get('name')
+    if not isinstance(name, str) or not name:
+        return None, 'Student name is required'
+    
+    email = student.get('email')
+    if email is not None and (not isinstance(email, str) or not EMAIL_PATTERN.match(email)):
+        return None, f'Invalid email: {email}'
+    
+    return student, None
+
+
+@students_bp.route('/students/import', methods=['POST'])
+@require_auth
+def import_students():
+    """
+    Import a roster in bulk
+    Skips students that already exist (same email, or same name when no email is given)
+    Streams progress as server-sent events
+    """
+    user_id = request.user['uid']
+    
+    def generate():
+        started = time.time()
+        imported = 0
+        duplicates = 0
+        # Each row error is streamed as it's found - only the count is kept
+        errors = 0
+        batch = []
+        
+        def progress():
+            return {
+                'type': 'progress',
+                'imported': imported,
+                'duplicates': duplicates,
+                'errors': errors
+            }
+        
+        try:
+            yield f"data: {json.dumps({'type': 'init'})}\n\n"
+            
+            # Everything the user already has, plus everything accepted so far in this import
+            seen = {
+                _student_key(student.get('name') or '', student.get('email'))
+                for student in firebase_service.get_user_students(user_id)
+            }
+            
+            for row_number, row in _iter_import_rows():
+                student, error = _clean_import_row(row)
+                if error:
+                    errors += 1
+                    yield f"data: {json.dumps({'type': 'row_error', 'row': row_number, 'error': error})}\n\n"
+                    continue
+                
+                key = _student_key(student['name'], student.get('email'))
+                if key in seen:
+                    duplicates += 1
+                    continue
+                seen.add(key)
+                batch.append(student)
+                
+                if len(batch) >= STUDENT_BATCH_SIZE:
+                    firebase_service.add_students(user_id, batch)
+                    imported += len(batch)
+                    batch = []
+                    yield f"data: {json.dumps(progress())}\n\n"
+            
+            if batch:
+                firebase_service.add_students(user_id, batch)
+                imported += len(batch)
+                batch = []
+                yield f"data: {json.dumps(progress())}\n\n"
+            
+            elapsed = time.time() - started
+            yield f"data: {json.dumps({'type': 'complete', 'imported': imported, 'duplicates': duplicates, 'errors': errors, 'seconds': round(elapsed, 3)})}\n\n"
+        except Exception as e:
+            log.exception("Student import failed after %d students", imported)
+            # Students in batches already committed stay imported
+            yield f"data: {json.dumps({'type': 'error', 'error': str(e), 'imported': imported})}\n\n"
+    
+    return Response(stream_with_context(metrics.timed_stream(generate(), 'students')), mimetype='text/event-stream')
@@ -4,31 +4,17 @@ Handles subscription management, checkout, and promo codes
 """
 
 from flask import Blueprint, request, jsonify
-from services.firebase_service import FirebaseService
+from services.firebase_service import firebase_service
 from services.subscription_service import SubscriptionService
-from functools import wraps
+from services.log import get_logger
+from routes.auth import require_auth_user as require_auth
 
 subscription_bp = Blueprint('subscription', __name__)
+log = get_logger('subscription')
 
-# Initialize services
-firebase_service = FirebaseService()
+# Initialize services (shares the process-wide Firebase service)
 subscription_service = SubscriptionService(firebase_service)
 
-def require_auth(f):
-    """Decorator to require authentication"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        token = request.headers.get('Authorization', '').replace('Bearer ', '')
-        if not token:
-            return jsonify({'error': 'Authentication required'}), 401
-        
-        user_info = firebase_service.verify_token(token)
-        if not user_info:
-            return jsonify({'error': 'Invalid token'}), 401
-        
-        return f(user_info, *args, **kwargs)
-    return decorated_function
-
 # ==================== Subscription Status ====================
 
 @subscription_bp.route('/subscription/status', methods=['GET'])
@@ -37,10 +23,11 @@ def get_subscription_status(user_info):
     """Get user's subscription status"""
     try:
         user_id = user_info['uid']
-        status = subscription_service.get_user_subscription_status(user_id)
+        # Always read fresh here - this is what the UI polls after checkout
+        status = subscription_service.get_user_subscription_status(user_id, use_cache=False)
         return jsonify({'success': True, 'status': status})
     except Exception as e:
-        print(f"Error getting subscription status: {e}")
+        log.error("Error getting subscription status: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @subscription_bp.route('/subscription/initialize-trial', methods=['POST'])
@@ -52,7 +39,7 @@ def initialize_trial(user_info):
         trial_data = subscription_service.initialize_user_trial(user_id)
         return jsonify({'success': True, 'trial': trial_data})
     except Exception as e:
-        print(f"Error initializing trial: {e}")
+        log.error("Error initializing trial: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # ==================== Stripe Checkout ====================
@@ -78,7 +65,7 @@ def create_checkout_session(user_info):
         
         return jsonify({'success': True, 'checkout_url': checkout_url})
     except Exception as e:
-        print(f"Error creating checkout session: {e}")
+        log.error("Error creating checkout session: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @subscription_bp.route('/subscription/create-portal-session', methods=['POST'])
@@ -97,7 +84,7 @@ def create_portal_session(user_info):
         
         return jsonify({'success': True, 'portal_url': portal_url})
     except Exception as e:
-        print(f"Error creating portal session: {e}")
+        log.error("Error creating portal session: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # ==================== Stripe Webhook ====================
@@ -115,7 +102,7 @@ def stripe_webhook():
         result = subscription_service.handle_webhook(payload, sig_header)
         return jsonify(result)
     except Exception as e:
-        print(f"Webhook error: {e}")
+        log.warning("Webhook rejected: %s", e)
         return jsonify({'error': str(e)}), 400
 
 # ==================== Promo Codes ====================
@@ -139,7 +126,7 @@ def apply_promo_code(user_info):
         else:
             return jsonify(result), 400
     except Exception as e:
-        print(f"Error applying promo code: {e}")
+        log.error("Error applying promo code: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @subscription_bp.route('/subscription/promo-codes', methods=['GET'])
@@ -151,7 +138,7 @@ def list_promo_codes(user_info):
         promo_codes = subscription_service.list_promo_codes()
         return jsonify({'success': True, 'promo_codes': promo_codes})
     except Exception as e:
-        print(f"Error listing promo codes: {e}")
+        log.error("Error listing promo codes: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @subscription_bp.route('/subscription/promo-codes', methods=['POST'])
@@ -170,7 +157,7 @@ def create_promo_code(user_info):
         promo_data = subscription_service.create_promo_code(code, description)
         return jsonify({'success': True, 'promo_code': promo_data})
     except Exception as e:
-        print(f"Error creating promo code: {e}")
+        log.error("Error creating promo code: %s", e)
         return jsonify({'error': str(e)}), 500
 
 @subscription_bp.route('/subscription/promo-codes/<code>', methods=['GET'])
@@ -185,7 +172,7 @@ def get_promo_code_stats(user_info, code):
         else:
             return jsonify({'error': 'Promo code not found'}), 404
     except Exception as e:
-        print(f"Error getting promo code stats: {e}")
+        log.error("Error getting promo code stats: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # ==================== Subscription Check Utility ====================
@@ -193,11 +180,12 @@ def get_promo_code_stats(user_info, code):
 def check_subscription_access(user_id: str) -> tuple[bool, dict]:
     """
     Utility function to check if user has access to create/download content
+    Served from the entitlement cache - no Firestore read on a warm cache
     Returns: (has_access: bool, status_info: dict)
     """
     try:
         status = subscription_service.get_user_subscription_status(user_id)
         return status.get('can_create_content', False), status
     except Exception as e:
-        print(f"Error checking subscription access: {e}")
+        log.error("Error checking subscription access: %s", e)
         return False, {'error': str(e)}
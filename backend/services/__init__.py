@@ -1,4 +1,17 @@
 """Services package"""
-from .firebase_service import firebase_service
 
-__all__ = ['firebase_service']
+__all__ = ['firebase_service', 'auth_service']
+
+
+def __getattr__(name):
+    # Resolved on first access so importing a light submodule (services.metrics,
+    # services.cache) doesn't pull in firebase_admin
+    if name == 'firebase_service':
+        from .firebase_service import firebase_service as service
+    elif name == 'auth_service':
+        from .auth_service import auth_service as service
+    else:
+        raise AttributeError(f"module 'services' has no attribute {name!r}")
+    # Importing the submodule bound its module object to this name - rebind the instance
+    globals()[name] = service
+    return service
@@ -0,0 +1,108 @@
+"""
+Authentication Service
+Verifies Firebase ID tokens once and caches the decoded result until the token expires
+"""
+
+import hashlib
+import os
+import time
+from typing import Dict, Optional
+
+from .cache import TTLCache
+from .firebase_service import firebase_service
+
+# Firebase ID tokens expire an hour after they're issued
+ID_TOKEN_LIFETIME = 3600
+
+
+class AuthService:
+    def __init__(self, firebase_service):
+        self.firebase_service = firebase_service
+
+        # Upper bound on how long a verified token is trusted without re-checking,
+        # even if its own `exp` is further away. Keeps revocations visible in bounded time.
+        self.max_cache_ttl = int(os.getenv('AUTH_TOKEN_CACHE_TTL', '300'))
+        # Seconds shaved off `exp` so a cached token never outlives the real one
+        self.expiry_skew = 30
+
+        self.token_cache = TTLCache(
+            max_size=int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '2048')),
+            default_ttl=self.max_cache_ttl
+        )
+        # Tokens signed out in this worker - refused until they would have expired anyway
+        self.revoked_tokens = TTLCache(
+            max_size=int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '2048')),
+            default_ttl=ID_TOKEN_LIFETIME
+        )
+
+    @staticmethod
+    def _token_key(id_token: str) -> str:
+        """Cache key for a token - never keep the raw bearer token in memory longer than needed"""
+        return hashlib.sha256(id_token.encode('utf-8')).hexdigest()
+
+    def verify_token(self, id_token: str) -> Optional[Dict]:
+        """
+        Verify Firebase ID token and return user info
+        Served from cache when the same token was verified recently
+        """
+        if not id_token:
+            return None
+
+        key = self._token_key(id_token)
+        if self.revoked_tokens.get(key) is not None:
+            return None
+        cached = self.token_cache.get(key)
+        if cached is not None:
+            return dict(cached)
+
+        claims = self.firebase_service.decode_token(id_token)
+        if not claims:
+            return None
+
+        user_info = {
+            'uid': claims['uid'],
+            'email': claims.get('email'),
+            'email_verified': claims.get('email_verified', False),
+            'name': claims.get('name'),
+            'picture': claims.get('picture')
+        }
+
+        now = time.time()
+        expires_at = now + self.max_cache_ttl
+        if claims.get('exp'):
+            expires_at = min(expires_at, float(claims['exp']) - self.expiry_skew)
+        if expires_at > now:
+            self.token_cache.set(key, user_info, expires_at=expires_at)
+
+        return dict(user_info)
+
+    # ==================== Revocation Hooks ====================
+
+    def revoke_token(self, id_token: str) -> bool:
+        """Forget a single token and refuse it from now on in this worker (e.g. on sign-out)"""
+        key = self._token_key(id_token)
+        self.revoked_tokens.set(key, True)
+        return self.token_cache.delete(key)
+
+    def revoke_user(self, uid: str, revoke_refresh_tokens: bool = False) -> int:
+        """
+        Forget every cached token for a user
+        Optionally also revokes the user's Firebase refresh tokens
+        Returns the number of cached tokens dropped
+        """
+        dropped = self.token_cache.delete_where(lambda key, value: value.get('uid') == uid)
+        if revoke_refresh_tokens:
+            self.firebase_service.revoke_refresh_tokens(uid)
+        return dropped
+
+    def clear(self) -> None:
+        """Drop all cached tokens"""
+        self.token_cache.clear()
+
+    def get_cache_stats(self) -> Dict:
+        """Token cache size and hit-rate metrics"""
+        return self.token_cache.stats()
+
+
+# Singleton instance
+auth_service = AuthService(firebase_service)
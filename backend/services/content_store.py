@@ -0,0 +1,151 @@
+"""
+Resource Content Storage Layout
+Encodes resource content as independently compressed top-level sections
+
+Layout on the resource document (content_format == 'zlib-sections-v1'):
+    content_sections:  {section_name: zlib(json) bytes}   sections stored inline
+    content_hashes:    {section_name: sha1 of the section's canonical json}
+    content_external:  [section_name, ...]                 sections too large to inline,
+                                                           stored in the content_sections
+                                                           subcollection as {'data': bytes}
+    content_sizes:     {section_name: compressed bytes}    every section, inline or not
+
+Firestore caps a document at 1 MiB. Sections go to subdocuments when they are over
+SUBDOC_THRESHOLD on their own, and the largest remaining ones are spilled too
+until the inline sections fit INLINE_BUDGET. A section too large even for a
+subdocument is rejected with SectionTooLarge.
+
+Legacy documents keep `content` as one json.dumps string and are still readable.
+"""
+
+import hashlib
+import json
+import os
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+CONTENT_FORMAT = 'zlib-sections-v1'
+SECTIONS_SUBCOLLECTION = 'content_sections'
+
+# Fields of the layout that must never leak into API responses (bytes aren't JSON serializable)
+LAYOUT_FIELDS = ('content_format', 'content_sections', 'content_hashes', 'content_external', 'content_sizes')
+
+# 'sections' writes the compressed layout, 'json' keeps writing the legacy string
+WRITE_FORMAT = os.getenv('RESOURCE_CONTENT_FORMAT', 'sections')
+COMPRESSION_LEVEL = int(os.getenv('RESOURCE_CONTENT_COMPRESSION_LEVEL', '6'))
+# Compressed sections above this size go to a subdocument instead of the resource document
+SUBDOC_THRESHOLD = int(os.getenv('RESOURCE_SECTION_SUBDOC_BYTES', '262144'))
+# Total compressed bytes kept inline on the resource document - the rest of the
+# 1 MiB document limit is left for titles, summaries, image URLs and assignments
+INLINE_BUDGET = int(os.getenv('RESOURCE_INLINE_CONTENT_BYTES', '786432'))
+# Largest section a subdocument ({'data': blob}) can hold
+MAX_SECTION_BYTES = 1_048_576 - 1024
+
+
+class SectionTooLarge(ValueError):
+    """A compressed section doesn't fit in a Firestore document, inline or not"""
+
+    def __init__(self, name: str, size: int):
+        super().__init__(f"Content section '{name}' is too large to store ({size} bytes compressed, "
+                         f"limit {MAX_SECTION_BYTES})")
+        self.name = name
+        self.size = size
+
+
+def _canonical_json(value: Any) -> bytes:
+    return json.dumps(value, sort_keys=True, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def section_hash(value: Any) -> str:
+    """Stable hash of a section value, used to detect which sections changed"""
+    return hashlib.sha1(_canonical_json(value)).hexdigest()
+
+
+def encode_section(value: Any) -> bytes:
+    return zlib.compress(_canonical_json(value), COMPRESSION_LEVEL)
+
+
+def decode_section(blob: bytes) -> Any:
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+def check_section_size(name: str, blob: bytes) -> None:
+    if len(blob) > MAX_SECTION_BYTES:
+        raise SectionTooLarge(name, len(blob))
+
+
+def place_sections(blobs: Dict[str, bytes], inline_bytes: int = 0) -> Tuple[List[str], List[str]]:
+    """
+    Decide which sections are stored inline and which in subdocuments
+    `inline_bytes` is what already stays inline (unchanged sections on an update).
+    Sections over SUBDOC_THRESHOLD always go external; of the rest, the largest
+    are spilled until the inline total fits INLINE_BUDGET.
+    Returns: (inline_names, external_names)
+    """
+    for name, blob in blobs.items():
+        check_section_size(name, blob)
+    external = [name for name, blob in blobs.items() if len(blob) > SUBDOC_THRESHOLD]
+    inline = sorted((name for name in blobs if name not in external), key=lambda name: len(blobs[name]))
+    total = inline_bytes + sum(len(blobs[name]) for name in inline)
+    while inline and total > INLINE_BUDGET:
+        name = inline.pop()
+        total -= len(blobs[name])
+        external.append(name)
+    return inline, external
+
+
+def encode_content(content: Dict[str, Any]) -> Tuple[Dict[str, bytes], Dict[str, bytes], Dict[str, str]]:
+    """
+    Split content into compressed sections, placed per place_sections
+    Returns: (inline_sections, external_sections, hashes)
+    """
+    blobs = {name: encode_section(value) for name, value in content.items()}
+    hashes = {name: section_hash(value) for name, value in content.items()}
+    inline, external = place_sections(blobs)
+    return ({name: blobs[name] for name in inline}, {name: blobs[name] for name in external}, hashes)
+
+
+def changed_sections(content: Dict[str, Any], stored_hashes: Optional[Dict[str, str]]) -> Tuple[List[str], List[str]]:
+    """
+    Compare content against the hashes of what is stored
+    Returns: (changed_or_new_section_names, removed_section_names)
+    """
+    stored_hashes = stored_hashes or {}
+    changed = [name for name, value in content.items() if stored_hashes.get(name) != section_hash(value)]
+    removed = [name for name in stored_hashes if name not in content]
+    return changed, removed
+
+
+def is_sectioned(data: Dict[str, Any]) -> bool:
+    return data.get('content_format') == CONTENT_FORMAT
+
+
+def decode_content(data: Dict[str, Any], external: Optional[Dict[str, bytes]] = None,
+                   sections: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Rebuild content from a resource document
+    Only the requested sections are decompressed when `sections` is given
+    """
+    if not is_sectioned(data):
+        content = data.get('content', {})
+        if isinstance(content, str):
+            try:
+                content = json.loads(content)
+            except ValueError:
+                pass
+        if sections is not None and isinstance(content, dict):
+            wanted = set(sections)
+            content = {name: value for name, value in content.items() if name in wanted}
+        return content
+
+    blobs = dict(data.get('content_sections') or {})
+    blobs.update(external or {})
+    wanted = set(blobs) if sections is None else set(sections)
+    return {name: decode_section(blob) for name, blob in blobs.items() if name in wanted}
+
+
+def strip_layout_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Remove storage-layout fields from a resource dict before returning it"""
+    for field in LAYOUT_FIELDS:
+        data.pop(field, None)
+    return data
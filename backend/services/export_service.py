@@ -0,0 +1,329 @@
+"""
+Export Service
+Renders resources to downloadable files and caches the results on disk
+
+Artifacts are keyed by resource type plus a hash of the content and images, so
+any change produces a new key and stale files are never served. With
+EXPORT_PRERENDER enabled, finished generations and edits queue a low-priority
+background render so the first download is usually a cache hit; a queued job is
+dropped when a newer version of the same resource is queued after it.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, BinaryIO, Callable, Dict, Optional, Tuple
+from . import metrics, tracing
+from .log import get_logger
+
+log = get_logger('export')
+
+EXPORT_PRERENDER = os.getenv('EXPORT_PRERENDER', 'false').lower() == 'true'
+EXPORT_PRERENDER_NICE = int(os.getenv('EXPORT_PRERENDER_NICE', '10'))
+EXPORT_CACHE_DIR = os.getenv('EXPORT_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'agenticdp-exports')
+EXPORT_CACHE_MAX_BYTES = int(os.getenv('EXPORT_CACHE_MAX_BYTES', str(256 * 1024 * 1024)))
+# Longest title kept in a download or bundle entry filename
+MAX_FILENAME_TITLE = 100
+
+# Path separators, control characters and characters Windows won't put in a filename
+_UNSAFE_FILENAME_CHARS = re.compile(r'[\x00-\x1f\x7f/\\:*?"<>|]')
+
+
+def _lower_thread_priority():
+    """Executor initializer - renice the worker thread so exports yield to request threads (Linux)"""
+    try:
+        os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), EXPORT_PRERENDER_NICE)
+    except (AttributeError, OSError, PermissionError):
+        pass
+
+
+class ExportService:
+    def __init__(self, cache_dir: str = EXPORT_CACHE_DIR, max_bytes: int = EXPORT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = max_bytes > 0
+        self.prerender_enabled = EXPORT_PRERENDER and self.enabled
+
+        # resource_type -> {'render', 'extension', 'mimetype', 'default_name'}
+        self.renderers: Dict[str, Dict[str, Any]] = {}
+
+        # cache key -> size in bytes, least recently used first
+        self._index: 'OrderedDict[str, int]' = OrderedDict()
+        self._index_bytes = 0
+        self._lock = threading.Lock()
+
+        # resource_id -> (version, future) of the newest queued pre-render
+        self._pending: Dict[str, Tuple[str, Future]] = {}
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._prerender_executor: Optional[ThreadPoolExecutor] = None
+
+        self.stats_counters = {'hits': 0, 'misses': 0, 'prerendered': 0, 'superseded': 0, 'failed': 0}
+
+    # ==================== Registry ====================
+
+    def register(self, resource_type: str, render: Callable[[Dict, Dict], BinaryIO],
+                 extension: str, mimetype: str, default_name: Optional[str] = None) -> None:
+        """Register the renderer for a resource type: render(data, images) -> file positioned at 0"""
+        self.renderers[resource_type] = {
+            'render': render,
+            'extension': extension,
+            'mimetype': mimetype,
+            'default_name': default_name or resource_type
+        }
+
+    def mimetype(self, resource_type: str) -> str:
+        return self.renderers[resource_type]['mimetype']
+
+    def filename(self, resource_type: str, data: Dict) -> str:
+        """
+        Download filename from the resource title, reduced to a safe basename
+        (it names bundle entries and goes in Content-Disposition headers)
+        """
+        renderer = self.renderers[resource_type]
+        title = data.get('title')
+        title = _UNSAFE_FILENAME_CHARS.sub('', title if isinstance(title, str) else '')
+        title = '_'.join(title.split()).lstrip('.')[:MAX_FILENAME_TITLE].rstrip('.')
+        return f"{title or renderer['default_name']}.{renderer['extension']}"
+
+    # ==================== Executors ====================
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Executor for renders someone is waiting on (downloads, bundles)"""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=int(os.getenv('EXPORT_WORKERS', '2')),
+                        thread_name_prefix='export'
+                    )
+        return self._executor
+
+    @property
+    def prerender_executor(self) -> ThreadPoolExecutor:
+        """Low-priority executor for speculative pre-renders"""
+        if self._prerender_executor is None:
+            with self._lock:
+                if self._prerender_executor is None:
+                    self._prerender_executor = ThreadPoolExecutor(
+                        max_workers=int(os.getenv('EXPORT_PRERENDER_WORKERS', '1')),
+                        thread_name_prefix='export-prerender',
+                        initializer=_lower_thread_priority
+                    )
+        return self._prerender_executor
+
+    # ==================== Cache ====================
+
+    @staticmethod
+    def version(data: Dict, images: Dict) -> str:
+        """Content hash of everything an export is rendered from"""
+        digest = hashlib.sha1()
+        digest.update(json.dumps(data, sort_keys=True, default=str).encode('utf-8'))
+        for key in sorted(images or {}):
+            value = images[key]
+            digest.update(f"\0{key}\0".encode('utf-8'))
+            digest.update(value.encode('utf-8') if isinstance(value, str) else repr(value).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _cache_key(self, resource_type: str, version: str) -> str:
+        return f"{resource_type}-{version}"
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key)
+
+    def _open_cached(self, key: str) -> Optional[BinaryIO]:
+        """Open a cached artifact (also adopts files written by other workers)"""
+        path = self._cache_path(key)
+        try:
+            stream = open(path, 'rb')
+        except OSError:
+            with self._lock:
+                size = self._index.pop(key, None)
+                if size is not None:
+                    self._index_bytes -= size
+            return None
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+            else:
+                size = os.fstat(stream.fileno()).st_size
+                self._index[key] = size
+                self._index_bytes += size
+            self._evict()
+        return stream
+
+    def _store(self, key: str, stream: BinaryIO) -> None:
+        """Copy a rendered file into the cache (atomically), leaving `stream` at position 0"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        stream.seek(0)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(stream, f)
+                size = f.tell()
+            os.replace(tmp_path, self._cache_path(key))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        finally:
+            stream.seek(0)
+
+        with self._lock:
+            self._index_bytes -= self._index.pop(key, 0)
+            self._index[key] = size
+            self._index_bytes += size
+            self._evict()
+
+    def _evict(self) -> None:
+        """Drop least recently used artifacts over the byte budget (caller holds the lock)"""
+        while self._index_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._index_bytes -= size
+            try:
+                os.unlink(self._cache_path(key))
+            except OSError:
+                pass
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats_counters[name] += 1
+
+    # ==================== Rendering ====================
+
+    def render(self, resource_type: str, data: Dict, images: Dict) -> BinaryIO:
+        """
+        Return the rendered export as an open file positioned at 0 (caller closes it)
+        Served from the cache when this exact content was rendered before
+        """
+        if resource_type not in self.renderers:
+            raise ValueError(f"No exporter for resource type: {resource_type}")
+
+        if not self.enabled:
+            with metrics.EXPORT_SECONDS.time(resource_type=resource_type, cache='off'):
+                return self.renderers[resource_type]['render'](data, images)
+
+        started = time.perf_counter()
+        key = self._cache_key(resource_type, self.version(data, images))
+        cached = self._open_cached(key)
+        if cached is not None:
+            self._count('hits')
+            metrics.EXPORT_SECONDS.observe(time.perf_counter() - started, resource_type=resource_type,
+                                           cache='hit', status='ok')
+            return cached
+
+        self._count('misses')
+        with metrics.EXPORT_SECONDS.time(resource_type=resource_type, cache='miss'), \
+                tracing.span('export.render', resource_type=resource_type):
+            stream = self.renderers[resource_type]['render'](data, images)
+        try:
+            self._store(key, stream)
+        except Exception as e:
+            log.warning("Could not cache export %s: %s", key, e)
+        return stream
+
+    def render_async(self, resource_type: str, data: Dict, images: Dict) -> Future:
+        """render() on the export executor"""
+        return self.executor.submit(self.render, resource_type, data, images)
+
+    # ==================== Pre-rendering ====================
+
+    def prerender(self, resource_type: str, resource_id: str, data: Dict, images: Dict) -> bool:
+        """
+        Queue a background render of the current version of a resource
+        Any not-yet-started job for an older version of the same resource is cancelled,
+        and a started one is discarded. Returns whether a job was queued.
+        """
+        if not self.prerender_enabled or resource_type not in self.renderers:
+            return False
+
+        # Snapshot now - the in-memory stores keep changing under the request threads
+        data = copy.deepcopy(data)
+        images = dict(images or {})
+        version = self.version(data, images)
+        key = self._cache_key(resource_type, version)
+        if os.path.exists(self._cache_path(key)):
+            return False
+
+        executor = self.prerender_executor
+        with self._lock:
+            previous = self._pending.get(resource_id)
+            if previous and previous[0] == version:
+                return False
+            if previous and previous[1].cancel():
+                self.stats_counters['superseded'] += 1
+            future = executor.submit(
+                self._prerender_job, resource_type, resource_id, version, data, images
+            )
+            self._pending[resource_id] = (version, future)
+        return True
+
+    def _prerender_job(self, resource_type: str, resource_id: str, version: str, data: Dict, images: Dict):
+        try:
+            with self._lock:
+                current = self._pending.get(resource_id)
+                if current and current[0] != version:
+                    self.stats_counters['superseded'] += 1
+                    return
+            if not self._render_to_cache(resource_type, version, data, images):
+                # Already cached (e.g. by a download in the meantime)
+                return
+            with self._lock:
+                current = self._pending.get(resource_id)
+                if current and current[0] != version:
+                    # A newer version arrived while rendering - keep the file, it's harmless,
+                    # but don't count it as the resource's pre-render
+                    self.stats_counters['superseded'] += 1
+                else:
+                    self.stats_counters['prerendered'] += 1
+            log.debug("Pre-rendered %s %s", resource_type, resource_id)
+        except Exception as e:
+            with self._lock:
+                self.stats_counters['failed'] += 1
+            log.warning("Pre-render failed for %s %s: %s", resource_type, resource_id, e)
+        finally:
+            # However the job ended, it's no longer pending - unless a newer version replaced it
+            with self._lock:
+                current = self._pending.get(resource_id)
+                if current and current[0] == version:
+                    self._pending.pop(resource_id, None)
+
+    def _render_to_cache(self, resource_type: str, version: str, data: Dict, images: Dict) -> bool:
+        """Render straight into the cache without touching the hit/miss counters"""
+        key = self._cache_key(resource_type, version)
+        if os.path.exists(self._cache_path(key)):
+            return False
+        with metrics.EXPORT_SECONDS.time(resource_type=resource_type, cache='prerender'):
+            stream = self.renderers[resource_type]['render'](data, images)
+        try:
+            self._store(key, stream)
+        finally:
+            stream.close()
+        return True
+
+    # ==================== Stats ====================
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'prerender_enabled': self.prerender_enabled,
+                'entries': len(self._index),
+                'bytes': self._index_bytes,
+                'max_bytes': self.max_bytes,
+                'pending_prerenders': len(self._pending),
+                **self.stats_counters
+            }
+
+
+# Singleton instance
+export_service = ExportService()
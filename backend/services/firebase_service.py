@@ -5,45 +5,192 @@ Handles user authentication and CRUD operations for resources
 
 import firebase_admin
 from firebase_admin import credentials, firestore, auth, storage
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+from google.api_core.exceptions import FailedPrecondition
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 import os
 import json
 import base64
+import threading
+import time
 import uuid
+from . import content_store
+from . import metrics, tracing
+from .log import get_logger, sampled
+
+log = get_logger('firebase')
+
+# Longest a Storage write waits for the background bucket check after boot
+BUCKET_VERIFY_TIMEOUT = float(os.getenv('FIREBASE_BUCKET_VERIFY_TIMEOUT', '10'))
+
+# Fields returned by get_user_resources(fields='summary') - enough for the library grid
+SUMMARY_FIELDS = ['id', 'title', 'subtitle', 'topic', 'resource_type', 'created_at', 'updated_at',
+                  'thumbnail_url', 'assigned_students']
+
+# Firestore limit on writes per batch
+STUDENT_BATCH_SIZE = 500
+# Students per bulk (un)assignment - the resource update plus one index entry per
+# student must fit a single batch, so the change applies all at once or not at all
+MAX_BULK_STUDENTS = STUDENT_BATCH_SIZE - 1
+
+# Per-student assignment index: students/{student_id}/assignments/{resource_id}
+ASSIGNMENTS_SUBCOLLECTION = 'assignments'
+# Resource fields copied into each assignment entry - what a student's feed shows
+ASSIGNMENT_FIELDS = ['title', 'subtitle', 'topic', 'resource_type', 'thumbnail_url', 'created_at']
+
+# Image keys tried in order when picking a resource thumbnail
+THUMBNAIL_KEYS = ['introduction', 'slide_0', 'section_0', 'key_concept_0']
+# The first image of each content type - changing one of these always changes the thumbnail
+PRIMARY_THUMBNAIL_KEYS = ['introduction', 'slide_0', 'section_0']
+
+
+def pick_thumbnail(images: Optional[Dict]) -> Optional[str]:
+    """Pick the image URL shown as a resource's thumbnail"""
+    if not images:
+        return None
+    for key in THUMBNAIL_KEYS:
+        url = images.get(key)
+        if isinstance(url, str) and url.startswith('http'):
+            return url
+    for key in sorted(images):
+        url = images[key]
+        if isinstance(url, str) and url.startswith('http'):
+            return url
+    return None
+
+
+def encode_cursor(created_at: datetime, resource_id: Optional[str] = None) -> str:
+    """
+    Opaque pagination cursor from the created_at and id of the last returned resource
+    The id breaks ties between resources created in the same instant.
+    """
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    micros = int(created_at.timestamp() * 1_000_000)
+    raw = f'{micros}:{resource_id}' if resource_id else str(micros)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, Optional[str]]:
+    """
+    Inverse of encode_cursor: (created_at, resource id or None for cursors issued
+    before ids were included) - raises ValueError on a malformed cursor
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        micros, _, resource_id = base64.urlsafe_b64decode(padded.encode()).decode().partition(':')
+        created_at = datetime.fromtimestamp(int(micros) / 1_000_000, tz=timezone.utc)
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return created_at, resource_id or None
+
 
 class FirebaseService:
+    """
+    Firebase Admin SDK wrapper
+    Nothing touches the network at import time - the SDK is initialized on first use
+    of db/bucket/enabled, and the storage bucket is verified in a background thread.
+    """
     _instance = None
-    _initialized = False
+    _init_lock = threading.Lock()
     
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(FirebaseService, cls).__new__(cls)
+            cls._instance._initialized = False
+            cls._instance._db = None
+            cls._instance._bucket = None
+            cls._instance._enabled = False
+            cls._instance._bucket_verified = threading.Event()
         return cls._instance
     
     def __init__(self):
-        if not FirebaseService._initialized:
-            self._initialize_firebase()
-            FirebaseService._initialized = True
+        # Initialization is lazy - see _ensure_initialized
+        pass
+    
+    # ---------- Lazy initialization ----------
+    
+    def _ensure_initialized(self):
+        if self._initialized:
+            return
+        with FirebaseService._init_lock:
+            if not self._initialized:
+                started = time.perf_counter()
+                self._initialize_firebase()
+                self._initialized = True
+                log.info("Firebase ready in %.0fms", (time.perf_counter() - started) * 1000)
+    
+    def initialize(self) -> bool:
+        """Initialize eagerly (e.g. from a warm-up hook); returns whether Firebase is enabled"""
+        return self.enabled
+    
+    @property
+    def db(self):
+        self._ensure_initialized()
+        return self._db
+    
+    @property
+    def enabled(self) -> bool:
+        self._ensure_initialized()
+        return self._enabled
+    
+    @property
+    def bucket(self):
+        """
+        The storage bucket, or None if Storage is unavailable
+        Waits (bounded) for the background existence check so uploads fail fast
+        instead of writing to a bucket that doesn't exist
+        """
+        self._ensure_initialized()
+        if self._bucket is not None and not self._bucket_verified.is_set():
+            self._bucket_verified.wait(BUCKET_VERIFY_TIMEOUT)
+        return self._bucket
+    
+    def _verify_bucket(self, project_id: Optional[str]):
+        """Background check that the configured bucket actually exists"""
+        bucket = self._bucket
+        try:
+            bucket.exists()
+            log.info("Storage bucket connected: %s", bucket.name)
+        except Exception as e:
+            log.warning("Storage bucket '%s' does not exist: %s - enable Firebase Storage at "
+                        "https://console.firebase.google.com/project/%s/storage", bucket.name, e, project_id)
+            self._bucket = None
+        finally:
+            self._bucket_verified.set()
+    
+    def _start_bucket_verification(self, project_id: Optional[str]):
+        if self._bucket is None:
+            self._bucket_verified.set()
+            return
+        threading.Thread(target=self._verify_bucket, args=(project_id,),
+                         name='firebase-bucket-check', daemon=True).start()
     
     def _initialize_firebase(self):
         """Initialize Firebase Admin SDK"""
         try:
             # Check if already initialized
-            firebase_admin.get_app()
-            print("✓ Firebase already initialized")
-            self.db = firestore.client()
-            self.enabled = True
+            app = firebase_admin.get_app()
+            log.info("Firebase already initialized")
+            self._db = firestore.client()
+            self._enabled = True
+            try:
+                self._bucket = storage.bucket() if app.options.get('storageBucket') else None
+            except Exception as e:
+                log.warning("Storage bucket error: %s", e)
+                self._bucket = None
+            self._start_bucket_verification(app.project_id)
         except ValueError:
             # Initialize Firebase
             cred_path = os.getenv('FIREBASE_CREDENTIALS_PATH')
             
             # Check if Firebase credentials are configured
             if not cred_path and not os.getenv('FIREBASE_PROJECT_ID'):
-                print("⚠️  Firebase not configured - running without authentication/database")
-                print("   To enable Firebase, follow the setup guide: SETUP_GUIDE.md")
-                self.db = None
-                self.enabled = False
+                log.warning("Firebase not configured - running without authentication/database "
+                            "(see SETUP_GUIDE.md to enable it)")
+                self._db = None
+                self._enabled = False
+                self._bucket_verified.set()
                 return
             
             try:
@@ -68,7 +215,6 @@ class FirebaseService:
                 project_id = None
                 if cred_path:
                     # Get from credentials file
-                    import json
                     with open(cred_path) as f:
                         cred_data = json.load(f)
                         project_id = cred_data.get('project_id')
@@ -83,59 +229,81 @@ class FirebaseService:
                     firebase_admin.initialize_app(cred, {
                         'storageBucket': storage_bucket
                     })
-                    print(f"✓ Firebase initialized with storage bucket: {storage_bucket}")
+                    log.info("Firebase initialized with storage bucket: %s", storage_bucket)
                 else:
                     firebase_admin.initialize_app(cred)
-                    print("⚠️  Firebase initialized without storage bucket (project_id not found)")
+                    log.warning("Firebase initialized without storage bucket (project_id not found)")
                 
-                self.db = firestore.client()
+                self._db = firestore.client()
                 
-                # Try to get storage bucket and verify it exists
+                # Get the storage bucket - its existence is verified in the background
+                # so boot isn't gated on a network round trip
                 try:
                     if project_id:
-                        self.bucket = storage.bucket()
-                        # Test if bucket actually exists by checking if we can access it
-                        try:
-                            self.bucket.exists()
-                            print(f"✓ Storage bucket connected: {self.bucket.name}")
-                        except Exception as e:
-                            print(f"⚠️  Storage bucket '{self.bucket.name}' does not exist: {e}")
-                            print(f"   Enable Firebase Storage at: https://console.firebase.google.com/project/{project_id}/storage")
-                            self.bucket = None
+                        self._bucket = storage.bucket()
                     else:
-                        self.bucket = None
-                        print("⚠️  Storage bucket not available (no project_id)")
+                        self._bucket = None
+                        log.warning("Storage bucket not available (no project_id)")
                 except Exception as e:
-                    print(f"⚠️  Storage bucket error: {e}")
-                    print("   Make sure Firebase Storage is enabled in your Firebase Console")
-                    self.bucket = None
+                    log.warning("Storage bucket error: %s - make sure Firebase Storage is enabled "
+                                "in your Firebase Console", e)
+                    self._bucket = None
+                self._start_bucket_verification(project_id)
                 
-                self.enabled = True
+                self._enabled = True
             except Exception as e:
-                print(f"⚠️  Firebase initialization failed: {str(e)}")
-                print("   Running without authentication/database")
-                print("   To enable Firebase, follow the setup guide: SETUP_GUIDE.md")
-                self.db = None
-                self.enabled = False
+                log.error("Firebase initialization failed: %s - running without authentication/database "
+                          "(see SETUP_GUIDE.md to enable it)", e)
+                self._db = None
+                self._enabled = False
+                self._bucket_verified.set()
     
     # ==================== User Management ====================
     
-    def verify_token(self, id_token: str) -> Optional[Dict]:
-        """Verify Firebase ID token and return user info"""
+    def decode_token(self, id_token: str) -> Optional[Dict]:
+        """
+        Verify Firebase ID token and return its decoded claims (including `exp`)
+        Tokens issued before the user's refresh tokens were revoked are rejected -
+        that costs a user lookup, so callers should cache the result
+        """
         if not self.enabled:
             return None
         try:
-            decoded_token = auth.verify_id_token(id_token)
-            return {
-                'uid': decoded_token['uid'],
-                'email': decoded_token.get('email'),
-                'name': decoded_token.get('name'),
-                'picture': decoded_token.get('picture')
-            }
+            return auth.verify_id_token(id_token, check_revoked=True)
         except Exception as e:
-            print(f"Error verifying token: {e}")
+            # Expired, revoked or forged tokens are routine - not worth more than debug
+            log.debug("Token verification failed: %s", e)
             return None
+
+    def verify_token(self, id_token: str) -> Optional[Dict]:
+        """
+        Verify Firebase ID token and return user info
+        Always hits the verifier - request handlers should use auth_service.verify_token,
+        which caches the result
+        """
+        decoded_token = self.decode_token(id_token)
+        if not decoded_token:
+            return None
+        return {
+            'uid': decoded_token['uid'],
+            'email': decoded_token.get('email'),
+            'email_verified': decoded_token.get('email_verified', False),
+            'name': decoded_token.get('name'),
+            'picture': decoded_token.get('picture')
+        }
+
+    def revoke_refresh_tokens(self, uid: str) -> bool:
+        """Revoke all Firebase refresh tokens for a user"""
+        if not self.enabled:
+            return False
+        try:
+            auth.revoke_refresh_tokens(uid)
+            return True
+        except Exception as e:
+            log.error("Could not revoke refresh tokens for %s: %s", uid, e)
+            return False
     
+    @metrics.firestore_operation('read')
     def get_or_create_user(self, user_info: Dict) -> Dict:
         """Get or create user document in Firestore"""
         if not self.enabled:
@@ -180,18 +348,21 @@ class FirebaseService:
             filename = f"resources/{resource_id}/{image_key}.png"
             
             # Upload to storage
-            blob = self.bucket.blob(filename)
-            blob.upload_from_string(image_bytes, content_type='image/png')
-            
-            # Make public and get URL with cache-busting timestamp
-            blob.make_public()
+            with metrics.STORAGE_UPLOAD_SECONDS.time(), \
+                    tracing.span('storage.upload', key=image_key, bytes=len(image_bytes)):
+                blob = self.bucket.blob(filename)
+                blob.upload_from_string(image_bytes, content_type='image/png')
+                
+                # Make public and get URL with cache-busting timestamp
+                blob.make_public()
+            metrics.STORAGE_UPLOAD_BYTES.inc(len(image_bytes))
             base_url = blob.public_url
             # Add timestamp to bust browser cache
             timestamp = int(datetime.utcnow().timestamp() * 1000)
             cache_busted_url = f"{base_url}?t={timestamp}"
             return cache_busted_url
         except Exception as e:
-            print(f"Error uploading image: {e}")
+            log.error("Could not upload image %s for %s: %s", image_key, resource_id, e)
             raise
     
     def upload_images(self, images: Dict, resource_id: str) -> Dict:
@@ -207,9 +378,9 @@ class FirebaseService:
                 try:
                     url = self.upload_image(image_data, resource_id, key)
                     image_urls[key] = url
-                    print(f"  ✓ Uploaded {key}")
-                except Exception as e:
-                    print(f"  ✗ Failed to upload image {key}: {e}")
+                    log.debug("Uploaded image %s", key, extra=sampled('storage.upload', 0.1))
+                except Exception:
+                    # upload_image has logged why
                     failed_uploads.append(key)
         
         # If any uploads failed, raise exception to trigger fallback
@@ -220,6 +391,7 @@ class FirebaseService:
     
     # ==================== Resource Management ====================
     
+    @metrics.firestore_operation('write')
     def save_resource(self, user_id: str, resource_data: Dict) -> str:
         """
         Save a resource (lesson, worksheet, etc.) for a user
@@ -241,14 +413,20 @@ class FirebaseService:
                 )
             
             # Upload to Firebase Storage
-            print(f"Uploading {len(resource_data['images'])} images to Firebase Storage...")
             image_urls = self.upload_images(resource_data['images'], resource_id)
             resource_data['images'] = image_urls  # Replace base64 with URLs
-            print(f"✓ Images uploaded to Storage")
         
-        # Convert content to JSON string if it's too complex
+        # Denormalize the fields the library grid needs so it never has to read content
+        resource_data.update(self._summary_fields(resource_data))
+        
+        # Store content as compressed sections (or a JSON string in legacy mode)
+        batch = self.db.batch()
         if 'content' in resource_data and isinstance(resource_data['content'], dict):
-            resource_data['content'] = json.dumps(resource_data['content'])
+            if content_store.WRITE_FORMAT == 'sections':
+                content = resource_data.pop('content')
+                resource_data.update(self._content_fields(resource_ref, content, None, batch))
+            else:
+                resource_data['content'] = json.dumps(resource_data['content'])
         
         resource_data.update({
             'id': resource_id,
@@ -260,52 +438,162 @@ class FirebaseService:
         
         # Ensure resource_type is set
         if 'resource_type' not in resource_data:
-            print(f"WARNING: resource_type not provided, defaulting to 'lesson'")
+            log.warning("resource_type not provided, defaulting to 'lesson'")
             resource_data['resource_type'] = 'lesson'
         
-        print(f"Saving resource with type: {resource_data.get('resource_type')}")
-        resource_ref.set(resource_data)
-        print(f"✓ Resource saved: {resource_id}")
+        batch.set(resource_ref, resource_data)
+        batch.commit()
+        log.info("Resource saved", extra={'resource_id': resource_id,
+                                          'resource_type': resource_data['resource_type']})
         return resource_id
     
-    def get_resource(self, resource_id: str) -> Optional[Dict]:
-        """Get a specific resource by ID"""
+    @metrics.firestore_operation('read')
+    def get_resource(self, resource_id: str, sections: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Get a specific resource by ID
+        Pass `sections` to decode only those top-level content sections
+        """
         resource_ref = self.db.collection('resources').document(resource_id)
         resource_doc = resource_ref.get()
         
         if resource_doc.exists:
-            data = resource_doc.to_dict()
-            # Parse content JSON string back to object
-            if 'content' in data and isinstance(data['content'], str):
-                try:
-                    data['content'] = json.loads(data['content'])
-                except:
-                    pass
-            
             # Images are stored as URLs in Firebase Storage
             # No need to load from separate collection anymore
-            
-            return data
+            return self._decode_resource(resource_ref, resource_doc.to_dict(), sections)
         return None
     
-    def update_resource(self, resource_id: str, updates: Dict) -> bool:
-        """Update a resource"""
+    @metrics.firestore_operation('read')
+    def get_resources(self, resource_ids: List[str]) -> Dict[str, Dict]:
+        """Get several resources in one batched read, keyed by ID (missing IDs are omitted)"""
+        if not resource_ids:
+            return {}
+        refs = [self.db.collection('resources').document(resource_id) for resource_id in resource_ids]
+        return {
+            snapshot.id: self._decode_resource(snapshot.reference, snapshot.to_dict())
+            for snapshot in self.db.get_all(refs) if snapshot.exists
+        }
+    
+    # ---------- Content storage layout (see services/content_store.py) ----------
+    
+    def _section_ref(self, resource_ref, name: str):
+        return resource_ref.collection(content_store.SECTIONS_SUBCOLLECTION).document(name)
+    
+    def _decode_resource(self, resource_ref, data: Dict, sections: Optional[List[str]] = None) -> Dict:
+        """Replace the stored content representation with the decoded content object"""
+        if content_store.is_sectioned(data):
+            external_names = [name for name in data.get('content_external') or []
+                              if sections is None or name in sections]
+            external = {}
+            if external_names:
+                refs = [self._section_ref(resource_ref, name) for name in external_names]
+                for snapshot in self.db.get_all(refs):
+                    if snapshot.exists:
+                        external[snapshot.id] = snapshot.get('data')
+            data['content'] = content_store.decode_content(data, external, sections)
+        elif 'content' in data:
+            data['content'] = content_store.decode_content(data, sections=sections)
+        return content_store.strip_layout_fields(data)
+    
+    def _content_fields(self, resource_ref, content: Dict, stored: Optional[Dict], batch) -> Dict:
+        """
+        Document fields that store `content` in the sectioned layout
+        `stored` holds the current layout fields of the document - when it is sectioned,
+        only changed sections are written (as dotted paths). Subdocument writes for large
+        sections are queued on `batch`.
+        """
+        if not stored or not content_store.is_sectioned(stored):
+            inline, external, hashes = content_store.encode_content(content)
+            for name, blob in external.items():
+                batch.set(self._section_ref(resource_ref, name), {'data': blob})
+            fields = {
+                'content_format': content_store.CONTENT_FORMAT,
+                'content_sections': inline,
+                'content_hashes': hashes,
+                'content_external': sorted(external),
+                'content_sizes': {name: len(blob) for name, blob in {**inline, **external}.items()}
+            }
+            if stored is not None:
+                # Migrating a legacy document - drop the old JSON string
+                fields['content'] = firestore.DELETE_FIELD
+            return fields
+        
+        changed, removed = content_store.changed_sections(content, stored.get('content_hashes'))
+        stored_external = set(stored.get('content_external') or [])
+        external = set(stored_external)
+        fields = {}
+        
+        sizes = stored.get('content_sizes')
+        record_all_sizes = sizes is None
+        if record_all_sizes:
+            # Written before sizes were recorded - measure the inline sections once
+            inline_blobs = (resource_ref.get(field_paths=['content_sections']).to_dict() or {}).get('content_sections')
+            sizes = {name: len(blob) for name, blob in (inline_blobs or {}).items()}
+        sizes = dict(sizes)
+        
+        # Unchanged sections stay where they are; changed ones are placed within
+        # whatever inline budget the unchanged ones leave
+        unchanged_inline = sum(size for name, size in sizes.items()
+                               if name not in stored_external and name not in changed and name not in removed)
+        blobs = {name: content_store.encode_section(content[name]) for name in changed}
+        _, spilled = content_store.place_sections(blobs, unchanged_inline)
+        
+        for name, blob in blobs.items():
+            inline_path = firestore.FieldPath('content_sections', name).to_api_repr()
+            if name in spilled:
+                batch.set(self._section_ref(resource_ref, name), {'data': blob})
+                fields[inline_path] = firestore.DELETE_FIELD
+                external.add(name)
+            else:
+                fields[inline_path] = blob
+                if name in stored_external:
+                    batch.delete(self._section_ref(resource_ref, name))
+                    external.discard(name)
+            fields[firestore.FieldPath('content_hashes', name).to_api_repr()] = content_store.section_hash(content[name])
+            sizes[name] = len(blob)
+            if not record_all_sizes:
+                fields[firestore.FieldPath('content_sizes', name).to_api_repr()] = len(blob)
+        
+        for name in removed:
+            fields[firestore.FieldPath('content_sections', name).to_api_repr()] = firestore.DELETE_FIELD
+            fields[firestore.FieldPath('content_hashes', name).to_api_repr()] = firestore.DELETE_FIELD
+            sizes.pop(name, None)
+            if not record_all_sizes:
+                fields[firestore.FieldPath('content_sizes', name).to_api_repr()] = firestore.DELETE_FIELD
+            if name in stored_external:
+                batch.delete(self._section_ref(resource_ref, name))
+                external.discard(name)
+        
+        if record_all_sizes:
+            fields['content_sizes'] = sizes
+        
+        if external != stored_external:
+            fields['content_external'] = sorted(external)
+        
+        log.debug("Content update for %s: %d changed, %d removed, %d unchanged sections",
+                  resource_ref.id, len(changed), len(removed), len(content) - len(changed))
+        return fields
+    
+    @metrics.firestore_operation('write')
+    def update_resource(self, resource_id: str, updates: Dict, merge_images: bool = False) -> Optional[Dict]:
+        """
+        Update a resource
+        With merge_images=True, `images` holds only the changed keys and is merged into the
+        stored map with dotted-path writes instead of replacing it
+        Returns the resulting image URLs for the keys in `images` ({} if none), or None on failure
+        """
         try:
+            final_images = {}
             # Handle images - check if any are base64 and need uploading
             if 'images' in updates and updates['images']:
                 images_to_upload = {}
-                final_images = {}
                 
-                print(f"DEBUG: update_resource received {len(updates['images'])} images")
                 for key, value in updates['images'].items():
                     if isinstance(value, str):
                         # Check if it's base64 data (starts with data:image)
                         if value.startswith('data:image'):
-                            print(f"DEBUG: Image {key} is base64, will upload")
                             images_to_upload[key] = value
                         else:
                             # Already a URL, keep it
-                            print(f"DEBUG: Image {key} is URL: {value[:100]}")
                             final_images[key] = value
                     else:
                         final_images[key] = value
@@ -315,87 +603,235 @@ class FirebaseService:
                     if not self.bucket:
                         raise Exception("Firebase Storage is required for image updates")
                     
-                    print(f"Uploading {len(images_to_upload)} new images to Firebase Storage...")
                     uploaded_urls = self.upload_images(images_to_upload, resource_id)
                     final_images.update(uploaded_urls)
-                    print(f"✓ Images uploaded to Storage")
                 
                 updates['images'] = final_images
             
-            # Convert content to JSON string if needed
-            if 'content' in updates and isinstance(updates['content'], dict):
-                updates['content'] = json.dumps(updates['content'])
+            # Keep denormalized summary fields in sync
+            summary_fields = self._summary_fields(updates)
+            if merge_images:
+                summary_fields.pop('thumbnail_url', None)
+                primary = {key: url for key, url in final_images.items() if key in PRIMARY_THUMBNAIL_KEYS}
+                thumbnail_url = pick_thumbnail(primary)
+                if thumbnail_url:
+                    summary_fields['thumbnail_url'] = thumbnail_url
+            for field, value in summary_fields.items():
+                updates.setdefault(field, value)
+            
+            if merge_images and 'images' in updates:
+                for key, url in updates.pop('images').items():
+                    updates[firestore.FieldPath('images', key).to_api_repr()] = url
             
             resource_ref = self.db.collection('resources').document(resource_id)
+            batch = self.db.batch()
+            
+            # One read for whatever stored state this update depends on
+            write_sections = (isinstance(updates.get('content'), dict)
+                              and content_store.WRITE_FORMAT == 'sections')
+            entry_updates = {field: updates[field] for field in ASSIGNMENT_FIELDS if field in updates}
+            field_paths = []
+            if write_sections:
+                field_paths += ['content_format', 'content_hashes', 'content_external', 'content_sizes']
+            if entry_updates:
+                field_paths += ['assigned_students'] + list(entry_updates)
+            stored = {}
+            if field_paths:
+                stored = resource_ref.get(field_paths=field_paths).to_dict() or {}
+            # Only fields whose value actually changes need copying into the index
+            entry_updates = {field: value for field, value in entry_updates.items() if stored.get(field) != value}
+            
+            # Write only the content sections that changed (or a JSON string in legacy mode)
+            if 'content' in updates and isinstance(updates['content'], dict):
+                if write_sections:
+                    content = updates.pop('content')
+                    updates.update(self._content_fields(resource_ref, content, stored, batch))
+                else:
+                    updates['content'] = json.dumps(updates['content'])
+            
             updates['updated_at'] = datetime.utcnow()
-            resource_ref.update(updates)
-            print(f"✓ Resource {resource_id} updated successfully")
-            return True
+            batch.update(resource_ref, updates)
+            batch.commit()
+            
+            # Keep assigned students' index entries in sync with title/thumbnail changes -
+            # in batches of their own, since a resource can be assigned to any number of students
+            if entry_updates:
+                entry_refs = [self._assignment_ref(student_id, resource_id)
+                              for student_id in stored.get('assigned_students') or []]
+                self._write_in_batches(entry_refs, lambda batch, ref: batch.set(ref, entry_updates, merge=True))
+            
+            log.info("Resource updated", extra={'resource_id': resource_id, 'images': len(final_images)})
+            return final_images
+        except content_store.SectionTooLarge:
+            # The caller's fault, not a failure - let the route say so
+            raise
         except Exception as e:
-            print(f"Error updating resource: {e}")
-            return False
+            log.error("Could not update resource %s: %s", resource_id, e)
+            return None
     
+    @metrics.firestore_operation('write')
     def delete_resource(self, resource_id: str) -> bool:
-        """Delete a resource"""
+        """
+        Delete a resource
+        Firestore does not cascade, so its externally stored content sections and its
+        entries in each assigned student's index are deleted too, in batches, with the
+        resource document last - a failed delete can simply be retried
+        """
         try:
-            self.db.collection('resources').document(resource_id).delete()
+            resource_ref = self.db.collection('resources').document(resource_id)
+            stored = resource_ref.get(field_paths=['assigned_students'])
+            refs = list(resource_ref.collection(content_store.SECTIONS_SUBCOLLECTION).list_documents())
+            refs += [self._assignment_ref(student_id, resource_id)
+                     for student_id in (stored.to_dict() or {}).get('assigned_students') or []]
+            refs.append(resource_ref)
+            self._write_in_batches(refs, lambda batch, ref: batch.delete(ref))
             return True
         except Exception as e:
-            print(f"Error deleting resource: {e}")
+            log.error("Could not delete resource %s: %s", resource_id, e)
             return False
     
+    def _write_in_batches(self, refs: Iterable, write: Callable[[Any, Any], None]) -> None:
+        """Apply write(batch, ref) to each ref in order, committing every STUDENT_BATCH_SIZE writes"""
+        batch, writes = self.db.batch(), 0
+        for ref in refs:
+            if writes >= STUDENT_BATCH_SIZE:
+                batch.commit()
+                batch, writes = self.db.batch(), 0
+            write(batch, ref)
+            writes += 1
+        if writes:
+            batch.commit()
+    
+    def _summary_fields(self, resource_data: Dict) -> Dict:
+        """Denormalized subtitle/topic/thumbnail derived from content and images"""
+        fields = {}
+        content = resource_data.get('content')
+        if isinstance(content, dict):
+            if content.get('subtitle'):
+                fields['subtitle'] = content['subtitle']
+            if content.get('topic'):
+                fields['topic'] = content['topic']
+        if resource_data.get('images'):
+            fields['thumbnail_url'] = pick_thumbnail(resource_data['images'])
+        return fields
+    
+    @metrics.firestore_operation('read')
     def get_user_resources(self, user_id: str, resource_type: Optional[str] = None, 
-                          limit: int = 50, offset: int = 0) -> List[Dict]:
+                          limit: int = 50, offset: int = 0, start_after: Optional[str] = None,
+                          fields: Optional[str] = None) -> Dict[str, Any]:
         """
-        Get all resources for a user, optionally filtered by type
-        Supports pagination
+        Get a page of resources for a user, newest first, optionally filtered by type
+        
+        Pagination: pass the returned `next_cursor` as `start_after` to get the next page
+        (`offset` is still honoured when no cursor is given).
+        Type filtering runs in Firestore and needs the composite index from
+        firestore.indexes.json; without it we fall back to filtering in memory.
+        With fields='summary' only SUMMARY_FIELDS are read - content is never fetched or parsed.
         
-        Note: To avoid composite index requirement, we fetch all user resources
-        and filter by type in memory. This is fine for typical use cases.
+        Returns: {'resources': [...], 'next_cursor': str or None}
         """
-        # Query only by user_id and order by created_at (single field index exists by default)
+        summary = fields == 'summary'
+        cursor = decode_cursor(start_after) if start_after else None
+        
         query = self.db.collection('resources').where('user_id', '==', user_id)
-        query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
+        if resource_type:
+            query = query.where('resource_type', '==', resource_type)
+        query = self._page_query(query, limit, offset, cursor, summary)
         
-        # Fetch more than needed if filtering by type
-        fetch_limit = limit * 3 if resource_type else limit
-        query = query.limit(fetch_limit)
+        try:
+            docs = list(query.stream())
+        except FailedPrecondition as e:
+            if not resource_type:
+                raise
+            log.warning("Composite index for resource_type filter missing, filtering in memory: %s", e)
+            return self._get_user_resources_unindexed(user_id, resource_type, limit, offset, cursor, summary)
         
-        docs = query.stream()
+        resources = [self._resource_from_doc(doc, summary) for doc in docs]
+        next_cursor = None
+        if len(resources) == limit and resources[-1].get('created_at'):
+            next_cursor = encode_cursor(resources[-1]['created_at'], resources[-1]['id'])
+        
+        log.debug("Found %d resources for user %s (type filter: %s)", len(resources), user_id, resource_type)
+        return {'resources': resources, 'next_cursor': next_cursor}
+    
+    def _page_query(self, query, limit: int, offset: int, cursor: Optional[Tuple[datetime, Optional[str]]],
+                    summary: bool):
+        """Apply ordering, cursor/offset, limit and projection to a resources query"""
+        # Ordered by (created_at, document id) so resources sharing a timestamp
+        # aren't skipped at a page boundary. The id sorts in the same direction as
+        # created_at, which the existing composite indexes already cover.
+        query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
+        query = query.order_by('__name__', direction=firestore.Query.DESCENDING)
+        if cursor:
+            created_at, resource_id = cursor
+            if resource_id:
+                query = query.start_after({
+                    'created_at': created_at,
+                    '__name__': self.db.collection('resources').document(resource_id)
+                })
+            else:
+                query = query.start_after({'created_at': created_at})
+        elif offset:
+            query = query.offset(offset)
+        if summary:
+            # 'images' is only needed to derive a thumbnail for resources saved
+            # before thumbnail_url was denormalized
+            query = query.select(SUMMARY_FIELDS + ['images'])
+        return query.limit(limit)
+    
+    def _get_user_resources_unindexed(self, user_id: str, resource_type: str, limit: int, offset: int,
+                                      cursor: Optional[Tuple[datetime, Optional[str]]],
+                                      summary: bool) -> Dict[str, Any]:
+        """Type filter without the composite index: scan the user's resources in batches"""
+        query = self.db.collection('resources').where('user_id', '==', user_id)
+        batch_size = max(limit, 50)
         resources = []
+        skipped = 0
+        last_seen = cursor
         
-        for doc in docs:
-            data = doc.to_dict()
-            
-            # Debug: Check resource_type field
-            if 'resource_type' not in data:
-                print(f"WARNING: Resource {doc.id} missing resource_type field!")
-                # Set default to 'lesson' for backward compatibility
-                data['resource_type'] = 'lesson'
-            
-            # Filter by resource_type in memory if specified
-            if resource_type and data.get('resource_type') != resource_type:
-                continue
-            
-            # Parse content JSON string back to object
-            if 'content' in data and isinstance(data['content'], str):
-                try:
-                    data['content'] = json.loads(data['content'])
-                except:
-                    pass
-            
-            # Images are already URLs, no need to parse
-            resources.append(data)
-            
-            # Stop if we have enough resources
-            if len(resources) >= limit:
+        while len(resources) < limit:
+            batch = list(self._page_query(query, batch_size, 0, last_seen, summary).stream())
+            for doc in batch:
+                data = self._resource_from_doc(doc, summary)
+                last_seen = (data['created_at'], doc.id) if data.get('created_at') else None
+                if data.get('resource_type') != resource_type:
+                    continue
+                if skipped < offset and not cursor:
+                    skipped += 1
+                    continue
+                resources.append(data)
+                if len(resources) >= limit:
+                    break
+            if len(batch) < batch_size or not last_seen:
                 break
         
-        print(f"Found {len(resources)} resources for user {user_id} (type filter: {resource_type})")
-        return resources
+        next_cursor = None
+        if len(resources) == limit and resources[-1].get('created_at'):
+            next_cursor = encode_cursor(resources[-1]['created_at'], resources[-1]['id'])
+        return {'resources': resources, 'next_cursor': next_cursor}
+    
+    def _resource_from_doc(self, doc, summary: bool) -> Dict:
+        """Convert a resource snapshot into the API shape"""
+        data = doc.to_dict()
+        data.setdefault('id', doc.id)
+        
+        if 'resource_type' not in data:
+            log.warning("Resource %s missing resource_type field", doc.id)
+            # Set default to 'lesson' for backward compatibility
+            data['resource_type'] = 'lesson'
+        
+        if summary:
+            images = data.pop('images', None)
+            if not data.get('thumbnail_url'):
+                data['thumbnail_url'] = pick_thumbnail(images)
+            return data
+        
+        # Images are already URLs, no need to parse
+        return self._decode_resource(doc.reference, data)
     
     # ==================== Student Management ====================
     
+    @metrics.firestore_operation('write')
     def add_student(self, user_id: str, student_data: Dict) -> str:
         """Add a student for a user"""
         student_ref = self.db.collection('students').document()
@@ -404,6 +840,7 @@ class FirebaseService:
         student_data.update({
             'id': student_id,
             'user_id': user_id,
+            'assignment_index': True,  # New students start with an (empty) assignment index
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         })
@@ -411,6 +848,34 @@ class FirebaseService:
         student_ref.set(student_data)
         return student_id
     
+    @metrics.firestore_operation('write')
+    def add_students(self, user_id: str, students: List[Dict]) -> List[str]:
+        """
+        Add many students for a user in one batched write
+        Firestore caps a batch at 500 writes - callers chunk with STUDENT_BATCH_SIZE
+        Returns the new student IDs in input order
+        """
+        if len(students) > STUDENT_BATCH_SIZE:
+            raise ValueError(f"At most {STUDENT_BATCH_SIZE} students per batch")
+        
+        batch = self.db.batch()
+        student_ids = []
+        now = datetime.utcnow()
+        for student_data in students:
+            student_ref = self.db.collection('students').document()
+            batch.set(student_ref, {
+                **student_data,
+                'id': student_ref.id,
+                'user_id': user_id,
+                'assignment_index': True,
+                'created_at': now,
+                'updated_at': now
+            })
+            student_ids.append(student_ref.id)
+        batch.commit()
+        return student_ids
+    
+    @metrics.firestore_operation('read')
     def get_student(self, student_id: str) -> Optional[Dict]:
         """Get a specific student by ID"""
         student_ref = self.db.collection('students').document(student_id)
@@ -420,6 +885,15 @@ class FirebaseService:
             return student_doc.to_dict()
         return None
     
+    @metrics.firestore_operation('read')
+    def get_students(self, student_ids: List[str]) -> Dict[str, Dict]:
+        """Get several students in one batched read, keyed by ID (missing IDs are omitted)"""
+        if not student_ids:
+            return {}
+        refs = [self.db.collection('students').document(student_id) for student_id in student_ids]
+        return {snapshot.id: snapshot.to_dict() for snapshot in self.db.get_all(refs) if snapshot.exists}
+    
+    @metrics.firestore_operation('write')
     def update_student(self, student_id: str, updates: Dict) -> bool:
         """Update a student"""
         try:
@@ -428,18 +902,25 @@ class FirebaseService:
             student_ref.update(updates)
             return True
         except Exception as e:
-            print(f"Error updating student: {e}")
+            log.error("Could not update student %s: %s", student_id, e)
             return False
     
+    @metrics.firestore_operation('write')
     def delete_student(self, student_id: str) -> bool:
         """Delete a student"""
         try:
-            self.db.collection('students').document(student_id).delete()
+            student_ref = self.db.collection('students').document(student_id)
+            # Firestore does not cascade - remove the student's assignment index too,
+            # with the student document last
+            refs = list(student_ref.collection(ASSIGNMENTS_SUBCOLLECTION).list_documents())
+            refs.append(student_ref)
+            self._write_in_batches(refs, lambda batch, ref: batch.delete(ref))
             return True
         except Exception as e:
-            print(f"Error deleting student: {e}")
+            log.error("Could not delete student %s: %s", student_id, e)
             return False
     
+    @metrics.firestore_operation('read')
     def get_user_students(self, user_id: str) -> List[Dict]:
         """Get all students for a user"""
         query = self.db.collection('students').where('user_id', '==', user_id)
@@ -450,40 +931,121 @@ class FirebaseService:
     
     # ==================== Assignment Management ====================
     
+    def _assignment_ref(self, student_id: str, resource_id: str):
+        return (self.db.collection('students').document(student_id)
+                .collection(ASSIGNMENTS_SUBCOLLECTION).document(resource_id))
+    
+    def _assignment_entry(self, resource_id: str, resource_data: Dict) -> Dict:
+        """Lightweight projection of a resource stored in a student's assignment index"""
+        entry = {field: resource_data.get(field) for field in ASSIGNMENT_FIELDS}
+        entry['id'] = resource_id
+        if not entry.get('thumbnail_url'):
+            entry['thumbnail_url'] = pick_thumbnail(resource_data.get('images'))
+        return entry
+    
+    def _read_assignment_entry(self, resource_ref) -> Dict:
+        """Read just the fields needed for an assignment index entry"""
+        snapshot = resource_ref.get(field_paths=ASSIGNMENT_FIELDS + ['images'])
+        return self._assignment_entry(resource_ref.id, snapshot.to_dict() or {})
+    
     def assign_resource_to_student(self, resource_id: str, student_id: str) -> bool:
         """Assign a resource to a student"""
+        return self.assign_resource_to_students(resource_id, [student_id])
+    
+    def unassign_resource_from_student(self, resource_id: str, student_id: str) -> bool:
+        """Remove a resource assignment from a student"""
+        return self.unassign_resource_from_students(resource_id, [student_id])
+    
+    @metrics.firestore_operation('write')
+    def assign_resource_to_students(self, resource_id: str, student_ids: List[str]) -> bool:
+        """
+        Assign a resource to up to MAX_BULK_STUDENTS students in one batched write
+        Updates the resource's assigned_students and each student's assignment index
+        """
+        if len(student_ids) > MAX_BULK_STUDENTS:
+            raise ValueError(f"At most {MAX_BULK_STUDENTS} students per batch")
         try:
             resource_ref = self.db.collection('resources').document(resource_id)
-            resource_ref.update({
-                'assigned_students': firestore.ArrayUnion([student_id]),
-                'updated_at': datetime.utcnow()
+            now = datetime.utcnow()
+            entry = {**self._read_assignment_entry(resource_ref), 'assigned_at': now}
+            
+            batch = self.db.batch()
+            batch.update(resource_ref, {
+                'assigned_students': firestore.ArrayUnion(list(student_ids)),
+                'updated_at': now
             })
+            for student_id in student_ids:
+                batch.set(self._assignment_ref(student_id, resource_id), entry)
+            batch.commit()
             return True
         except Exception as e:
-            print(f"Error assigning resource: {e}")
+            log.error("Could not assign resource %s: %s", resource_id, e)
             return False
     
-    def unassign_resource_from_student(self, resource_id: str, student_id: str) -> bool:
-        """Remove a resource assignment from a student"""
+    @metrics.firestore_operation('write')
+    def unassign_resource_from_students(self, resource_id: str, student_ids: List[str]) -> bool:
+        """Remove a resource assignment from up to MAX_BULK_STUDENTS students in one batched write"""
+        if len(student_ids) > MAX_BULK_STUDENTS:
+            raise ValueError(f"At most {MAX_BULK_STUDENTS} students per batch")
         try:
             resource_ref = self.db.collection('resources').document(resource_id)
-            resource_ref.update({
-                'assigned_students': firestore.ArrayRemove([student_id]),
+            batch = self.db.batch()
+            batch.update(resource_ref, {
+                'assigned_students': firestore.ArrayRemove(list(student_ids)),
                 'updated_at': datetime.utcnow()
             })
+            for student_id in student_ids:
+                batch.delete(self._assignment_ref(student_id, resource_id))
+            batch.commit()
             return True
         except Exception as e:
-            print(f"Error unassigning resource: {e}")
+            log.error("Could not unassign resource %s: %s", resource_id, e)
             return False
     
-    def get_student_resources(self, student_id: str) -> List[Dict]:
-        """Get all resources assigned to a student"""
-        query = self.db.collection('resources').where('assigned_students', 'array_contains', student_id)
+    @metrics.firestore_operation('read')
+    def get_student_resources(self, student_id: str, student: Optional[Dict] = None) -> List[Dict]:
+        """
+        Get the resources assigned to a student, newest first
+        Reads the student's assignment index (one small document per resource, no
+        composite index needed). Students created before the index existed are
+        backfilled from the resources collection on first read.
+        Pass `student` when the caller already has the student document.
+        """
+        student_ref = self.db.collection('students').document(student_id)
+        if student is None:
+            student = self.get_student(student_id) or {}
+        
+        if not student.get('assignment_index'):
+            self._backfill_assignment_index(student_ref)
+        
+        query = student_ref.collection(ASSIGNMENTS_SUBCOLLECTION)
         query = query.order_by('created_at', direction=firestore.Query.DESCENDING)
+        return [doc.to_dict() for doc in query.stream()]
+    
+    def _backfill_assignment_index(self, student_ref) -> int:
+        """Build a legacy student's assignment index from resources.assigned_students"""
+        query = self.db.collection('resources').where('assigned_students', 'array_contains', student_ref.id)
+        query = query.select(ASSIGNMENT_FIELDS + ['images'])
         
-        docs = query.stream()
-        return [doc.to_dict() for doc in docs]
-
+        batch = self.db.batch()
+        writes = 0
+        count = 0
+        now = datetime.utcnow()
+        for doc in query.stream():
+            if writes >= STUDENT_BATCH_SIZE - 1:
+                batch.commit()
+                batch = self.db.batch()
+                writes = 0
+            entry = {**self._assignment_entry(doc.id, doc.to_dict()), 'assigned_at': now}
+            batch.set(student_ref.collection(ASSIGNMENTS_SUBCOLLECTION).document(doc.id), entry)
+            writes += 1
+            count += 1
+        
+        # Marker goes in the last batch so a failed backfill is retried on the next read
+        batch.update(student_ref, {'assignment_index': True})
+        batch.commit()
+        log.info("Backfilled assignment index", extra={'student_id': student_ref.id, 'resources': count})
+        return count
 
 # Singleton instance
 firebase_service = FirebaseService()
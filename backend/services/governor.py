@@ -0,0 +1,281 @@
+"""
+Gemini Concurrency Governor
+Process-wide adaptive limit on concurrent generate_content calls, per model
+
+Without coordination, ten presentation streams fire 100+ image calls at once and
+most of them come back 429. Every call now takes a slot from its model's limiter
+first, and calls over the limit queue (up to GENAI_QUEUE_TIMEOUT) instead of
+being sent.
+
+The limit adapts AIMD-style, like TCP congestion control:
+- additive increase: each success while the limiter is saturated adds 1/limit,
+  so the limit grows by about one per round of calls
+- multiplicative decrease: a 429 (or 503) halves it - once per round, since
+  calls sent before the last decrease don't count against the new limit
+- latency: while the recent average latency is over GENAI_LATENCY_TOLERANCE x
+  the model's baseline, the limit stops growing
+
+The limit is per worker process. Set GENAI_GOVERNOR_SHARED_DIR (a directory all
+workers on the host can write) to share backoffs: a worker that is throttled
+touches a per-model file, and the other workers halve their limits too.
+Per-model bounds come from GENAI_CONCURRENCY_LIMITS, e.g.
+{"gemini-2.5-flash-image": {"initial": 4, "max": 16}}.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from . import metrics
+from .log import get_logger
+
+log = get_logger('governor')
+
+GOVERNOR_ENABLED = os.getenv('GENAI_GOVERNOR', 'true').lower() == 'true'
+INITIAL_LIMIT = int(os.getenv('GENAI_CONCURRENCY_INITIAL', '8'))
+MIN_LIMIT = int(os.getenv('GENAI_CONCURRENCY_MIN', '1'))
+MAX_LIMIT = int(os.getenv('GENAI_CONCURRENCY_MAX', '32'))
+# Seconds a call may wait for a slot before failing with GovernorTimeout
+QUEUE_TIMEOUT = float(os.getenv('GENAI_QUEUE_TIMEOUT', '60'))
+LATENCY_TOLERANCE = float(os.getenv('GENAI_LATENCY_TOLERANCE', '2.0'))
+SHARED_DIR = os.getenv('GENAI_GOVERNOR_SHARED_DIR')
+
+BACKOFF_FACTOR = 0.5
+LATENCY_SMOOTHING = 0.3
+# How fast the latency baseline follows latency upward (downward it follows at once)
+BASELINE_DRIFT = 0.01
+# Seconds between checks of the shared backoff file
+SHARED_CHECK_INTERVAL = 1.0
+# Seconds after a decrease during which a limiter still counts as under pressure
+PRESSURE_WINDOW = 30.0
+
+# API errors that mean "slow down" rather than "this request is bad"
+OVERLOAD_CODES = (429, 503)
+OVERLOAD_STATUSES = ('RESOURCE_EXHAUSTED', 'UNAVAILABLE')
+
+
+def _load_model_limits() -> Dict[str, Dict[str, int]]:
+    """Per-model limit bounds from GENAI_CONCURRENCY_LIMITS, e.g. {"model": {"initial": 4, "min": 1, "max": 16}}"""
+    raw = os.getenv('GENAI_CONCURRENCY_LIMITS')
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        log.warning("Ignoring GENAI_CONCURRENCY_LIMITS: %s", e)
+        return {}
+
+
+MODEL_LIMITS = _load_model_limits()
+
+
+def is_overload(error: BaseException) -> bool:
+    """Whether an API error is throttling (429 / 503) - works for genai.errors.APIError and look-alikes"""
+    return getattr(error, 'code', None) in OVERLOAD_CODES or getattr(error, 'status', None) in OVERLOAD_STATUSES
+
+
+class GovernorTimeout(TimeoutError):
+    """A call waited GENAI_QUEUE_TIMEOUT for a slot without getting one"""
+
+
+class AdaptiveLimit:
+    """AIMD concurrency limit for one model"""
+
+    def __init__(self, model: str, initial: int = INITIAL_LIMIT, minimum: int = MIN_LIMIT,
+                 maximum: int = MAX_LIMIT, shared_dir: Optional[str] = SHARED_DIR):
+        self.model = model
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.in_flight = 0
+        self.waiting = 0
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+        self.stats_counters = {'calls': 0, 'overloads': 0, 'decreases': 0, 'timeouts': 0}
+        self._cond = threading.Condition()
+        # monotonic time of the last decrease - calls sent before it were sent under the old limit
+        self._last_decrease = 0.0
+
+        self._shared_path = None
+        if shared_dir:
+            name = re.sub(r'[^A-Za-z0-9_.-]', '_', model)
+            self._shared_path = os.path.join(shared_dir, f'genai-{name}.backoff')
+        self._shared_seen = self._shared_mtime()
+        self._shared_checked = time.monotonic()
+
+    # ==================== Slots ====================
+
+    def acquire(self, timeout: float = QUEUE_TIMEOUT) -> float:
+        """Wait for a slot - returns the monotonic time the call was let through"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            self._check_shared()
+            self.waiting += 1
+            try:
+                while self.in_flight >= int(self.limit):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats_counters['timeouts'] += 1
+                        raise GovernorTimeout(
+                            f"No {self.model} slot within {timeout:.0f}s (limit {int(self.limit)})"
+                        )
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.in_flight += 1
+            self.stats_counters['calls'] += 1
+        return time.monotonic()
+
+    def release(self, started: float, error: Optional[BaseException] = None) -> None:
+        """Free the slot and adapt the limit to how the call went"""
+        elapsed = time.monotonic() - started
+        with self._cond:
+            saturated = self.waiting > 0 or self.in_flight >= int(self.limit)
+            self.in_flight -= 1
+            if error is not None:
+                if is_overload(error):
+                    self.stats_counters['overloads'] += 1
+                    if started >= self._last_decrease:
+                        self._decrease('throttled')
+                        self._publish()
+            else:
+                self._observe_latency(elapsed)
+                if saturated and not self.congested:
+                    self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._cond.notify_all()
+
+    # ==================== Signals ====================
+
+    @property
+    def congested(self) -> bool:
+        return (self.latency is not None and self.baseline is not None
+                and self.latency > LATENCY_TOLERANCE * self.baseline)
+
+    def _observe_latency(self, elapsed: float) -> None:
+        if self.latency is None:
+            self.latency = self.baseline = elapsed
+            return
+        self.latency += LATENCY_SMOOTHING * (elapsed - self.latency)
+        if self.latency < self.baseline:
+            self.baseline = self.latency
+        else:
+            self.baseline += BASELINE_DRIFT * (self.latency - self.baseline)
+
+    def _decrease(self, reason: str) -> None:
+        previous = self.limit
+        self.limit = max(float(self.minimum), self.limit * BACKOFF_FACTOR)
+        self._last_decrease = time.monotonic()
+        self.stats_counters['decreases'] += 1
+        log.warning("Gemini %s limit %d -> %d (%s)", self.model, int(previous), int(self.limit), reason,
+                    extra={'model': self.model, 'in_flight': self.in_flight, 'waiting': self.waiting})
+
+    def under_pressure(self, window: float = PRESSURE_WINDOW) -> bool:
+        """Whether calls are queueing, or the limit was cut in the last `window` seconds"""
+        with self._cond:
+            return self.waiting > 0 or (self._last_decrease > 0
+                                        and time.monotonic() - self._last_decrease < window)
+
+    # ==================== Cross-worker backoff ====================
+
+    def _shared_mtime(self) -> float:
+        if not self._shared_path:
+            return 0.0
+        try:
+            return os.stat(self._shared_path).st_mtime
+        except OSError:
+            return 0.0
+
+    def _publish(self) -> None:
+        """Tell the other workers this model is being throttled"""
+        if not self._shared_path:
+            return
+        try:
+            with open(self._shared_path, 'a'):
+                os.utime(self._shared_path)
+        except OSError as e:
+            log.warning("Could not publish backoff to %s: %s", self._shared_path, e)
+            return
+        self._shared_seen = self._shared_mtime()
+
+    def _check_shared(self) -> None:
+        """Back off if another worker was throttled since the last check (caller holds the lock)"""
+        if not self._shared_path or time.monotonic() - self._shared_checked < SHARED_CHECK_INTERVAL:
+            return
+        self._shared_checked = time.monotonic()
+        mtime = self._shared_mtime()
+        if mtime > self._shared_seen:
+            self._shared_seen = mtime
+            self._decrease('throttled in another worker')
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'limit': round(self.limit, 2),
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'latency_seconds': round(self.latency or 0.0, 3),
+                'baseline_seconds': round(self.baseline or 0.0, 3),
+                **self.stats_counters
+            }
+
+
+class Governor:
+    def __init__(self, enabled: bool = GOVERNOR_ENABLED):
+        self.enabled = enabled
+        self.limiters: Dict[str, AdaptiveLimit] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, model: str) -> AdaptiveLimit:
+        limiter = self.limiters.get(model)
+        if limiter is None:
+            with self._lock:
+                limiter = self.limiters.get(model)
+                if limiter is None:
+                    bounds = MODEL_LIMITS.get(model, {})
+                    limiter = AdaptiveLimit(model, initial=bounds.get('initial', INITIAL_LIMIT),
+                                            minimum=bounds.get('min', MIN_LIMIT),
+                                            maximum=bounds.get('max', MAX_LIMIT))
+                    self.limiters[model] = limiter
+        return limiter
+
+    @contextmanager
+    def slot(self, model: str):
+        """
+        Hold one of `model`'s slots for the duration of a call, queueing for it if needed
+        Yields the seconds spent waiting in the queue.
+        """
+        if not self.enabled:
+            yield 0.0
+            return
+        limiter = self.limiter(model)
+        queued = time.monotonic()
+        started = limiter.acquire()
+        metrics.GENAI_QUEUE_SECONDS.observe(started - queued, model=model)
+        error = None
+        try:
+            yield started - queued
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            limiter.release(started, error)
+
+    def under_pressure(self, model: str) -> bool:
+        """Whether `model` is throttled or saturated - no time to add optional calls like hedges"""
+        limiter = self.limiters.get(model)
+        return self.enabled and limiter is not None and limiter.under_pressure()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Flat per-model stats for the metrics collector, e.g. gemini_2_5_flash_limit"""
+        stats = {}
+        for model, limiter in list(self.limiters.items()):
+            prefix = re.sub(r'[^A-Za-z0-9_]', '_', model)
+            for field, value in limiter.get_stats().items():
+                stats[f'{prefix}_{field}'] = value
+        return stats
+
+
+governor = Governor()
@@ -0,0 +1,205 @@
+"""
+Structured Logging
+Leveled, request-scoped logging written off the request thread
+
+Records go through a QueueHandler to a listener thread that formats and writes
+them, so a slow stdout (a container log pipe under load) never stalls a request
+or an SSE stream. Each record carries the request id and trace id of the
+request it was logged from, and any `extra` fields.
+
+High-volume events (one per slide, image or section) are logged with a sample
+rate: `log.debug(..., extra=sampled('pptx.slide', 0.1))` keeps about one in ten.
+LOG_SAMPLE_RATES overrides the rate per event.
+"""
+
+import atexit
+import copy
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# 'text' for humans, 'json' for log collectors
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()
+# Records dropped (and counted) once this many are waiting to be written
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+ROOT_LOGGER = 'agenticdp'
+REQUEST_ID_HEADER = 'X-Request-Id'
+
+# Attributes every LogRecord has - anything else came in through `extra`
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+_INTERNAL_FIELDS = {'request_id', 'trace_id', 'sample_rate', 'event'}
+
+_request_id: contextvars.ContextVar = contextvars.ContextVar('request_id', default=None)
+
+
+def _load_sample_rates() -> Tuple[Dict[str, float], Optional[str]]:
+    """
+    Per-event sample rates from LOG_SAMPLE_RATES, e.g. {"pptx.slide": 0, "image.generate": 1}
+    Returns (rates, error) - logging isn't set up yet, so configure_logging reports the error
+    """
+    raw = os.getenv('LOG_SAMPLE_RATES')
+    if not raw:
+        return {}, None
+    try:
+        return {event: float(rate) for event, rate in json.loads(raw).items()}, None
+    except (ValueError, AttributeError) as e:
+        return {}, str(e)
+
+
+SAMPLE_RATES, _SAMPLE_RATES_ERROR = _load_sample_rates()
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger under the app's root logger, e.g. get_logger('firebase') -> agenticdp.firebase"""
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+def sampled(event: str, rate: float, **fields) -> Dict[str, Any]:
+    """`extra` for a high-volume event - kept with probability `rate` (or its LOG_SAMPLE_RATES entry)"""
+    return {'event': event, 'sample_rate': rate, **fields}
+
+
+# ==================== Request ids ====================
+
+def new_request_id(incoming: Optional[str] = None) -> str:
+    """Adopt a caller's X-Request-Id (if sane) or mint one, and make it current"""
+    request_id = incoming if incoming and len(incoming) <= 128 and incoming.isprintable() else uuid.uuid4().hex
+    _request_id.set(request_id)
+    return request_id
+
+
+def current_request_id() -> Optional[str]:
+    try:
+        from flask import g, has_request_context
+    except ImportError:
+        return _request_id.get()
+    if has_request_context():
+        return g.get('request_id') or _request_id.get()
+    return _request_id.get()
+
+
+# ==================== Filters and formatting ====================
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the current request and trace ids, and applies sampling"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = getattr(record, 'sample_rate', None)
+        if rate is not None:
+            rate = SAMPLE_RATES.get(getattr(record, 'event', None), rate)
+            if rate <= 0 or (rate < 1 and random.random() >= rate):
+                return False
+        if not hasattr(record, 'request_id'):
+            record.request_id = current_request_id()
+        if not hasattr(record, 'trace_id'):
+            from . import tracing
+            record.trace_id = tracing.current_trace_id()
+        return True
+
+
+def _fields(record: logging.LogRecord) -> Dict[str, Any]:
+    return {key: value for key, value in vars(record).items()
+            if key not in _RECORD_FIELDS and key not in _INTERNAL_FIELDS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key in ('event', 'request_id', 'trace_id'):
+            value = getattr(record, key, None)
+            if value:
+                entry[key] = value
+        entry.update(_fields(record))
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s %(message)s')
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _fields(record)
+        if getattr(record, 'request_id', None):
+            fields = {'request_id': record.request_id, **fields}
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+_TRACEBACKS = logging.Formatter()
+
+
+class _DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Never blocks the caller - a full queue drops the record and counts it"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback now, but keep the traceback out of the message
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _TRACEBACKS.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+_handler: Optional[_DroppingQueueHandler] = None
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def configure_logging() -> logging.Logger:
+    """Route the app's loggers through the background writer - idempotent"""
+    global _handler, _listener
+    root = logging.getLogger(ROOT_LOGGER)
+    if _handler is not None:
+        return root
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if LOG_FORMAT == 'json' else TextFormatter())
+
+    _handler = _DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+    _handler.addFilter(ContextFilter())
+    _listener = logging.handlers.QueueListener(_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    root.addHandler(_handler)
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    if _SAMPLE_RATES_ERROR:
+        root.warning("Ignoring LOG_SAMPLE_RATES: %s", _SAMPLE_RATES_ERROR)
+    return root
+
+
+def get_stats() -> Dict[str, int]:
+    if _handler is None:
+        return {'queued': 0, 'dropped': 0}
+    return {'queued': _handler.queue.qsize(), 'dropped': _handler.dropped}
@@ -0,0 +1,167 @@
+"""
+Memory Introspection
+What the in-process stores and caches of this worker hold, and where Python
+memory is being allocated - for chasing leaks and regressions in a live worker
+
+Stores register a function returning their (key, value) pairs; the report walks
+each value and sums sys.getsizeof over the objects it reaches, counting data:
+URIs (the base64 images kept alongside generated content) separately. Sizes are
+approximate: objects shared between entries are counted once per store, and
+C-level buffers (lxml trees, Pillow images) only by their Python wrapper.
+
+Allocation tracking uses tracemalloc, which is off unless started (on demand
+from /api/admin/memory/tracing, or PYTHONTRACEMALLOC=N at boot) because it
+slows every allocation down. Each allocations call snapshots the heap, and with
+diff=true reports what grew since the previous call.
+"""
+
+import os
+import sys
+import threading
+import tracemalloc
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from .log import get_logger
+
+log = get_logger('memory')
+
+GROUP_BY = ('lineno', 'filename', 'traceback')
+
+_stores: Dict[str, Callable[[], Iterable[Tuple[Any, Any]]]] = {}
+
+
+def register_store(name: str, items: Callable[[], Iterable[Tuple[Any, Any]]]) -> None:
+    """Include a store in the report - `items` returns a snapshot of its (key, value) pairs"""
+    _stores[name] = items
+
+
+# ==================== Store sizes ====================
+
+def deep_size(value: Any, seen: Optional[set] = None) -> Tuple[int, int]:
+    """(approximate bytes, bytes of data: URIs) reachable from `value`"""
+    seen = set() if seen is None else seen
+    total = inline = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, str):
+            if item.startswith('data:'):
+                inline += len(item)
+        elif isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+    return total, inline
+
+
+def store_report(name: str, largest: int = 5) -> Dict[str, Any]:
+    entries = []
+    seen: set = set()
+    for key, value in _stores[name]():
+        size, inline = deep_size(value, seen)
+        entries.append({'key': str(key), 'bytes': size, 'inline_data_bytes': inline})
+    entries.sort(key=lambda entry: entry['bytes'], reverse=True)
+    return {
+        'entries': len(entries),
+        'bytes': sum(entry['bytes'] for entry in entries),
+        'inline_data_bytes': sum(entry['inline_data_bytes'] for entry in entries),
+        'largest': entries[:largest]
+    }
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """Resident set size of this worker (Linux), and the traced Python heap if tracing"""
+    rss = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        pass
+    traced, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (None, None)
+    return {'rss_bytes': rss, 'traced_bytes': traced, 'traced_peak_bytes': peak}
+
+
+def report(largest: int = 5) -> Dict[str, Any]:
+    stores = {}
+    for name in sorted(_stores):
+        try:
+            stores[name] = store_report(name, largest)
+        except Exception as e:
+            log.warning("Could not size store %s: %s", name, e)
+            stores[name] = {'error': str(e)}
+    return {'process': process_memory(), 'tracing': is_tracing(), 'stores': stores}
+
+
+# ==================== Allocations ====================
+
+_snapshot_lock = threading.Lock()
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+def is_tracing() -> bool:
+    return tracemalloc.is_tracing()
+
+
+def start_tracing(frames: int = 1) -> None:
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+        log.info("tracemalloc started", extra={'frames': frames})
+
+
+def stop_tracing() -> None:
+    global _last_snapshot
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+        log.info("tracemalloc stopped")
+    with _snapshot_lock:
+        _last_snapshot = None
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+
+
+def top_allocations(limit: int = 25, group_by: str = 'lineno', diff: bool = False) -> Dict[str, Any]:
+    """
+    Top allocation sites in a fresh snapshot, which becomes the baseline for the next call
+    With diff=True, sites are ranked by growth since the previous snapshot instead
+    """
+    global _last_snapshot
+    if group_by not in GROUP_BY:
+        raise ValueError(f"group_by must be one of: {', '.join(GROUP_BY)}")
+    if not tracemalloc.is_tracing():
+        raise ValueError("tracemalloc is not running - start it first")
+
+    with _snapshot_lock:
+        snapshot = _take_snapshot()
+        previous, _last_snapshot = _last_snapshot, snapshot
+
+    if diff and previous is not None:
+        stats = snapshot.compare_to(previous, group_by)
+        rows = [{'site': _site(stat.traceback, group_by), 'bytes': stat.size, 'bytes_diff': stat.size_diff,
+                 'count': stat.count, 'count_diff': stat.count_diff} for stat in stats[:limit]]
+    else:
+        stats = snapshot.statistics(group_by)
+        rows = [{'site': _site(stat.traceback, group_by), 'bytes': stat.size, 'count': stat.count}
+                for stat in stats[:limit]]
+    return {
+        'group_by': group_by,
+        'diff': diff and previous is not None,
+        'total_bytes': sum(stat.size for stat in snapshot.statistics('filename')),
+        'allocations': rows
+    }
+
+
+def _site(traceback: tracemalloc.Traceback, group_by: str) -> Any:
+    if group_by == 'traceback':
+        return [f'{frame.filename}:{frame.lineno}' for frame in traceback]
+    frame = traceback[0]
+    return frame.filename if group_by == 'filename' else f'{frame.filename}:{frame.lineno}'
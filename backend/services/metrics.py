@@ -0,0 +1,307 @@
+"""
+Metrics
+Counters and latency histograms for each pipeline stage, rendered in the
+Prometheus text format on /api/metrics
+
+Deliberately dependency-free and cheap: an observation is one lock, a bisect
+and two additions. Values are per worker process - scrape every worker (or
+run a single worker) to see the whole picture.
+"""
+
+import contextvars
+import functools
+from abc import ABC, abstractmethod
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from . import tracing
+from .log import get_logger
+
+log = get_logger('metrics')
+
+# Seconds - lesson generation runs for up to a minute, Firestore reads for milliseconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+METRIC_PREFIX = 'agenticdp_'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class _Metric(ABC):
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = METRIC_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+    @abstractmethod
+    def _samples(self) -> List[str]:
+        """Sample lines for the exposition format"""
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+                for key, value in values]
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def time(self, **labels) -> '_Timer':
+        """Context manager observing the elapsed time; sets status="error" if the block raises"""
+        return _Timer(self, labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(series[0]), series[1], series[2]) for key, series in self._values.items()]
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def fail(self) -> None:
+        """Record the block as an error even though it didn't raise"""
+        if 'status' in self.histogram.labelnames:
+            self.labels['status'] = 'error'
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and 'status' in self.histogram.labelnames:
+            self.labels['status'] = 'error'
+        self.labels.setdefault('status', 'ok')
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+# ==================== Registry ====================
+
+_metrics: List[_Metric] = []
+# name -> callable returning {field: number}, rendered as gauges at scrape time
+_collectors: Dict[str, Callable[[], Dict]] = {}
+
+
+def _register(metric):
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(name: str, collect: Callable[[], Dict]) -> None:
+    """Expose a stats dict (e.g. a cache's get_stats()) as agenticdp_<name>_<field> gauges"""
+    _collectors[name] = collect
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for name, collect in list(_collectors.items()):
+        try:
+            stats = collect() or {}
+        except Exception as e:
+            log.warning("Metrics collector %s failed: %s", name, e)
+            continue
+        for field, value in stats.items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            gauge = f'{METRIC_PREFIX}{name}_{field}'
+            lines.append(f'# TYPE {gauge} gauge')
+            lines.append(f'{gauge} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+# ==================== Pipeline metrics ====================
+
+HTTP_SECONDS = _register(Histogram(
+    'http_request_seconds', 'Time until the response starts (SSE streams are timed separately)',
+    ['endpoint', 'method', 'status']))
+
+LLM_SECONDS = _register(Histogram(
+    'llm_request_seconds', 'Gemini generate_content latency',
+    ['agent', 'model', 'content_type', 'endpoint', 'status']))
+
+GENAI_QUEUE_SECONDS = _register(Histogram(
+    'genai_queue_seconds', 'Time a Gemini call waited for a concurrency slot', ['model']))
+
+IMAGE_SECONDS = _register(Histogram(
+    'image_generation_seconds', 'Image generation latency',
+    ['style', 'endpoint', 'status']))
+
+FIRESTORE_SECONDS = _register(Histogram(
+    'firestore_operation_seconds', 'Firestore service call latency',
+    ['operation', 'kind', 'status']))
+
+STORAGE_UPLOAD_SECONDS = _register(Histogram(
+    'storage_upload_seconds', 'Firebase Storage image upload latency', ['status']))
+
+STORAGE_UPLOAD_BYTES = _register(Counter(
+    'storage_upload_bytes_total', 'Bytes uploaded to Firebase Storage'))
+
+EXPORT_SECONDS = _register(Histogram(
+    'export_render_seconds', 'Time to produce an export file (cache="hit" is the lookup only)',
+    ['resource_type', 'cache', 'status']))
+
+SSE_FIRST_EVENT_SECONDS = _register(Histogram(
+    'sse_first_event_seconds', 'Time from request to the first SSE event',
+    ['endpoint', 'content_type']))
+
+SSE_STREAM_SECONDS = _register(Histogram(
+    'sse_stream_seconds', 'Total SSE stream duration, including client backpressure',
+    ['endpoint', 'content_type', 'status']))
+
+
+# ==================== Helpers ====================
+
+# Endpoint of the SSE stream currently being advanced - streams without
+# stream_with_context run their generator outside the request context
+_stream_endpoint = contextvars.ContextVar('stream_endpoint', default='none')
+
+
+def current_endpoint() -> str:
+    """Flask endpoint of the request (or SSE stream) being served, or 'none'"""
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return _stream_endpoint.get()
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return _stream_endpoint.get()
+
+
+def firestore_operation(kind: str):
+    """
+    Decorator timing (and tracing) a FirebaseService method, labelled with its name and 'read'/'write'
+    Write methods report failure by returning None or False rather than raising, so
+    those returns are recorded as status="error" too
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with FIRESTORE_SECONDS.time(operation=func.__name__, kind=kind) as timer, \
+                    tracing.span(f'firestore.{func.__name__}', kind=kind) as span:
+                result = func(*args, **kwargs)
+                if kind == 'write' and (result is None or result is False):
+                    timer.fail()
+                    span.set(failed=True)
+                return result
+        return wrapper
+    return decorator
+
+
+def timed_stream(events: Iterator, content_type: str) -> Iterator:
+    """
+    Wrap an SSE generator, recording time-to-first-event and total duration
+    Call from the view - the endpoint and start time are captured immediately
+    """
+    endpoint = current_endpoint()
+    started = time.perf_counter()
+
+    def stream():
+        status = 'ok'
+        first = True
+        events_iter = iter(events)
+        try:
+            while True:
+                token = _stream_endpoint.set(endpoint)
+                try:
+                    event = next(events_iter)
+                except StopIteration:
+                    break
+                finally:
+                    _stream_endpoint.reset(token)
+                if first:
+                    SSE_FIRST_EVENT_SECONDS.observe(time.perf_counter() - started,
+                                                    endpoint=endpoint, content_type=content_type)
+                    first = False
+                yield event
+        except GeneratorExit:
+            status = 'disconnected'
+            raise
+        except Exception:
+            status = 'error'
+            raise
+        finally:
+            # Propagate a client disconnect to the wrapped generator
+            close = getattr(events_iter, 'close', None)
+            if close:
+                close()
+            SSE_STREAM_SECONDS.observe(time.perf_counter() - started,
+                                       endpoint=endpoint, content_type=content_type, status=status)
+
+    return stream()
@@ -0,0 +1,205 @@
+"""
+Request Profiling
+On-demand cProfile of a single request, for finding out why one particular
+download or edit is slow in production without redeploying
+
+An admin opts a request in with an `X-Profile: 1` header or `?profile=1`.
+The profiler runs on the request thread while the view runs and, for SSE
+responses, while each event is produced (not while it's written to the client).
+The result is written to PROFILE_DIR as a .prof file (pstats format - open it with
+snakeviz or `python -m pstats`), listed and downloadable under /api/admin/profiles.
+The response carries the profile id in X-Profile-Id.
+
+Overhead is bounded: one profile at a time per worker (a second opted-in request
+runs unprofiled and gets `X-Profile-Id: busy`), collection stops after
+PROFILE_MAX_SECONDS, and only the newest PROFILE_KEEP files are kept.
+Renders a request hands to the export executor (bundles) run on other threads
+and are not included.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+from .log import get_logger
+
+log = get_logger('profiling')
+
+PROFILE_DIR = os.getenv('PROFILE_DIR') or os.path.join(tempfile.gettempdir(), 'agenticdp-profiles')
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '20'))
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', '120'))
+
+PROFILE_HEADER = 'X-Profile'
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_ID_HEADER = 'X-Profile-Id'
+
+SORT_KEYS = ('cumulative', 'tottime', 'ncalls', 'filename')
+
+_PROFILE_ID = re.compile(r'^[0-9TZ]+-[A-Za-z0-9_.]+-[0-9a-f]+$')
+
+
+def requested(headers, args) -> bool:
+    """Whether the request opted in to profiling (header or query flag)"""
+    flag = headers.get(PROFILE_HEADER) or args.get(PROFILE_QUERY_PARAM)
+    return (flag or '').lower() in ('1', 'true', 'yes')
+
+
+class RequestProfile:
+    """cProfile of one request - enabled around each slice of work done on its behalf"""
+
+    def __init__(self, profile_id: str, owner: 'Profiler'):
+        self.profile_id = profile_id
+        self.owner = owner
+        self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.truncated = False
+        self.finished = False
+
+    def enable(self) -> None:
+        if self.finished:
+            return
+        if time.perf_counter() - self.started > PROFILE_MAX_SECONDS:
+            self.truncated = True
+            return
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another profiler (a debugger or coverage) already owns this thread
+            self.truncated = True
+
+    def disable(self) -> None:
+        self.profiler.disable()
+
+    def finish(self) -> Optional[str]:
+        """Write the profile and free the slot - returns the file path"""
+        if self.finished:
+            return None
+        self.finished = True
+        self.profiler.disable()
+        try:
+            return self.owner.save(self)
+        finally:
+            self.owner.release()
+
+
+class Profiler:
+    def __init__(self, profile_dir: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.profile_dir = profile_dir
+        self.keep = keep
+        self._slot = threading.Lock()
+        self.stats_counters = {'profiled': 0, 'busy': 0, 'failed': 0}
+
+    def start(self, endpoint: Optional[str], request_id: str) -> Optional[RequestProfile]:
+        """A profile for this request, or None if another one is already running"""
+        if not self._slot.acquire(blocking=False):
+            self.stats_counters['busy'] += 1
+            return None
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        name = re.sub(r'[^A-Za-z0-9_.]', '_', endpoint or 'unknown')
+        suffix = re.sub(r'[^0-9a-f]', '', request_id.lower())[:12] or os.urandom(6).hex()
+        return RequestProfile(f'{stamp}-{name}-{suffix}', self)
+
+    def release(self) -> None:
+        self._slot.release()
+
+    def profiled_stream(self, events: Iterator, profile: RequestProfile) -> Iterator:
+        """
+        Profile an SSE generator while it produces each event, finishing when it ends
+        (a stream that never starts is finished by the request teardown instead)
+        """
+        def stream():
+            events_iter = iter(events)
+            try:
+                while True:
+                    profile.enable()
+                    try:
+                        event = next(events_iter)
+                    except StopIteration:
+                        break
+                    finally:
+                        profile.disable()
+                    yield event
+            finally:
+                close = getattr(events_iter, 'close', None)
+                if close:
+                    close()
+                profile.finish()
+
+        return stream()
+
+    # ==================== Artifacts ====================
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """File of a stored profile, or None for an unknown or malformed id"""
+        if not _PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.profile_dir, f'{profile_id}.prof')
+        return path if os.path.exists(path) else None
+
+    def save(self, profile: RequestProfile) -> Optional[str]:
+        path = os.path.join(self.profile_dir, f'{profile.profile_id}.prof')
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profile.profiler.dump_stats(path)
+        except OSError as e:
+            self.stats_counters['failed'] += 1
+            log.warning("Could not write profile %s: %s", profile.profile_id, e)
+            return None
+        self.stats_counters['profiled'] += 1
+        log.info("Profile %s written", profile.profile_id, extra={'truncated': profile.truncated})
+        self._prune()
+        return path
+
+    def _prune(self) -> None:
+        for stale in self.list_profiles()[self.keep:]:
+            try:
+                os.remove(os.path.join(self.profile_dir, f"{stale['id']}.prof"))
+            except OSError:
+                pass
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Stored profiles, newest first"""
+        try:
+            names = os.listdir(self.profile_dir)
+        except FileNotFoundError:
+            return []
+        profiles = []
+        for name in names:
+            profile_id, extension = os.path.splitext(name)
+            if extension != '.prof' or not _PROFILE_ID.match(profile_id):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.profile_dir, name))
+            except OSError:
+                continue
+            profiles.append({
+                'id': profile_id,
+                'endpoint': profile_id.split('-')[1],
+                'created_at': datetime.fromtimestamp(stat.st_mtime, timezone.utc).isoformat(),
+                'size': stat.st_size
+            })
+        profiles.sort(key=lambda p: p['id'], reverse=True)
+        return profiles
+
+    def summary(self, profile_id: str, sort: str = 'cumulative', limit: int = 50) -> Optional[str]:
+        """pstats text report of a stored profile"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"sort must be one of: {', '.join(SORT_KEYS)}")
+        path = self.path(profile_id)
+        if path is None:
+            return None
+        output = io.StringIO()
+        pstats.Stats(path, stream=output).strip_dirs().sort_stats(sort).print_stats(limit)
+        return output.getvalue()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats_counters, 'active': int(self._slot.locked())}
+
+
+profiler = Profiler()
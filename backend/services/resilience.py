@@ -0,0 +1,226 @@
+"""
+Resilient Calls
+Classified retries with jittered exponential backoff, and optional hedging,
+for Gemini text and image calls
+
+Every agent falls back to a canned document (or no image) when its model call
+raises, so one transient error used to mean one degraded lesson. Calls now retry
+on throttling (429/503), server errors (5xx) and timeouts / dropped connections,
+waiting a random time up to BASE * 2^attempt (full jitter, capped at
+GENAI_RETRY_MAX_WAIT). Client errors (bad request, safety blocks) fail at once.
+Retries stop after GENAI_RETRY_ATTEMPTS attempts, or earlier if the next wait
+would run past the call's deadline (GENAI_CALL_DEADLINE seconds from the first
+attempt).
+
+Hedging (GENAI_HEDGE=true) targets the slow tail instead: once a call has run
+longer than the p95 latency of recent calls of the same kind, an identical
+backup request is sent, and whichever answers first wins. The loser can't be
+cancelled and is billed, so hedges are capped at GENAI_HEDGE_BUDGET of calls.
+Latencies are timed around the model call only (not the governor queue), and
+no hedge is sent while the model's limiter is queueing calls or has just backed
+off - a slow call then means overload, which a duplicate would only add to.
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from tenacity import (RetryCallState, Retrying, retry_if_exception, stop_after_attempt,
+                      stop_before_delay, wait_random_exponential)
+
+from .governor import GovernorTimeout, is_overload
+from .log import get_logger
+
+log = get_logger('resilience')
+
+RETRY_ATTEMPTS = int(os.getenv('GENAI_RETRY_ATTEMPTS', '4'))
+RETRY_BASE = float(os.getenv('GENAI_RETRY_BASE', '1.0'))
+RETRY_MAX_WAIT = float(os.getenv('GENAI_RETRY_MAX_WAIT', '20'))
+# Total seconds a call (all attempts and waits) may take before retries stop
+CALL_DEADLINE = float(os.getenv('GENAI_CALL_DEADLINE', '90'))
+
+HEDGE_ENABLED = os.getenv('GENAI_HEDGE', 'false').lower() == 'true'
+# Fraction of calls that may be hedged
+HEDGE_BUDGET = float(os.getenv('GENAI_HEDGE_BUDGET', '0.05'))
+# Never hedge sooner than this, however fast the p95
+HEDGE_MIN_DELAY = float(os.getenv('GENAI_HEDGE_MIN_DELAY', '2.0'))
+# Latencies kept per call kind, and how many are needed before hedging starts
+LATENCY_WINDOW = 200
+MIN_SAMPLES = 20
+
+RETRYABLE_CODES = (429, 500, 502, 503, 504)
+
+
+def _transient_types() -> Tuple[type, ...]:
+    types = [TimeoutError, ConnectionError]
+    try:
+        import httpx
+        types.append(httpx.TransportError)
+    except ImportError:
+        pass
+    return tuple(types)
+
+
+TRANSIENT_TYPES = _transient_types()
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Throttling, server errors and timeouts are worth another attempt; anything else isn't"""
+    if isinstance(error, GovernorTimeout):
+        # Already waited its whole queue timeout - retrying would only wait again
+        return False
+    if is_overload(error) or getattr(error, 'code', None) in RETRYABLE_CODES:
+        return True
+    return isinstance(error, TRANSIENT_TYPES)
+
+
+# ==================== Latency tracking ====================
+
+class LatencyWindow:
+    """Recent successful latencies per call kind, for the hedging threshold"""
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self.size = size
+        self._samples: Dict[Hashable, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: Hashable, seconds: float) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self.size)
+            samples.append(seconds)
+
+    def p95(self, key: Hashable) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get(key) or ())
+        if len(samples) < MIN_SAMPLES:
+            return None
+        return samples[int(len(samples) * 0.95) - 1]
+
+
+class ResilientCaller:
+    def __init__(self, attempts: int = RETRY_ATTEMPTS, deadline: float = CALL_DEADLINE,
+                 hedge: bool = HEDGE_ENABLED, hedge_budget: float = HEDGE_BUDGET):
+        self.attempts = attempts
+        self.deadline = deadline
+        self.hedge = hedge
+        self.hedge_budget = hedge_budget
+        self.latencies = LatencyWindow()
+        self._lock = threading.Lock()
+        self.stats_counters = {'calls': 0, 'retries': 0, 'exhausted': 0, 'hedged': 0, 'hedge_wins': 0,
+                               'hedges_held': 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats_counters[name] += 1
+
+    # ==================== Retries ====================
+
+    def call(self, attempt: Callable[[], Any], key: Hashable, deadline: Optional[float] = None,
+             can_hedge: Optional[Callable[[], bool]] = None) -> Any:
+        """
+        Run attempt() until it succeeds, retrying transient errors with jittered backoff
+        `key` groups calls of the same kind (agent, model, step) for the hedging p95;
+        attempt() times its model call with timed(key). `can_hedge` is checked before
+        sending a backup request.
+        """
+        self._count('calls')
+        retrying = Retrying(
+            retry=retry_if_exception(is_retryable),
+            stop=stop_after_attempt(self.attempts) | stop_before_delay(deadline or self.deadline),
+            wait=wait_random_exponential(multiplier=RETRY_BASE, max=RETRY_MAX_WAIT),
+            before_sleep=self._before_retry,
+            retry_error_callback=self._exhausted
+        )
+        return retrying(self._attempt, attempt, key, can_hedge)
+
+    def _before_retry(self, state: RetryCallState) -> None:
+        self._count('retries')
+        error = state.outcome.exception()
+        log.warning("Gemini call failed (attempt %d), retrying in %.1fs: %s",
+                    state.attempt_number, state.upcoming_sleep, error,
+                    extra={'attempt': state.attempt_number, 'code': getattr(error, 'code', None)})
+
+    def _exhausted(self, state: RetryCallState) -> Any:
+        self._count('exhausted')
+        log.warning("Gemini call gave up after %d attempts in %.1fs",
+                    state.attempt_number, state.seconds_since_start)
+        # Re-raises the last attempt's error, so agents see the API error, not a RetryError
+        return state.outcome.result()
+
+    # ==================== Hedging ====================
+
+    @contextmanager
+    def timed(self, key: Hashable):
+        """Record the latency of a successful model call for the hedging p95"""
+        started = time.perf_counter()
+        yield
+        self.latencies.observe(key, time.perf_counter() - started)
+
+    def _attempt(self, attempt: Callable[[], Any], key: Hashable,
+                 can_hedge: Optional[Callable[[], bool]]) -> Any:
+        threshold = self.latencies.p95(key) if self.hedge else None
+        if threshold is None:
+            return attempt()
+        return self._hedged(attempt, key, max(threshold, HEDGE_MIN_DELAY), can_hedge)
+
+    def _spawn(self, attempt: Callable[[], Any]) -> Future:
+        """
+        Run an attempt on its own thread - the governor bounds how many calls are
+        in flight, so a pool would only add a second, fixed limit
+        """
+        future: Future = Future()
+        # Carry the caller's context (current span, stream endpoint) into the thread
+        context = contextvars.copy_context()
+
+        def run():
+            try:
+                future.set_result(context.run(attempt))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name='genai-hedge', daemon=True).start()
+        return future
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            return self.stats_counters['hedged'] < self.hedge_budget * self.stats_counters['calls']
+
+    def _hedged(self, attempt: Callable[[], Any], key: Hashable, delay: float,
+                can_hedge: Optional[Callable[[], bool]]) -> Any:
+        primary = self._spawn(attempt)
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._may_hedge():
+            return primary.result()
+        if can_hedge is not None and not can_hedge():
+            self._count('hedges_held')
+            return primary.result()
+
+        self._count('hedged')
+        log.info("Hedging a Gemini call still running after %.1fs", delay, extra={'key': str(key)})
+        backup = self._spawn(attempt)
+        pending = {primary, backup}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is backup:
+                        self._count('hedge_wins')
+                    return future.result()
+                if future is primary or error is None:
+                    error = future.exception()
+        raise error
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats_counters)
+
+
+resilient = ResilientCaller()
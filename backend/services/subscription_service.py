@@ -8,6 +8,19 @@ import os
 from datetime import datetime, timedelta
 from typing import Dict, Optional, List
 from firebase_admin import firestore
+from .cache import TTLCache
+from .log import get_logger
+
+log = get_logger('subscription')
+
+# User document fields that decide entitlement - the only ones kept in the cache
+ENTITLEMENT_FIELDS = (
+    'subscription_status',
+    'subscription_type',
+    'trial_end_date',
+    'promo_code_used',
+    'stripe_subscription_id'
+)
 
 class SubscriptionService:
     def __init__(self, firebase_service):
@@ -20,17 +33,52 @@ class SubscriptionService:
         self.stripe_enabled = all([self.stripe_secret_key, self.monthly_price_id, self.webhook_secret])
         
         if not self.stripe_enabled:
-            print("⚠️  Stripe not configured - payment features disabled (trial tracking still works)")
+            log.warning("Stripe not configured - payment features disabled (trial tracking still works)")
         else:
             stripe.api_key = self.stripe_secret_key
-            print("✓ Stripe initialized successfully")
-        
-        self.db = firebase_service.db
+            log.info("Stripe initialized successfully")
         
         # Subscription settings
         self.TRIAL_DAYS = 7
         self.MONTHLY_PRICE = 9.99  # USD
         self.PROMO_CODE_LIMIT = 100
+        
+        # Entitlement cache: user_id -> entitlement fields of the user document.
+        # Status is recomputed from the cached fields on every check, so trial expiry
+        # stays exact. Webhooks, promo codes and trial setup invalidate entries; the TTL
+        # bounds staleness for changes made by other workers.
+        self.entitlement_ttl = int(os.getenv('ENTITLEMENT_CACHE_TTL', '300'))
+        self.entitlement_negative_ttl = int(os.getenv('ENTITLEMENT_NEGATIVE_CACHE_TTL', '30'))
+        self.entitlement_cache = TTLCache(
+            max_size=int(os.getenv('ENTITLEMENT_CACHE_SIZE', '4096')),
+            default_ttl=self.entitlement_ttl
+        )
+    
+    @property
+    def db(self):
+        """Firestore client - resolved on use so creating the service doesn't initialize Firebase"""
+        return self.firebase_service.db
+    
+    # ==================== Entitlement Cache ====================
+    
+    def _cache_entitlement(self, user_id: str, user_data: Dict) -> Dict:
+        """Store the entitlement fields of a user document and return them"""
+        entitlement = {field: user_data.get(field) for field in ENTITLEMENT_FIELDS}
+        status = self._get_subscription_status(entitlement)
+        # Users without access are re-read sooner so a payment handled by another
+        # worker unlocks them quickly
+        ttl = self.entitlement_ttl if status.get('can_create_content') else self.entitlement_negative_ttl
+        self.entitlement_cache.set(user_id, entitlement, ttl=ttl)
+        return entitlement
+    
+    def invalidate_entitlement(self, user_id: Optional[str]) -> None:
+        """Forget cached entitlement for a user so the next check reads Firestore"""
+        if user_id:
+            self.entitlement_cache.delete(user_id)
+    
+    def get_entitlement_cache_stats(self) -> Dict:
+        """Entitlement cache size and hit-rate metrics"""
+        return self.entitlement_cache.stats()
     
     # ==================== Trial Management ====================
     
@@ -55,7 +103,7 @@ class SubscriptionService:
                     trial_start = datetime.utcnow()
                     trial_end = trial_start + timedelta(days=self.TRIAL_DAYS)
                     
-                    user_ref.update({
+                    trial_fields = {
                         'trial_start_date': trial_start,
                         'trial_end_date': trial_end,
                         'subscription_status': 'trial',
@@ -64,9 +112,11 @@ class SubscriptionService:
                         'stripe_subscription_id': None,
                         'promo_code_used': None,
                         'updated_at': datetime.utcnow()
-                    })
+                    }
+                    user_ref.update(trial_fields)
+                    self._cache_entitlement(user_id, {**user_data, **trial_fields})
                     
-                    print(f"✓ Trial initialized for user {user_id}")
+                    log.info("Trial initialized for user %s", user_id)
                     return {
                         'trial_start_date': trial_start,
                         'trial_end_date': trial_end,
@@ -75,16 +125,18 @@ class SubscriptionService:
                     }
                 else:
                     # Return existing trial data
+                    self._cache_entitlement(user_id, user_data)
                     return self._get_subscription_status(user_data)
             
             return {}
         except Exception as e:
-            print(f"Error initializing trial: {e}")
+            log.error("Error initializing trial: %s", e)
             return {}
     
-    def get_user_subscription_status(self, user_id: str) -> Dict:
+    def get_user_subscription_status(self, user_id: str, use_cache: bool = True) -> Dict:
         """
         Get user's subscription status including trial info
+        With use_cache=False the user document is always re-read (and the cache refreshed)
         Returns: {
             'subscription_status': 'trial'|'active'|'expired'|'lifetime',
             'days_remaining': int (for trial),
@@ -96,17 +148,22 @@ class SubscriptionService:
         if not self.firebase_service.enabled:
             return {'subscription_status': 'active', 'can_create_content': True}
         
+        if use_cache:
+            entitlement = self.entitlement_cache.get(user_id)
+            if entitlement is not None:
+                return self._get_subscription_status(entitlement)
+        
         try:
             user_ref = self.db.collection('users').document(user_id)
             user_doc = user_ref.get()
             
             if user_doc.exists:
-                user_data = user_doc.to_dict()
-                return self._get_subscription_status(user_data)
+                entitlement = self._cache_entitlement(user_id, user_doc.to_dict())
+                return self._get_subscription_status(entitlement)
             
             return {'subscription_status': 'expired', 'can_create_content': False}
         except Exception as e:
-            print(f"Error getting subscription status: {e}")
+            log.error("Error getting subscription status: %s", e)
             return {'subscription_status': 'expired', 'can_create_content': False}
     
     def _get_subscription_status(self, user_data: Dict) -> Dict:
@@ -175,8 +232,7 @@ class SubscriptionService:
                 raise Exception("STRIPE_MONTHLY_PRICE_ID not configured")
             
             # Create checkout session
-            print(f"Creating checkout session with price_id: {price_id}")
-            print(f"Customer ID: {customer_id}")
+            log.info("Creating checkout session", extra={'price_id': price_id, 'customer_id': customer_id})
             
             session = stripe.checkout.Session.create(
                 customer=customer_id,
@@ -198,19 +254,13 @@ class SubscriptionService:
                 }
             )
             
-            print(f"✓ Checkout session created for user {user_id}")
-            print(f"Session URL: {session.url}")
+            log.info("Checkout session created for user %s", user_id, extra={'session_url': session.url})
             return session.url
         except stripe.error.StripeError as e:
-            print(f"Stripe API error creating checkout session: {e}")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error message: {str(e)}")
+            log.error("Stripe API error creating checkout session (%s): %s", type(e).__name__, e)
             raise Exception(f"Stripe error: {str(e)}")
         except Exception as e:
-            print(f"Error creating checkout session: {e}")
-            print(f"Error type: {type(e).__name__}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Could not create checkout session")
             raise
     
     def _get_or_create_customer(self, user_id: str, user_email: str) -> str:
@@ -228,20 +278,20 @@ class SubscriptionService:
                     # Verify customer exists in Stripe
                     try:
                         stripe.Customer.retrieve(customer_id)
-                        print(f"Using existing Stripe customer: {customer_id}")
+                        log.info("Using existing Stripe customer: %s", customer_id)
                         return customer_id
                     except stripe.error.StripeError as e:
-                        print(f"Existing customer not found in Stripe: {e}")
+                        log.warning("Existing customer not found in Stripe: %s", e)
                         pass
             
             # Create new customer
-            print(f"Creating new Stripe customer for {user_email}")
+            log.info("Creating new Stripe customer for user %s", user_id)
             customer = stripe.Customer.create(
                 email=user_email,
                 metadata={'user_id': user_id}
             )
             
-            print(f"Created Stripe customer: {customer.id}")
+            log.info("Created Stripe customer: %s", customer.id)
             
             # Save customer ID
             user_ref.update({
@@ -251,9 +301,7 @@ class SubscriptionService:
             
             return customer.id
         except Exception as e:
-            print(f"Error in _get_or_create_customer: {e}")
-            import traceback
-            traceback.print_exc()
+            log.exception("Could not get or create Stripe customer for user %s", user_id)
             raise
     
     def create_portal_session(self, user_id: str, return_url: str) -> Optional[str]:
@@ -285,7 +333,7 @@ class SubscriptionService:
             
             return session.url
         except Exception as e:
-            print(f"Error creating portal session: {e}")
+            log.error("Error creating portal session: %s", e)
             raise
     
     # ==================== Webhook Handling ====================
@@ -315,7 +363,7 @@ class SubscriptionService:
         event_type = event['type']
         data = event['data']['object']
         
-        print(f"Processing webhook event: {event_type}")
+        log.info("Processing webhook event: %s", event_type)
         
         if event_type == 'checkout.session.completed':
             self._handle_checkout_completed(data)
@@ -334,7 +382,7 @@ class SubscriptionService:
         """Handle successful checkout"""
         user_id = session['metadata'].get('user_id')
         if not user_id:
-            print("Warning: No user_id in checkout session metadata")
+            log.warning("No user_id in checkout session metadata")
             return
         
         subscription_id = session.get('subscription')
@@ -350,8 +398,9 @@ class SubscriptionService:
             'subscription_start_date': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         })
+        self.invalidate_entitlement(user_id)
         
-        print(f"✓ Subscription activated for user {user_id}")
+        log.info("Subscription activated for user %s", user_id)
     
     def _handle_subscription_updated(self, subscription):
         """Handle subscription update"""
@@ -362,7 +411,7 @@ class SubscriptionService:
             user_id = self._find_user_by_customer_id(customer_id)
         
         if not user_id:
-            print("Warning: Could not find user for subscription update")
+            log.warning("Could not find user for subscription update")
             return
         
         status = subscription['status']
@@ -380,8 +429,9 @@ class SubscriptionService:
             'subscription_status': subscription_status,
             'updated_at': datetime.utcnow()
         })
+        self.invalidate_entitlement(user_id)
         
-        print(f"✓ Subscription updated for user {user_id}: {subscription_status}")
+        log.info("Subscription updated for user %s: %s", user_id, subscription_status)
     
     def _handle_subscription_deleted(self, subscription):
         """Handle subscription cancellation"""
@@ -391,7 +441,7 @@ class SubscriptionService:
             user_id = self._find_user_by_customer_id(customer_id)
         
         if not user_id:
-            print("Warning: Could not find user for subscription deletion")
+            log.warning("Could not find user for subscription deletion")
             return
         
         user_ref = self.db.collection('users').document(user_id)
@@ -400,14 +450,15 @@ class SubscriptionService:
             'subscription_end_date': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         })
+        self.invalidate_entitlement(user_id)
         
-        print(f"✓ Subscription cancelled for user {user_id}")
+        log.info("Subscription cancelled for user %s", user_id)
     
     def _handle_payment_succeeded(self, invoice):
         """Handle successful payment"""
         subscription_id = invoice.get('subscription')
         if subscription_id:
-            print(f"✓ Payment succeeded for subscription {subscription_id}")
+            log.info("Payment succeeded for subscription %s", subscription_id)
     
     def _handle_payment_failed(self, invoice):
         """Handle failed payment"""
@@ -420,7 +471,8 @@ class SubscriptionService:
                 'subscription_status': 'past_due',
                 'updated_at': datetime.utcnow()
             })
-            print(f"⚠️  Payment failed for user {user_id}")
+            self.invalidate_entitlement(user_id)
+            log.warning("Payment failed for user %s", user_id)
     
     def _find_user_by_customer_id(self, customer_id: str) -> Optional[str]:
         """Find user ID by Stripe customer ID"""
@@ -430,7 +482,7 @@ class SubscriptionService:
             if docs:
                 return docs[0].id
         except Exception as e:
-            print(f"Error finding user by customer ID: {e}")
+            log.error("Error finding user by customer ID: %s", e)
         return None
     
     # ==================== Promo Code Management ====================
@@ -464,10 +516,10 @@ class SubscriptionService:
             }
             
             promo_ref.set(promo_data)
-            print(f"✓ Promo code created: {code}")
+            log.info("Promo code created: %s", code)
             return promo_data
         except Exception as e:
-            print(f"Error creating promo code: {e}")
+            log.error("Error creating promo code: %s", e)
             raise
     
     def validate_and_apply_promo_code(self, user_id: str, code: str) -> Dict:
@@ -538,15 +590,16 @@ class SubscriptionService:
             # Execute transaction
             transaction = self.db.transaction()
             apply_code(transaction)
+            self.invalidate_entitlement(user_id)
             
-            print(f"✓ Promo code {code} applied to user {user_id}")
+            log.info("Promo code %s applied to user %s", code, user_id)
             return {
                 'success': True,
                 'message': 'Lifetime access granted!',
                 'subscription_type': 'lifetime'
             }
         except Exception as e:
-            print(f"Error applying promo code: {e}")
+            log.error("Error applying promo code: %s", e)
             return {'success': False, 'error': str(e)}
     
     def get_promo_code_stats(self, code: str) -> Optional[Dict]:
@@ -562,7 +615,7 @@ class SubscriptionService:
                 return promo_doc.to_dict()
             return None
         except Exception as e:
-            print(f"Error getting promo code stats: {e}")
+            log.error("Error getting promo code stats: %s", e)
             return None
     
     def list_promo_codes(self) -> List[Dict]:
@@ -575,5 +628,5 @@ class SubscriptionService:
             docs = query.stream()
             return [doc.to_dict() for doc in docs]
         except Exception as e:
-            print(f"Error listing promo codes: {e}")
+            log.error("Error listing promo codes: %s", e)
             return []
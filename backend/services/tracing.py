@@ -0,0 +1,260 @@
+"""
+Request Tracing
+Lightweight in-process spans for the SSE generation pipeline
+
+A trace is started per generate/edit stream; LLM calls, image generations,
+Firestore operations, Storage uploads and export renders open child spans under
+whatever span is current. Time the stream spends suspended in `yield` (the
+server writing to a slow client) is recorded on the root span as sse.write_seconds.
+
+Finished traces are exported off the request thread to a JSON-lines file
+(TRACE_FILE) and/or a Zipkin-compatible collector (TRACE_COLLECTOR_URL, e.g.
+Jaeger or the OpenTelemetry collector's zipkin receiver). With neither set,
+spans are not recorded at all - only the trace id is generated.
+"""
+
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from typing import Any, Dict, Iterator, List, Optional
+from .log import get_logger
+
+log = get_logger('tracing')
+
+TRACE_FILE = os.getenv('TRACE_FILE')
+TRACE_COLLECTOR_URL = os.getenv('TRACE_COLLECTOR_URL')
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1.0'))
+TRACE_SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'agenticdp-backend')
+# Spans kept per trace - a runaway loop shouldn't grow a trace without bound
+MAX_SPANS_PER_TRACE = 1000
+
+TRACING_ENABLED = bool(TRACE_FILE or TRACE_COLLECTOR_URL)
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar('current_span', default=None)
+
+
+def _new_id(bits: int) -> str:
+    return f'{random.getrandbits(bits):0{bits // 4}x}'
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'span_id', 'parent_id', 'start', 'duration', 'attributes', 'error')
+
+    def __init__(self, trace: 'Trace', name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.name = name
+        self.span_id = _new_id(64)
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def finish(self) -> None:
+        if self.duration is None:
+            self.duration = time.time() - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration': self.duration,
+            'attributes': self.attributes,
+            'error': self.error
+        }
+
+
+class Trace:
+    def __init__(self, trace_id: Optional[str] = None, sampled: bool = True):
+        self.trace_id = trace_id or _new_id(128)
+        self.sampled = sampled
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        if self.sampled:
+            with self._lock:
+                if len(self.spans) < MAX_SPANS_PER_TRACE:
+                    self.spans.append(span)
+
+
+class _NullSpan:
+    """Stand-in when there is no sampled trace - every operation is a no-op"""
+    trace_id = None
+
+    def set(self, **attributes) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _SpanContext:
+    def __init__(self, name: str, attributes: Dict[str, Any]):
+        self.name = name
+        self.attributes = attributes
+        self.span = None
+        self.token = None
+
+    def __enter__(self):
+        parent = _current_span.get()
+        if parent is None or not parent.trace.sampled:
+            return _NULL_SPAN
+        self.span = Span(parent.trace, self.name, parent.span_id, self.attributes)
+        parent.trace.add(self.span)
+        self.token = _current_span.set(self.span)
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.span is None:
+            return False
+        if exc is not None:
+            self.span.error = f'{exc_type.__name__}: {exc}'
+        self.span.finish()
+        _current_span.reset(self.token)
+        return False
+
+
+def span(name: str, **attributes) -> _SpanContext:
+    """Child span of the current span (no-op outside a sampled trace)"""
+    return _SpanContext(name, attributes)
+
+
+def current_trace_id() -> Optional[str]:
+    current = _current_span.get()
+    return current.trace_id if current is not None else None
+
+
+def start_trace(name: str, **attributes) -> Span:
+    """Root span of a new trace (sampled per TRACE_SAMPLE_RATE when an exporter is configured)"""
+    trace = Trace(sampled=TRACING_ENABLED and random.random() < TRACE_SAMPLE_RATE)
+    root = Span(trace, name, None, dict(attributes))
+    trace.add(root)
+    return root
+
+
+def traced_stream(events: Iterator, root: Span) -> Iterator:
+    """
+    Run an SSE generator under the root span of a trace
+    The root span is current while the generator runs, so the trace id is available
+    to it via current_trace_id(), and stage spans nest under it. Exported when the
+    stream ends, including on client disconnect.
+    """
+    trace = root.trace
+
+    def stream():
+        events_iter = iter(events)
+        write_seconds = 0.0
+        event_count = 0
+        try:
+            while True:
+                token = _current_span.set(root)
+                try:
+                    event = next(events_iter)
+                except StopIteration:
+                    break
+                finally:
+                    _current_span.reset(token)
+                event_count += 1
+                suspended = time.perf_counter()
+                yield event
+                write_seconds += time.perf_counter() - suspended
+        except GeneratorExit:
+            root.set(disconnected=True)
+            raise
+        except Exception as e:
+            root.error = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            close = getattr(events_iter, 'close', None)
+            if close:
+                close()
+            root.set(**{'sse.events': event_count, 'sse.write_seconds': round(write_seconds, 6)})
+            root.finish()
+            if trace.sampled:
+                exporter.submit(trace)
+
+    return stream()
+
+
+# ==================== Export ====================
+
+def _to_zipkin(trace: Trace) -> List[Dict[str, Any]]:
+    spans = []
+    for item in trace.spans:
+        tags = {key: str(value) for key, value in item.attributes.items()}
+        if item.error:
+            tags['error'] = item.error
+        entry = {
+            'traceId': item.trace_id,
+            'id': item.span_id,
+            'name': item.name,
+            'timestamp': int(item.start * 1_000_000),
+            'duration': max(int((item.duration or 0) * 1_000_000), 1),
+            'localEndpoint': {'serviceName': TRACE_SERVICE_NAME},
+            'tags': tags
+        }
+        if item.parent_id:
+            entry['parentId'] = item.parent_id
+        spans.append(entry)
+    return spans
+
+
+class TraceExporter:
+    """Writes finished traces from a background thread so export never delays a response"""
+
+    def __init__(self):
+        self._queue: 'queue.Queue[Trace]' = queue.Queue(maxsize=1000)
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self.dropped = 0
+
+    def submit(self, trace: Trace) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='trace-export', daemon=True)
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                self.export(trace)
+            except Exception as e:
+                log.warning("Trace export failed for %s: %s", trace.trace_id, e)
+
+    def export(self, trace: Trace) -> None:
+        if TRACE_FILE:
+            lines = ''.join(json.dumps(item.to_dict(), default=str) + '\n' for item in trace.spans)
+            with self._file_lock, open(TRACE_FILE, 'a', encoding='utf-8') as f:
+                f.write(lines)
+        if TRACE_COLLECTOR_URL:
+            body = json.dumps(_to_zipkin(trace)).encode('utf-8')
+            request = urllib.request.Request(
+                TRACE_COLLECTOR_URL, data=body, headers={'Content-Type': 'application/json'}, method='POST'
+            )
+            urllib.request.urlopen(request, timeout=5).close()
+
+
+exporter = TraceExporter()
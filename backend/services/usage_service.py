@@ -0,0 +1,311 @@
+"""
+Usage Accounting Service
+Token and cost accounting from genai usage metadata
+
+Every generate_content call is recorded against (day, user, endpoint, content type,
+agent, model, step). Counts are aggregated in memory and flushed in batches by a
+background thread to Firestore (`usage` collection, atomic increments) or a local
+SQLite file, so recording never adds a database round trip to a generation.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+from .log import get_logger
+
+log = get_logger('usage')
+
+# 'firestore', 'sqlite' or 'none' (in-memory only, lost on restart)
+USAGE_SINK = os.getenv('USAGE_SINK', 'firestore').lower()
+USAGE_SQLITE_PATH = os.getenv('USAGE_SQLITE_PATH', 'usage.sqlite3')
+USAGE_FLUSH_INTERVAL = float(os.getenv('USAGE_FLUSH_INTERVAL', '60'))
+# Flush early once this many distinct rows are pending
+USAGE_FLUSH_ROWS = int(os.getenv('USAGE_FLUSH_ROWS', '200'))
+
+USAGE_COLLECTION = 'usage'
+
+# Dimensions each usage row is keyed by, and the counters it accumulates
+USAGE_DIMENSIONS = ('date', 'user_id', 'endpoint', 'content_type', 'agent', 'model', 'step')
+USAGE_COUNTERS = ('calls', 'prompt_tokens', 'output_tokens', 'image_tokens', 'images', 'cost_usd')
+
+
+def _load_prices() -> Dict[str, Dict[str, float]]:
+    """
+    USD per million tokens by model, from GENAI_PRICES, e.g.
+    {"gemini-2.5-flash": {"prompt": 0.3, "output": 2.5, "image": 30}}
+    Models without a price are counted in tokens only.
+    """
+    raw = os.getenv('GENAI_PRICES')
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except ValueError as e:
+        log.warning("Ignoring GENAI_PRICES: %s", e)
+        return {}
+
+
+def _modality_tokens(details, modality: str) -> int:
+    """Sum token_count over a *_tokens_details list for one modality (newer SDKs only)"""
+    total = 0
+    for entry in details or []:
+        entry_modality = getattr(entry, 'modality', None)
+        name = getattr(entry_modality, 'name', None) or str(entry_modality or '')
+        if name.upper().endswith(modality):
+            total += getattr(entry, 'token_count', 0) or 0
+    return total
+
+
+def _count_images(response) -> int:
+    count = 0
+    for candidate in getattr(response, 'candidates', None) or []:
+        content = getattr(candidate, 'content', None)
+        for part in getattr(content, 'parts', None) or []:
+            if getattr(part, 'inline_data', None):
+                count += 1
+    return count
+
+
+def current_user() -> str:
+    """User the current call is attributed to: signed-in user, then user_id param, then 'anonymous'"""
+    try:
+        from flask import has_request_context, request
+    except ImportError:
+        return 'anonymous'
+    if not has_request_context():
+        return 'anonymous'
+    user = getattr(request, 'user', None)
+    if user and user.get('uid'):
+        return user['uid']
+    body = request.get_json(silent=True) if request.is_json else None
+    if isinstance(body, dict) and body.get('user_id'):
+        return str(body['user_id'])
+    return request.args.get('user_id') or 'anonymous'
+
+
+class UsageService:
+    def __init__(self, sink: str = USAGE_SINK):
+        self.sink = sink
+        self.prices = _load_prices()
+        # dimension tuple -> counters, not yet flushed
+        self._pending: Dict[Tuple, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._sqlite_ready = False
+
+    # ==================== Recording ====================
+
+    def record(self, response, agent: str, model: str, content_type: str, step: str,
+               endpoint: str = 'none', user_id: Optional[str] = None) -> Dict[str, float]:
+        """Record one generate_content response; returns the counters it added"""
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', 0) or 0
+        output_tokens = getattr(usage, 'candidates_token_count', 0) or 0
+        image_tokens = _modality_tokens(getattr(usage, 'candidates_tokens_details', None), 'IMAGE')
+
+        counters = {
+            'calls': 1,
+            'prompt_tokens': prompt_tokens,
+            'output_tokens': output_tokens,
+            'image_tokens': image_tokens,
+            'images': _count_images(response),
+            'cost_usd': self._cost(model, prompt_tokens, output_tokens, image_tokens)
+        }
+        date = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        key = (date, user_id or current_user(), endpoint, content_type, agent, model, step)
+
+        with self._lock:
+            row = self._pending.get(key)
+            if row is None:
+                row = self._pending[key] = dict.fromkeys(USAGE_COUNTERS, 0)
+            for name, value in counters.items():
+                row[name] += value
+            pending_rows = len(self._pending)
+
+        self._ensure_flusher()
+        if pending_rows >= USAGE_FLUSH_ROWS:
+            self._wake.set()
+        return counters
+
+    def _cost(self, model: str, prompt_tokens: int, output_tokens: int, image_tokens: int) -> float:
+        price = self.prices.get(model)
+        if not price:
+            return 0.0
+        # Image output tokens are billed at the image rate, not the text output rate
+        text_output = max(output_tokens - image_tokens, 0)
+        return round((prompt_tokens * price.get('prompt', 0)
+                      + text_output * price.get('output', 0)
+                      + image_tokens * price.get('image', price.get('output', 0))) / 1_000_000, 8)
+
+    # ==================== Flushing ====================
+
+    def _ensure_flusher(self) -> None:
+        if self._thread is not None or self.sink == 'none':
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._flush_loop, name='usage-flush', daemon=True)
+                self._thread.start()
+                atexit.register(self.flush)
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._wake.wait(USAGE_FLUSH_INTERVAL)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Write pending rows to the sink; returns the number of rows written"""
+        if self.sink == 'none':
+            return 0
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, {}
+            if not rows:
+                return 0
+            count = len(rows)
+            try:
+                if self.sink == 'sqlite':
+                    self._flush_sqlite(rows)
+                else:
+                    self._flush_firestore(rows)
+                return count
+            except Exception as e:
+                log.warning("Usage flush failed, will retry %d of %d rows: %s", len(rows), count, e)
+                # Put back the rows that weren't written so they're included in the next flush
+                with self._lock:
+                    for key, counters in rows.items():
+                        row = self._pending.setdefault(key, dict.fromkeys(USAGE_COUNTERS, 0))
+                        for name, value in counters.items():
+                            row[name] += value
+                return 0
+
+    @staticmethod
+    def _row_id(key: Tuple) -> str:
+        return hashlib.sha1('\0'.join(key).encode('utf-8')).hexdigest()
+
+    def _flush_firestore(self, rows: Dict[Tuple, Dict[str, float]]) -> None:
+        """
+        Increment the usage documents in batches of up to 500
+        Rows are removed from `rows` as their batch commits, so after a failure
+        it holds only the rows that still need writing.
+        """
+        from firebase_admin import firestore
+        from .firebase_service import firebase_service, STUDENT_BATCH_SIZE
+
+        if not firebase_service.enabled:
+            return
+        db = firebase_service.db
+        items = list(rows.items())
+        # Firestore batches are capped at 500 writes
+        for start in range(0, len(items), STUDENT_BATCH_SIZE):
+            chunk = items[start:start + STUDENT_BATCH_SIZE]
+            batch = db.batch()
+            for key, counters in chunk:
+                document = dict(zip(USAGE_DIMENSIONS, key))
+                document.update({name: firestore.Increment(value) for name, value in counters.items()})
+                batch.set(db.collection(USAGE_COLLECTION).document(self._row_id(key)), document, merge=True)
+            batch.commit()
+            # Committed increments must not be applied again by a retry
+            for key, _ in chunk:
+                del rows[key]
+
+    def _sqlite(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(USAGE_SQLITE_PATH, timeout=10)
+        if not self._sqlite_ready:
+            columns = ', '.join(f'{name} TEXT NOT NULL' for name in USAGE_DIMENSIONS)
+            counters = ', '.join(f'{name} REAL NOT NULL DEFAULT 0' for name in USAGE_COUNTERS)
+            connection.execute(
+                f'CREATE TABLE IF NOT EXISTS usage ({columns}, {counters}, '
+                f'PRIMARY KEY ({", ".join(USAGE_DIMENSIONS)}))'
+            )
+            self._sqlite_ready = True
+        return connection
+
+    def _flush_sqlite(self, rows: Dict[Tuple, Dict[str, float]]) -> None:
+        names = USAGE_DIMENSIONS + USAGE_COUNTERS
+        updates = ', '.join(f'{name} = {name} + excluded.{name}' for name in USAGE_COUNTERS)
+        sql = (f'INSERT INTO usage ({", ".join(names)}) VALUES ({", ".join("?" * len(names))}) '
+               f'ON CONFLICT ({", ".join(USAGE_DIMENSIONS)}) DO UPDATE SET {updates}')
+        connection = self._sqlite()
+        try:
+            with connection:
+                connection.executemany(sql, [
+                    key + tuple(counters[name] for name in USAGE_COUNTERS) for key, counters in rows.items()
+                ])
+        finally:
+            connection.close()
+
+    # ==================== Reporting ====================
+
+    def _load_rows(self, since: str) -> List[Dict[str, Any]]:
+        if self.sink == 'sqlite':
+            if not os.path.exists(USAGE_SQLITE_PATH):
+                return []
+            connection = self._sqlite()
+            connection.row_factory = sqlite3.Row
+            try:
+                return [dict(row) for row in connection.execute('SELECT * FROM usage WHERE date >= ?', (since,))]
+            finally:
+                connection.close()
+        if self.sink == 'firestore':
+            from .firebase_service import firebase_service
+            if not firebase_service.enabled:
+                return []
+            query = firebase_service.db.collection(USAGE_COLLECTION).where('date', '>=', since)
+            return [doc.to_dict() for doc in query.stream()]
+        return []
+
+    def get_report(self, days: int = 7, group_by: str = 'endpoint') -> Dict[str, Any]:
+        """
+        Token and cost totals for the last `days` days, grouped by one dimension
+        Includes rows not flushed yet; groups are sorted by total tokens, highest first
+        """
+        if group_by not in USAGE_DIMENSIONS:
+            raise ValueError(f"group_by must be one of: {', '.join(USAGE_DIMENSIONS)}")
+
+        since = (datetime.now(timezone.utc) - timedelta(days=max(days, 1) - 1)).strftime('%Y-%m-%d')
+        rows = self._load_rows(since)
+        with self._lock:
+            rows.extend({**dict(zip(USAGE_DIMENSIONS, key)), **counters}
+                        for key, counters in self._pending.items() if key[0] >= since)
+
+        groups: Dict[str, Dict[str, float]] = {}
+        totals = dict.fromkeys(USAGE_COUNTERS, 0)
+        for row in rows:
+            group = groups.setdefault(row.get(group_by) or 'unknown', dict.fromkeys(USAGE_COUNTERS, 0))
+            for name in USAGE_COUNTERS:
+                value = row.get(name) or 0
+                group[name] += value
+                totals[name] += value
+
+        ranked = sorted(
+            ({group_by: name, **counters} for name, counters in groups.items()),
+            key=lambda item: item['prompt_tokens'] + item['output_tokens'],
+            reverse=True
+        )
+        for item in ranked + [totals]:
+            item['cost_usd'] = round(item['cost_usd'], 6)
+            for name in USAGE_COUNTERS:
+                if name != 'cost_usd':
+                    item[name] = int(item[name])
+
+        return {
+            'since': since,
+            'group_by': group_by,
+            'sink': self.sink,
+            'priced_models': sorted(self.prices),
+            'totals': totals,
+            'groups': ranked
+        }
+
+
+# Singleton instance
+usage_service = UsageService()